@@ -4,15 +4,63 @@ import os
 class Settings(BaseModel):
     api_token: str = os.getenv("API_TOKEN", "change-me")
     redis_url: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    trino_pool_size: int = int(os.getenv("TRINO_POOL_SIZE", 4))
+    trino_pool_idle_seconds: float = float(os.getenv("TRINO_POOL_IDLE_SECONDS", 300))
+    trino_pool_acquire_timeout: float = float(os.getenv("TRINO_POOL_ACQUIRE_TIMEOUT", 30))
+    trino_pool_healthcheck_seconds: float = float(os.getenv("TRINO_POOL_HEALTHCHECK_SECONDS", 60))
+    trino_stats_enabled: bool = os.getenv("TRINO_STATS_ENABLED", "true").lower() in {"1", "true", "yes"}
+    trino_stats_workers: int = int(os.getenv("TRINO_STATS_WORKERS", 4))
+    trino_stats_query_timeout: float = float(os.getenv("TRINO_STATS_QUERY_TIMEOUT", 10))
+    trino_stats_time_budget: float = float(os.getenv("TRINO_STATS_TIME_BUDGET", 30))
+    trino_stats_cache_enabled: bool = os.getenv("TRINO_STATS_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+    trino_stats_cache_ttl_seconds: int = int(os.getenv("TRINO_STATS_CACHE_TTL_SECONDS", 7 * 24 * 3600))
     llm_provider: str = os.getenv("LLM_PROVIDER", "ollama")
     openai_api_key: str | None = os.getenv("OPENAI_API_KEY")
     openai_model: str = os.getenv("OPENAI_MODEL", "qwen3:14b")
     max_status_longpoll_seconds: int = int(os.getenv("MAX_STATUS_LONGPOLL_SECONDS", 1200))
+    status_reconcile_seconds: float = float(os.getenv("STATUS_RECONCILE_SECONDS", 30))
+    status_poll_seconds: float = float(os.getenv("STATUS_POLL_SECONDS", 1))
+    task_memo_ttl_seconds: int = int(os.getenv("TASK_MEMO_TTL_SECONDS", 3600))
+    task_result_ttl_seconds: int = int(os.getenv("TASK_RESULT_TTL_SECONDS", 7 * 24 * 3600))
+    task_failed_ttl_seconds: int = int(os.getenv("TASK_FAILED_TTL_SECONDS", 24 * 3600))
+    task_running_ttl_seconds: int = int(os.getenv("TASK_RUNNING_TTL_SECONDS", 24 * 3600))
+    worker_metrics_port: int = int(os.getenv("WORKER_METRICS_PORT", 9108))
+    workload_ttl_seconds: int = int(os.getenv("WORKLOAD_TTL_SECONDS", 24 * 3600))
+    result_codec: str = os.getenv("RESULT_CODEC", "auto")
+    result_compression_level: int = int(os.getenv("RESULT_COMPRESSION_LEVEL", 3))
     max_service_wait_minutes: int = int(os.getenv("MAX_SERVICE_WAIT_MINUTES", 15))
     qwen_model_path: str = os.getenv("QWEN_MODEL_PATH", "Qwen/Qwen2-14B-Instruct")
     qwen_device: str = os.getenv("QWEN_DEVICE", "auto")
     qwen_dtype: str = os.getenv("QWEN_DTYPE", "auto")
     qwen_max_new_tokens: int = int(os.getenv("QWEN_MAX_NEW_TOKENS", 512))
     qwen_temperature: float = float(os.getenv("QWEN_TEMPERATURE", 0.2))
+    qwen_batch_max_size: int = int(os.getenv("QWEN_BATCH_MAX_SIZE", 1))
+    qwen_batch_window_ms: float = float(os.getenv("QWEN_BATCH_WINDOW_MS", 20))
+    llm_stream: bool = os.getenv("LLM_STREAM", "true").lower() in {"1", "true", "yes"}
+    llm_json_prefix_limit: int = int(os.getenv("LLM_JSON_PREFIX_LIMIT", 2000))
+    llm_planner_mode: str = os.getenv("LLM_PLANNER_MODE", "single")
+    llm_planner_concurrency: int = int(os.getenv("LLM_PLANNER_CONCURRENCY", 4))
+    llm_planner_max_slices: int = int(os.getenv("LLM_PLANNER_MAX_SLICES", 8))
+    llm_http_max_connections: int = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", 20))
+    llm_http_max_keepalive: int = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", 10))
+    llm_http_keepalive_expiry: float = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", 30))
+    llm_http_connect_timeout: float = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", 10))
+    llm_http_read_timeout: float = float(os.getenv("LLM_HTTP_READ_TIMEOUT", 120))
+    llm_http_retries: int = int(os.getenv("LLM_HTTP_RETRIES", 2))
+    llm_http_backoff_seconds: float = float(os.getenv("LLM_HTTP_BACKOFF_SECONDS", 0.5))
+    llm_cache_enabled: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+    llm_cache_ttl_seconds: int = int(os.getenv("LLM_CACHE_TTL_SECONDS", 86400))
+    llm_cache_max_entries: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+    llm_cache_local_entries: int = int(os.getenv("LLM_CACHE_LOCAL_ENTRIES", 128))
+    llm_cache_max_response_bytes: int = int(os.getenv("LLM_CACHE_MAX_RESPONSE_BYTES", 1024 * 1024))
+    llm_prompt_token_budget: int = int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", 6000))
+    llm_prompt_chars_per_token: int = int(os.getenv("LLM_PROMPT_CHARS_PER_TOKEN", 4))
+    rewrite_workers: int = int(os.getenv("REWRITE_WORKERS", 0))
+    rewrite_chunk_size: int = int(os.getenv("REWRITE_CHUNK_SIZE", 2000))
+    rewrite_parallel_min_queries: int = int(os.getenv("REWRITE_PARALLEL_MIN_QUERIES", 10000))
+    preagg_enabled: bool = os.getenv("PREAGG_ENABLED", "true").lower() in {"1", "true", "yes"}
+    preagg_min_runs: int = int(os.getenv("PREAGG_MIN_RUNS", 100))
+    preagg_max_tables: int = int(os.getenv("PREAGG_MAX_TABLES", 5))
+    parse_cache_max_bytes: int = int(os.getenv("PARSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
 
 settings = Settings()
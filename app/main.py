@@ -1,5 +1,6 @@
 from fastapi import FastAPI
-from .routers import tasks
+from .routers import metrics, tasks
 
 app = FastAPI(title="DL Optimizer API", version="1.0.0")
 app.include_router(tasks.router)
+app.include_router(metrics.router)
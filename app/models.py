@@ -13,6 +13,8 @@ class NewRequest(BaseModel):
     url: str  # JDBC
     ddl: List[DDLItem]
     queries: List[QueryItem]
+    # Finished task to diff against; only changed tables and queries are re-planned.
+    base_taskid: Optional[str] = None
 
 class TaskResponse(BaseModel):
     taskid: str
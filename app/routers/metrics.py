@@ -0,0 +1,12 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
+from ..services.metrics import exposition, prometheus_client
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    if prometheus_client is None:
+        raise HTTPException(status_code=503, detail="prometheus_client is not installed")
+    body, content_type = exposition()
+    return Response(body, media_type=content_type)
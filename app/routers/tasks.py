@@ -1,52 +1,266 @@
-import time
+import asyncio
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, Query
+from contextlib import suppress
+from typing import Optional
+
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from ..auth import require_token
-from ..models import NewRequest, TaskResponse, StatusResponse, ResultResponse
+from ..models import DDLItem, NewRequest, QueryItem, TaskResponse, StatusResponse, ResultResponse
+from ..services.memo import WorkloadFingerprint, remap_manifest, remap_schema, request_fingerprint, schema_of
+from ..storage.codec import CONTENT_ENCODINGS, iter_decompress
+from ..storage.events import task_events
+from ..storage.result_stream import iter_items
 from ..storage.repo import Repo
 from ..storage.schema import TaskRecord
+from ..storage.workload import WorkloadStore, WorkloadWriter
 from ..config import settings
 from worker.celery_app import run_analysis
 
 router = APIRouter()
 repo = Repo()
+workloads = WorkloadStore()
+# Longest NDJSON line accepted by /new/ndjson.
+_MAX_LINE_BYTES = 16 * 1024 * 1024
+# Items per Redis write when storing uploads and per chunk when streaming results.
+_NDJSON_BATCH = 1000
 
 @router.post("/new", response_model=TaskResponse)
 async def new_task(payload: NewRequest, _=Depends(require_token)):
     taskid = str(uuid.uuid4())
-    repo.save(TaskRecord(taskid=taskid, status="RUNNING"))
-    async_result = run_analysis.delay(payload.model_dump())
-    repo.r.hset(f"task:{taskid}", "celery_id", async_result.id)
+    # Fingerprinting hashes every query; it runs in the thread with the Redis calls.
+    return await asyncio.to_thread(_submit, taskid, None, payload)
+
+@router.post("/new/ndjson", response_model=TaskResponse)
+async def new_task_ndjson(request: Request, base_taskid: Optional[str] = None, _=Depends(require_token)):
+    """``/new`` with the workload streamed as NDJSON, validated line by line.
+
+    Lines are ``{"section": "url", "url": ...}`` (once), ``{"section": "ddl",
+    "statement": ...}`` and ``{"section": "queries", "queryid": ..., "query":
+    ..., "runquantity": ...}``; items are written to Redis in batches as they
+    arrive, so the API never holds the whole workload. ``base_taskid`` is as
+    in the ``/new`` body.
+    """
+    taskid = str(uuid.uuid4())
+    writer = workloads.writer(taskid)
+    fingerprint = WorkloadFingerprint()
+    lineno = 0
+    try:
+        async for line in _ndjson_lines_in(request.stream()):
+            lineno += 1
+            if line.strip():
+                _ingest(orjson.loads(line), writer, fingerprint)
+            if writer.pending >= _NDJSON_BATCH:
+                await asyncio.to_thread(writer.flush)
+        if not fingerprint.url:
+            raise ValueError('no {"section": "url"} line')
+        # An upload with nothing to analyze is rejected up front rather than failing in the worker.
+        if not writer.ddl_count or not writer.query_count:
+            raise ValueError('at least one {"section": "ddl"} and one {"section": "queries"} line are required')
+        await asyncio.to_thread(writer.commit, fingerprint.url, base_taskid)
+    except ValueError as exc:
+        await asyncio.to_thread(writer.discard)
+        raise HTTPException(status_code=400, detail=f"line {lineno}: {exc}" if lineno else str(exc))
+    except BaseException:
+        await asyncio.to_thread(writer.discard)
+        raise
+    return await asyncio.to_thread(_submit, taskid, fingerprint.hexdigest(), None)
+
+def _submit(taskid: str, fingerprint: Optional[str], payload: Optional[NewRequest]) -> TaskResponse:
+    """Start ``taskid`` unless the memo has it; ``payload`` None means the workload is already stored.
+
+    ``fingerprint`` None means ``request_fingerprint(payload)``.
+    """
+    if fingerprint is None:
+        fingerprint = request_fingerprint(payload)
+    existing = repo.claim_memo(fingerprint, taskid, settings.task_memo_ttl_seconds)
+    if existing:
+        status = repo.get_status(existing)
+        if status == "RUNNING":
+            # Same workload already in flight.
+            if payload is None:
+                workloads.delete(taskid)
+            return TaskResponse(taskid=existing)
+        raw = repo.get_result(existing) if status == "DONE" else None
+        if raw is not None:
+            if payload is None:
+                workloads.delete(taskid)
+            result = remap_schema(orjson.loads(raw))
+            manifest = repo.get_manifest(existing)
+            if manifest is not None:
+                manifest = remap_manifest(manifest, schema_of(result))
+            repo.finish(taskid, "DONE", result=result, manifest=manifest)
+            return TaskResponse(taskid=taskid)
+        # The memo's task expired in the meantime or its result is gone: take the memo over,
+        # recording this task before the memo points at it.
+        repo.save(TaskRecord(taskid=taskid, status="RUNNING"))
+        repo.set_memo(fingerprint, taskid, settings.task_memo_ttl_seconds)
+
+    try:
+        if payload is not None:
+            workloads.save(taskid, payload)
+        # The Celery id is our task id, so the worker's completion event names it directly;
+        # the message carries only that id, the workload is read from workload:{taskid}.
+        run_analysis.apply_async(args=[taskid], task_id=taskid)
+    except Exception as exc:
+        # Requests sharing the memo wait on this task; do not leave it RUNNING.
+        repo.finish(taskid, "FAILED", error=str(exc))
+        raise
     return TaskResponse(taskid=taskid)
 
+def _ingest(item, writer: WorkloadWriter, fingerprint: WorkloadFingerprint) -> None:
+    if not isinstance(item, dict):
+        raise ValueError("expected a JSON object")
+    section = item.pop("section", None)
+    if section == "url":
+        if fingerprint.url:
+            raise ValueError("url given twice")
+        url = item.get("url")
+        if not isinstance(url, str) or not url:
+            raise ValueError("url must be a non-empty string")
+        fingerprint.url = url
+    elif section == "ddl":
+        ddl = DDLItem.model_validate(item)
+        writer.add_ddl(ddl)
+        fingerprint.add_ddl(ddl.statement)
+    elif section == "queries":
+        query = QueryItem.model_validate(item)
+        writer.add_query(query)
+        fingerprint.add_query(query.queryid, query.query, query.runquantity)
+    else:
+        raise ValueError(f"unknown section {section!r}")
+
+async def _ndjson_lines_in(chunks):
+    buffer = bytearray()
+    async for chunk in chunks:
+        # Bytes already buffered hold no newline; only the new chunk is searched.
+        start, search_from = 0, len(buffer)
+        buffer += chunk
+        while (end := buffer.find(b"\n", search_from)) != -1:
+            yield bytes(buffer[start:end])
+            start = search_from = end + 1
+        del buffer[:start]
+        if len(buffer) > _MAX_LINE_BYTES:
+            raise ValueError(f"line longer than {_MAX_LINE_BYTES} bytes")
+    if buffer:
+        yield bytes(buffer)
+
 @router.get("/status", response_model=StatusResponse)
 async def get_status(task_id: str = Query(..., alias="task_id"), longpoll: bool = True, _=Depends(require_token)):
-    rec = repo.get(task_id)
-    if not rec:
+    status = await asyncio.to_thread(_status, task_id)
+    if status is None:
         raise HTTPException(status_code=404, detail="Unknown task")
 
-    deadline = time.time() + settings.max_status_longpoll_seconds
-    while longpoll and rec.status == "RUNNING" and time.time() < deadline:
-        time.sleep(1.0)
-        celery_id = repo.r.hget(f"task:{task_id}", "celery_id")
-        if celery_id:
-            from celery.result import AsyncResult
-            ar = AsyncResult(celery_id)
-            if ar.failed():
-                repo.set_status(task_id, "FAILED", error=str(ar.result))
-            elif ar.successful():
-                repo.set_status(task_id, "DONE")
-                repo.set_result(task_id, ar.result)
-        rec = repo.get(task_id)
-
-    return StatusResponse(status=rec.status)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.max_status_longpoll_seconds
+    while longpoll and status == "RUNNING" and (remaining := deadline - loop.time()) > 0:
+        async with task_events.subscription(task_id) as finished:
+            status = await asyncio.to_thread(_status, task_id)
+            if status == "RUNNING":
+                # Woken by the worker's event; the timeout is only a safety net for lost events,
+                # or the polling interval while pub/sub is unavailable.
+                interval = settings.status_reconcile_seconds if task_events.connected else settings.status_poll_seconds
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(finished.wait(), min(remaining, interval))
+                status = await asyncio.to_thread(_status, task_id)
+
+    return StatusResponse(status=status)
+
+def _status(task_id: str) -> Optional[str]:
+    return repo.get_status(task_id)
 
 @router.get("/getresult", response_model=ResultResponse)
-async def get_result(task_id: str = Query(..., alias="task_id"), _=Depends(require_token)):
-    rec = repo.get(task_id)
-    if not rec:
+async def get_result(task_id: str = Query(..., alias="task_id"),
+                     format: str = Query("json", pattern="^(json|ndjson)$"),
+                     offset: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=1),
+                     accept_encoding: str = Header("", alias="Accept-Encoding"),
+                     _=Depends(require_token)):
+    """The stored result, served from its serialized bytes without a pydantic round-trip.
+
+    ``format=ndjson`` streams one line per statement and query; ``offset`` and
+    ``limit`` page the ``queries`` section (the total is in ``X-Total-Queries``).
+    """
+    status = await asyncio.to_thread(repo.get_status, task_id)
+    if status is None:
         raise HTTPException(status_code=404, detail="Unknown task")
-    if rec.status != "DONE" or not rec.result_json:
-        raise HTTPException(status_code=409, detail=f"Task status is {rec.status}")
-    import orjson
-    return ResultResponse(**orjson.loads(rec.result_json))
+    blob = await asyncio.to_thread(repo.get_result_blob, task_id) if status == "DONE" else None
+    if blob is None:
+        raise HTTPException(status_code=409, detail=f"Task status is {status}")
+
+    if format == "ndjson" or offset or limit is not None:
+        # Items are decompressed piecewise and the whole result is never built;
+        # the total was counted once, when the result was stored.
+        total = await asyncio.to_thread(repo.query_count, task_id)
+        headers = {"X-Total-Queries": str(total)} if total is not None else {}
+        stop = offset + limit if limit is not None else None
+        if format == "ndjson":
+            return StreamingResponse(_ndjson_lines(blob, offset, stop), media_type="application/x-ndjson",
+                                     headers=headers)
+        return StreamingResponse(_json_page(blob, offset, stop), media_type="application/json", headers=headers)
+
+    encoding = CONTENT_ENCODINGS.get(blob[:1])
+    if encoding and _accepts_encoding(accept_encoding, encoding):
+        return Response(blob[1:], media_type="application/json",
+                        headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+    return StreamingResponse(iter_decompress(blob), media_type="application/json",
+                             headers={"Vary": "Accept-Encoding"})
+
+def _paged_items(blob: bytes, offset: int, stop: Optional[int]):
+    """Stored items with ``queries`` limited to ``[offset:stop]``; ``(section, None)`` opens a section."""
+    index = 0
+    for section, item in iter_items(iter_decompress(blob)):
+        if section == "queries" and item is not None:
+            index += 1
+            if index <= offset or (stop is not None and index > stop):
+                continue
+        yield section, item
+
+def _ndjson_lines(blob: bytes, offset: int, stop: Optional[int]):
+    batch = []
+    for section, item in _paged_items(blob, offset, stop):
+        if item is None:
+            prefix = b'{"section":' + orjson.dumps(section)
+            continue
+        # The item's own fields follow the section, as orjson.dumps({"section": ..., **item}) writes them.
+        body = item[1:]
+        batch.append(prefix + (body if body.lstrip() == b"}" else b"," + body) + b"\n")
+        if len(batch) >= _NDJSON_BATCH:
+            yield b"".join(batch)
+            batch = []
+    if batch:
+        yield b"".join(batch)
+
+def _json_page(blob: bytes, offset: int, stop: Optional[int]):
+    batch = [b"{"]
+    first_section = True
+    for section, item in _paged_items(blob, offset, stop):
+        if item is None:
+            batch.append((b"" if first_section else b"],") + orjson.dumps(section) + b":[")
+            first_section, first_item = False, True
+            continue
+        batch.append(item if first_item else b"," + item)
+        first_item = False
+        if len(batch) >= _NDJSON_BATCH:
+            yield b"".join(batch)
+            batch = []
+    batch.append(b"}" if first_section else b"]}")
+    yield b"".join(batch)
+
+def _accepts_encoding(header: str, encoding: str) -> bool:
+    """Whether an ``Accept-Encoding`` header allows ``encoding`` (q=0 refuses it)."""
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    q = accepted.get(encoding, accepted.get("*", 0.0))
+    return q > 0
@@ -1,41 +1,141 @@
+import asyncio
 import json
+import logging
+import os
 import re
-import textwrap
 import uuid
-from typing import Dict, List, Optional
-from ..models import NewRequest, SQLStatement, QueryOut
+from typing import Dict, List, Optional, Sequence
+from ..config import settings
+from ..models import DDLItem, NewRequest, QueryItem, SQLStatement, QueryOut
 from ..utils.ddl_parser import DDLTools, TableDefinition
+from ..utils.fingerprint import QueryGroup, apply_to_member, group_queries
 from ..utils.iceberg import recommend_table_properties
+from ..utils.predicates import column_usage
 from ..utils.sql_rewriter import Rewriter
+from .stats_cache import stats_cache
 from .trino_client import TrinoClient
+from .trino_stats import StatsCollector, TableStats
+from .layout import TableLayout, recommend_layout
 from .llm import LLM
+from .metrics import prompt_built, stage
+from .planner import slice_workload
+from .preagg import PreAggregation, recommend_preaggregations
+from .prompt import PromptBuilder, PromptReport
+
+logger = logging.getLogger(__name__)
+
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _by_target(statements: List[SQLStatement], verb: str) -> Dict[str, List[SQLStatement]]:
+    """Statements keyed by the lower-cased table each ``verb`` statement writes."""
+    verb_pattern = r"\s+".join(verb.split())
+    pattern = re.compile(rf"\s*{verb_pattern}\s+([^\s(]+)", re.IGNORECASE)
+    by_target: Dict[str, List[SQLStatement]] = {}
+    for stmt in statements:
+        match = pattern.match(stmt.statement)
+        if match:
+            by_target.setdefault(match.group(1).lower(), []).append(stmt)
+    return by_target
+
 
 class Analyzer:
-    def __init__(self, req: NewRequest):
+    def __init__(self, req: NewRequest, new_schema: Optional[str] = None, context: Sequence[DDLItem] = ()):
+        """``context`` tables are only mapped for query rewriting; no DDL,
+        migration, stats or layout is planned for them."""
         self.req = req
-        self.tables: List[TableDefinition] = DDLTools.parse_tables(req.ddl)
-        self.catalog = self.tables[0].catalog if self.tables else DDLTools.catalog_of_first(req.ddl)
-        self.new_schema = f"opt_{uuid.uuid4().hex[:8]}"
+        with stage("ddl_parse"):
+            self.tables: List[TableDefinition] = DDLTools.parse_tables(req.ddl)
+            self.context_tables: List[TableDefinition] = DDLTools.parse_tables(list(context))
+        known = self.tables or self.context_tables
+        self.catalog = known[0].catalog if known else DDLTools.catalog_of_first(req.ddl)
+        self.new_schema = new_schema or f"opt_{uuid.uuid4().hex[:8]}"
+        self.table_matcher = Rewriter.compile(self._table_mapping())
+        with stage("fingerprint"):
+            self.groups: List[QueryGroup] = group_queries(req.queries)
+        self._group_of: Dict[str, QueryGroup] = {
+            q.queryid: group for group in self.groups for q in group.members
+        }
         self.trino = TrinoClient(req.url)
         self.llm = LLM()
-
-    def run(self) -> dict:
-        fallback_sections = {
-            "ddl": self._ddl_section(),
-            "migrations": self._migrations_section(),
-            "queries": self._queries_section(),
-        }
-
-        llm_plan = self._llm_plan()
+        self.prompt_report: Optional[PromptReport] = None
+        self.slice_reports: List[PromptReport] = []
+        self.table_stats: Dict[str, TableStats] = {}
+        self.layouts: Dict[str, TableLayout] = {}
+        self.preaggregations: List[PreAggregation] = []
+        # queryid -> text before a pre-aggregation rewrite replaced it
+        self.preagg_originals: Dict[str, str] = {}
+
+    def run(self, preaggregate: bool = True) -> dict:
+        with stage("stats"):
+            self.table_stats = self._collect_stats()
+        with stage("layout"):
+            self.layouts = self._recommend_layouts()
+        with stage("fallback_ddl"):
+            ddl, migrations = self._ddl_section(), self._migrations_section()
+        with stage("rewrite"):
+            queries = self._queries_section()
+        fallback_sections = {"ddl": ddl, "migrations": migrations, "queries": queries}
+
+        if settings.llm_planner_mode == "batched":
+            llm_plan = self._batched_llm_plan(fallback_sections)
+        else:
+            llm_plan = self._llm_plan()
+        result = None
         if llm_plan:
-            merged = self._merge_with_fallback(llm_plan, fallback_sections)
-            if merged:
-                return merged
+            with stage("merge"):
+                result = self._merge_with_fallback(llm_plan, fallback_sections)
+        if not result:
+            result = self._sections_to_dict(fallback_sections)
+        if not preaggregate:
+            return result
+        with stage("preagg"):
+            return self.apply_preaggregations(result)
+
+    def apply_preaggregations(self, result: dict) -> dict:
+        """Add pre-aggregated tables for hot aggregation families and point their queries at them."""
+        if not settings.preagg_enabled or not self.tables:
+            return result
+        recommendations = recommend_preaggregations(
+            self.groups,
+            self.table_matcher,
+            self._columns_by_target(),
+            f"{self.catalog}.{self.new_schema}",
+            settings.preagg_min_runs,
+            settings.preagg_max_tables,
+        )
+        if not recommendations:
+            return result
+        self.preaggregations = recommendations
+        rewritten = {qid: text for rec in recommendations for qid, text in rec.queries.items()}
+        self.preagg_originals = {q["queryid"]: q["query"] for q in result["queries"] if q["queryid"] in rewritten}
+        return {
+            "ddl": result["ddl"] + [{"statement": rec.ddl} for rec in recommendations],
+            "migrations": result["migrations"] + [{"statement": rec.migration} for rec in recommendations],
+            "queries": [
+                {"queryid": q["queryid"], "query": rewritten.get(q["queryid"], q["query"])}
+                for q in result["queries"]
+            ],
+        }
 
-        return self._sections_to_dict(fallback_sections)
+    def _collect_stats(self) -> Dict[str, TableStats]:
+        if not settings.trino_stats_enabled or not self.tables:
+            return {}
+        names = list(dict.fromkeys(f"{t.catalog}.{t.schema}.{t.table}" for t in self.tables))
+        collector = StatsCollector(self.trino.query)
+        if not settings.trino_stats_cache_enabled:
+            return collector.collect(names)
+        cluster = f"{self.trino.params.host}:{self.trino.params.port}"
+        return collector.collect_cached(names, stats_cache, cluster)
 
     def _ddl_section(self) -> List[SQLStatement]:
-        if self.tables:
+        if self.tables or self.context_tables:
             return self._ddl_from_existing_tables()
         props = recommend_table_properties()
         props_str = ",\n  ".join([f"'{k}'='{v}'" for k, v in props.items()])
@@ -44,7 +144,7 @@ class Analyzer:
             SQLStatement(statement=(
                 f"CREATE TABLE {self.catalog}.{self.new_schema}.fact_events (\n"
                 f"  event_id BIGINT,\n  user_id BIGINT,\n  ts TIMESTAMP,\n  sku VARCHAR,\n  price DOUBLE\n)\n"
-                f"WITH (\n  partitioning = ARRAY['days(ts)'],\n  {props_str}\n)"
+                f"WITH (\n  partitioning = ARRAY['day(ts)'],\n  {props_str}\n)"
             )),
             SQLStatement(statement=(
                 f"CREATE TABLE {self.catalog}.{self.new_schema}.dim_users (\n"
@@ -55,7 +155,7 @@ class Analyzer:
         return statements
 
     def _migrations_section(self) -> List[SQLStatement]:
-        if self.tables:
+        if self.tables or self.context_tables:
             return self._migration_from_existing_tables()
         mig = [
             SQLStatement(statement=(
@@ -73,8 +173,25 @@ class Analyzer:
         return mig
 
     def _queries_section(self):
-        mapping = self._table_mapping()
-        return Rewriter.rewrite(self.req.queries, mapping)
+        # Members of a fingerprint group keep their own comments, layout and
+        # keyword case, so only byte-identical texts share one rewrite.
+        unique: Dict[str, QueryItem] = {}
+        for q in self.req.queries:
+            unique.setdefault(q.query, q)
+        items = list(unique.values())
+        rewritten = Rewriter.rewrite(
+            items,
+            self.table_matcher,
+            workers=self._rewrite_workers(len(items)),
+            chunk_size=settings.rewrite_chunk_size,
+        )
+        text_of = {q.query: out.query for q, out in zip(items, rewritten)}
+        return [QueryOut(queryid=q.queryid, query=text_of[q.query]) for q in self.req.queries]
+
+    def _rewrite_workers(self, query_count: int) -> int:
+        if query_count < settings.rewrite_parallel_min_queries:
+            return 1
+        return settings.rewrite_workers or os.cpu_count() or 1
 
     def _sections_to_dict(self, sections: Dict[str, List]) -> dict:
         return {
@@ -87,22 +204,46 @@ class Analyzer:
         statements: List[SQLStatement] = [
             SQLStatement(statement=f"CREATE SCHEMA {self.catalog}.{self.new_schema}"),
         ]
-        props = recommend_table_properties()
-        props_str = ",\n  ".join([f"'{k}'='{v}'" for k, v in props.items()])
-
         for table in self.tables:
-            columns_and_options = table.body or ""
-            statement = (
-                f"CREATE TABLE {self.catalog}.{self.new_schema}.{table.table} "
-                f"{columns_and_options}"
-            ).rstrip()
-            if "WITH" not in columns_and_options.upper():
-                statement = (
-                    f"{statement}\nWITH (\n  {props_str}\n)"
-                )
+            target = f"{self.catalog}.{self.new_schema}.{table.table}"
+            stats = self.table_stats.get(f"{table.catalog}.{table.schema}.{table.table}")
+            props = recommend_table_properties(stats)
+            layout = self.layouts.get(target) or TableLayout()
+            columns, options = DDLTools.split_body(table.body or "")
+            entries = layout.properties() + [f"'{k}'='{v}'" for k, v in props.items()]
+            tail = ""
+            existing = DDLTools.split_properties(options)
+            if existing:
+                # Keep the table's own properties; add only layout keys it does not set.
+                options, own, tail = existing
+                entries = [
+                    entry for entry in layout.properties()
+                    if not re.search(rf"\b{entry.split(' =')[0]}\s*=", ",".join(own), re.IGNORECASE)
+                ] + own
+            statement = f"CREATE TABLE {target} {columns}{options}".rstrip()
+            statement = f"{statement}\nWITH (\n  " + ",\n  ".join(entries) + "\n)" + tail.rstrip()
             statements.append(SQLStatement(statement=statement))
         return statements
 
+    def _columns_by_target(self) -> Dict[str, Dict[str, str]]:
+        return {
+            f"{self.catalog}.{self.new_schema}.{t.table}": DDLTools.columns(t) for t in self.tables
+        }
+
+    def _recommend_layouts(self) -> Dict[str, TableLayout]:
+        """Partitioning and sort order per new-schema table, from the workload."""
+        tables = {f"{self.catalog}.{self.new_schema}.{t.table}": t for t in self.tables}
+        columns = self._columns_by_target()
+        usage = column_usage(self.groups, self.table_matcher, columns)
+        return {
+            target: recommend_layout(
+                columns[target],
+                usage.get(target, {}),
+                self.table_stats.get(f"{table.catalog}.{table.schema}.{table.table}"),
+            )
+            for target, table in tables.items()
+        }
+
     def _migration_from_existing_tables(self) -> List[SQLStatement]:
         migrations: List[SQLStatement] = []
         for table in self.tables:
@@ -118,7 +259,7 @@ class Analyzer:
 
     def _table_mapping(self) -> Dict[str, str]:
         mapping: Dict[str, str] = {}
-        for table in self.tables:
+        for table in self.tables + self.context_tables:
             target = f"{self.catalog}.{self.new_schema}.{table.table}"
             source_variants = [
                 f"{table.catalog}.{table.schema}.{table.table}",
@@ -134,26 +275,106 @@ class Analyzer:
         return mapping
 
     def _llm_plan(self) -> Optional[dict]:
-        prompt = self._build_prompt()
+        with stage("prompt_build"):
+            prompt = self._build_prompt()
         try:
-            raw = self.llm.suggest(prompt)
+            with stage("llm_call"):
+                raw = self.llm.suggest(prompt, aliases={"{{new_schema}}": self.new_schema})
         except Exception:
             return None
+        with stage("json_extract"):
+            return self._parse_plan(raw)
+
+    def _batched_llm_plan(self, fallback: Dict[str, List]) -> Optional[dict]:
+        """Plan each table cluster with its own concurrent LLM call.
+
+        Every fragment is validated against the fallback for its own slice
+        only, so a bad response costs that slice rather than the whole plan.
+        """
+        target_of = {
+            f"{self.catalog}.{self.new_schema}.{table.table}": i for i, table in enumerate(self.tables)
+        }
+        slices = slice_workload(
+            self.tables, self.groups, self.table_matcher, target_of, settings.llm_planner_max_slices
+        )
+        if len(slices) < 2:
+            return self._llm_plan()
+        if _in_event_loop():
+            # asyncio.run cannot block inside a running loop; plan with one synchronous call instead.
+            logger.warning("batched LLM planning needs its own event loop; planning %d slices in one prompt", len(slices))
+            return self._llm_plan()
+
+        builder = PromptBuilder(self.catalog, self.new_schema, self.table_matcher)
+        prompts = []
+        with stage("prompt_build"):
+            for plan_slice in slices:
+                prompt, report = builder.build(plan_slice.tables, plan_slice.groups)
+                prompts.append(prompt)
+                self.slice_reports.append(report)
+                prompt_built(report, "slice")
+        with stage("llm_call"):
+            raws = asyncio.run(self._suggest_all(prompts))
+        with stage("json_extract"):
+            fragments = [(self._parse_plan(raw) if isinstance(raw, str) else None) or {} for raw in raws]
+
+        with stage("merge"):
+            ddl_of = _by_target(fallback["ddl"][1:], "CREATE TABLE")
+            migration_of = _by_target(fallback["migrations"], "INSERT INTO")
+            query_of = {id(q): out for q, out in zip(self.req.queries, fallback["queries"])}
+
+            ddl: List[SQLStatement] = [fallback["ddl"][0]]
+            migrations: List[SQLStatement] = []
+            chosen: Dict[int, QueryOut] = {}
+            for plan_slice, fragment in zip(slices, fragments):
+                targets = list(dict.fromkeys(
+                    f"{self.catalog}.{self.new_schema}.{t.table}".lower() for t in plan_slice.tables
+                ))
+                slice_ddl = self._select_ddl(fragment.get("ddl"), [s for t in targets for s in ddl_of.get(t, [])])
+                ddl.extend(stmt for stmt in slice_ddl if not stmt.statement.lower().startswith("create schema"))
+                migrations.extend(
+                    self._select_migrations(
+                        fragment.get("migrations"), [s for t in targets for s in migration_of.get(t, [])]
+                    )
+                )
+                members = {id(q) for group in plan_slice.groups for q in group.members}
+                slice_queries = [q for q in self.req.queries if id(q) in members]
+                selected = self._select_queries(fragment.get("queries"), [query_of[id(q)] for q in slice_queries])
+                chosen.update(zip(map(id, slice_queries), selected))
 
+        return self._sections_to_dict(
+            {"ddl": ddl, "migrations": migrations, "queries": [chosen[id(q)] for q in self.req.queries]}
+        )
+
+    async def _suggest_all(self, prompts: List[str]) -> List:
+        semaphore = asyncio.Semaphore(max(1, settings.llm_planner_concurrency))
+        aliases = {"{{new_schema}}": self.new_schema}
+
+        async def suggest(prompt: str) -> str:
+            async with semaphore:
+                return await self.llm.asuggest(prompt, aliases=aliases)
+
+        try:
+            return await asyncio.gather(*(suggest(p) for p in prompts), return_exceptions=True)
+        finally:
+            await self.llm.aclose()
+
+    def _parse_plan(self, raw: str) -> Optional[dict]:
         snippet = self._extract_json_snippet(raw)
         if not snippet:
             return None
         try:
-            return json.loads(snippet)
+            plan = json.loads(snippet)
         except json.JSONDecodeError:
             return None
+        return plan if isinstance(plan, dict) else None
 
     def _merge_with_fallback(self, plan: dict, fallback: Dict[str, List]) -> Optional[dict]:
         ddl = self._select_ddl(plan.get("ddl"), fallback["ddl"])
         migrations = self._select_migrations(plan.get("migrations"), fallback["migrations"])
         queries = self._select_queries(plan.get("queries"), fallback["queries"])
 
-        if ddl and migrations and queries:
+        # A plan with no tables of its own (only context) has no migrations to check.
+        if ddl and queries and (migrations or not fallback["migrations"]):
             return self._sections_to_dict({"ddl": ddl, "migrations": migrations, "queries": queries})
         return None
 
@@ -174,13 +395,11 @@ class Analyzer:
     def _select_queries(self, candidate, fallback: List[QueryOut]) -> List[QueryOut]:
         candidates = {q.queryid: q for q in self._to_query_outputs(candidate)}
 
-        mapping = self._table_mapping()
         selected: List[QueryOut] = []
         for query in fallback:
-            if query.queryid in candidates:
-                text = candidates[query.queryid].query.strip()
-                text = Rewriter.qualify_names(text, mapping)
-                text = Rewriter.apply_rules(text)
+            text = self._candidate_text(query.queryid, candidates)
+            if text is not None:
+                text = Rewriter.rewrite_query(text, self.table_matcher)
                 selected.append(QueryOut(queryid=query.queryid, query=text))
             else:
                 selected.append(query)
@@ -190,6 +409,17 @@ class Analyzer:
             return selected
         return fallback
 
+    def _candidate_text(self, queryid: str, candidates: Dict[str, QueryOut]) -> Optional[str]:
+        """LLM rewrite for ``queryid``, taken from its group representative if needed."""
+        if queryid in candidates:
+            return candidates[queryid].query.strip()
+        group = self._group_of.get(queryid)
+        if group is None or group.representative.queryid not in candidates:
+            return None
+        member = next(q for q in group.members if q.queryid == queryid)
+        text = candidates[group.representative.queryid].query.strip()
+        return apply_to_member(text, group.representative, member)
+
     def _to_sql_statements(self, items) -> List[SQLStatement]:
         statements: List[SQLStatement] = []
         if not isinstance(items, list):
@@ -251,41 +481,10 @@ class Analyzer:
         return prefix in statement.lower()
 
     def _build_prompt(self) -> str:
-        ddl_lines = []
-        for table in self.tables:
-            summary = table.body.replace("\n", " ") if table.body else "(columns unavailable)"
-            ddl_lines.append(f"- {table.catalog}.{table.schema}.{table.table}: {summary[:280]}")
-        if not ddl_lines:
-            ddl_lines.append("- (no existing tables parsed; design a star-schema around events and dimensions)")
-
-        query_lines = []
-        for q in self.req.queries:
-            snippet = q.query.replace("\n", " ")
-            query_lines.append(f"- {q.queryid} (runs {q.runquantity}): {snippet[:320]}")
-        if not query_lines:
-            query_lines.append("- (no queries provided)")
-
-        prompt = f"""
-        You are an expert in Trino + Apache Iceberg performance optimisation.
-        Catalogue name: {self.catalog}
-        Use the new schema name {self.new_schema} for all optimised artefacts.
-
-        Existing tables:
-        {chr(10).join(ddl_lines)}
-
-        Observed SQL workload:
-        {chr(10).join(query_lines)}
-
-        Produce a JSON object with keys "ddl", "migrations" and "queries".
-        Each list item must be an object with a "statement" (for ddl/migrations) or "query" and "queryid" (for queries).
-        Rules:
-        1. Fully qualify every table reference as {self.catalog}.<schema>.<table>.
-        2. The first DDL statement must be exactly "CREATE SCHEMA {self.catalog}.{self.new_schema}".
-        3. Rewritten queries must keep their original queryid values and target the new schema {self.new_schema}.
-        4. Optimise for denormalised or star-schema patterns and Iceberg best practices (partitioning, properties).
-        5. Respond with JSON only (no Markdown fences, no explanations).
-        """
-        return textwrap.dedent(prompt).strip()
+        builder = PromptBuilder(self.catalog, self.new_schema, self.table_matcher)
+        prompt, self.prompt_report = builder.build(self.tables, self.groups)
+        prompt_built(self.prompt_report, "single")
+        return prompt
 
     @staticmethod
     def _extract_json_snippet(text: str) -> Optional[str]:
@@ -0,0 +1,153 @@
+"""Process-wide pooled HTTP clients for LLM providers.
+
+One keep-alive ``httpx.Client`` per process (re-created after a fork, as
+Celery prefork workers do) and one ``httpx.AsyncClient`` per event loop.
+Requests are retried with exponential backoff on connection failures and
+on 429/5xx gateway responses.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, Optional
+
+import httpx
+
+from ..config import settings
+
+_RETRY_STATUSES = {429, 502, 503, 504}
+_RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError, httpx.PoolTimeout)
+
+_lock = threading.Lock()
+_client: Optional[httpx.Client] = None
+_client_pid: Optional[int] = None
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.llm_http_max_connections,
+        max_keepalive_connections=settings.llm_http_max_keepalive,
+        keepalive_expiry=settings.llm_http_keepalive_expiry,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        settings.llm_http_read_timeout,
+        connect=settings.llm_http_connect_timeout,
+    )
+
+
+def get_http_client() -> httpx.Client:
+    global _client, _client_pid
+    with _lock:
+        if _client is None or _client_pid != os.getpid() or _client.is_closed:
+            # A client inherited across fork shares sockets with the parent; start fresh.
+            _client = httpx.Client(limits=_limits(), timeout=_timeout())
+            _client_pid = os.getpid()
+        return _client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(limits=_limits(), timeout=_timeout())
+        _async_clients[loop] = client
+    return client
+
+
+async def aclose_async_http_client() -> None:
+    """Close the running loop's client; call before a short-lived loop ends."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _backoff(attempt: int) -> float:
+    return settings.llm_http_backoff_seconds * (2 ** attempt)
+
+
+def _retryable(response: httpx.Response) -> bool:
+    return response.status_code in _RETRY_STATUSES
+
+
+def request_with_retries(client: httpx.Client, method: str, url: str, **kwargs) -> httpx.Response:
+    for attempt in range(settings.llm_http_retries + 1):
+        last = attempt == settings.llm_http_retries
+        try:
+            response = client.request(method, url, **kwargs)
+        except _RETRY_ERRORS:
+            if last:
+                raise
+        else:
+            if last or not _retryable(response):
+                return response
+        time.sleep(_backoff(attempt))
+    raise AssertionError("unreachable")
+
+
+@contextmanager
+def stream_with_retries(client: httpx.Client, method: str, url: str, **kwargs) -> Iterator[httpx.Response]:
+    """Open a streaming response, retrying only until the response headers arrive."""
+    for attempt in range(settings.llm_http_retries + 1):
+        last = attempt == settings.llm_http_retries
+        try:
+            response = client.send(client.build_request(method, url, **kwargs), stream=True)
+        except _RETRY_ERRORS:
+            if last:
+                raise
+        else:
+            if last or not _retryable(response):
+                try:
+                    yield response
+                finally:
+                    response.close()
+                return
+            response.close()
+        time.sleep(_backoff(attempt))
+
+
+@asynccontextmanager
+async def astream_with_retries(
+    client: httpx.AsyncClient, method: str, url: str, **kwargs
+) -> AsyncIterator[httpx.Response]:
+    for attempt in range(settings.llm_http_retries + 1):
+        last = attempt == settings.llm_http_retries
+        try:
+            response = await client.send(client.build_request(method, url, **kwargs), stream=True)
+        except _RETRY_ERRORS:
+            if last:
+                raise
+        else:
+            if last or not _retryable(response):
+                try:
+                    yield response
+                finally:
+                    await response.aclose()
+                return
+            await response.aclose()
+        await asyncio.sleep(_backoff(attempt))
+
+
+async def arequest_with_retries(client: httpx.AsyncClient, method: str, url: str, **kwargs) -> httpx.Response:
+    for attempt in range(settings.llm_http_retries + 1):
+        last = attempt == settings.llm_http_retries
+        try:
+            response = await client.request(method, url, **kwargs)
+        except _RETRY_ERRORS:
+            if last:
+                raise
+        else:
+            if last or not _retryable(response):
+                return response
+        await asyncio.sleep(_backoff(attempt))
+    raise AssertionError("unreachable")
@@ -0,0 +1,212 @@
+"""Incremental re-analysis against a finished base task.
+
+Every finished task stores a manifest next to its result: a hash per source
+table DDL and per query, the schema it created and which queries were
+rewritten onto pre-aggregated tables. A new task naming that task as its
+base re-plans only the delta:
+
+* tables whose DDL changed or that have no statement in the base result,
+* queries that are new, whose text changed, or whose base rewrite reads a
+  changed table,
+
+through a sub-analysis (Trino stats, layouts and the LLM) over just those
+tables and queries; unchanged tables the delta queries read are passed as
+rewrite context only. Everything else is copied from the base result with
+its schema renamed, except statements for tables no longer in the workload. Pre-aggregations
+are recomputed over the whole workload afterwards since they depend on run
+counts across query families; that step needs no LLM or Trino calls.
+Changes in ``runquantity`` alone do not re-plan a table's layout.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from typing import List, Optional, Set, Tuple
+
+from ..models import DDLItem, NewRequest
+from ..utils.ddl_parser import TableDefinition
+from ..utils.sql_rewriter import Rewriter
+from .analyzer import Analyzer
+from .memo import remap_schema, schema_of, strip_credentials
+
+MANIFEST_VERSION = 1
+
+
+def analyze(
+    req: NewRequest, base_result: Optional[dict] = None, base_manifest: Optional[dict] = None
+) -> Tuple[dict, dict]:
+    """Result and manifest for ``req``, reusing ``base_result`` where it still applies."""
+    analyzer = Analyzer(req)
+    result = None
+    if base_result is not None and base_manifest is not None:
+        result = _incremental(analyzer, base_result, base_manifest)
+    if result is None:
+        result = analyzer.run()
+    return result, manifest(analyzer)
+
+
+def manifest(analyzer: Analyzer) -> dict:
+    return {
+        "version": MANIFEST_VERSION,
+        "url": strip_credentials(analyzer.req.url),
+        "catalog": analyzer.catalog,
+        "schema": analyzer.new_schema,
+        "tables": {_source(t): _digest(t.original_statement.strip()) for t in analyzer.tables},
+        "queries": {q.queryid: _digest(q.query) for q in analyzer.req.queries},
+        "preagg_tables": [rec.table for rec in analyzer.preaggregations],
+        "preagg_originals": analyzer.preagg_originals,
+    }
+
+
+def _incremental(analyzer: Analyzer, base_result: dict, base_manifest: dict) -> Optional[dict]:
+    if (
+        base_manifest.get("version") != MANIFEST_VERSION
+        or base_manifest.get("url") != strip_credentials(analyzer.req.url)
+        or base_manifest.get("catalog") != analyzer.catalog
+        or not analyzer.tables
+    ):
+        return None
+    old_schema = schema_of(base_result)
+    if not old_schema or old_schema != base_manifest.get("schema"):
+        return None
+    new_schema = analyzer.new_schema
+    base = remap_schema(base_result, new_schema)
+
+    def renamed(text: str) -> str:
+        return text.replace(old_schema, new_schema)
+
+    # Undo the base pre-aggregations; they are recomputed over the whole workload below.
+    preagg_tables = [renamed(t) for t in base_manifest.get("preagg_tables", [])]
+    originals = {qid: renamed(text) for qid, text in base_manifest.get("preagg_originals", {}).items()}
+    base_ddl = [s["statement"] for s in base["ddl"][1:] if not _mentions_any(s["statement"], preagg_tables)]
+    base_migrations = [s["statement"] for s in base["migrations"] if not _mentions_any(s["statement"], preagg_tables)]
+    base_queries = {q["queryid"]: originals.get(q["queryid"], q["query"]) for q in base["queries"]}
+
+    target_of = {id(t): f"{analyzer.catalog}.{new_schema}.{t.table}" for t in analyzer.tables}
+    ddl_of = {id(t): _statement_for(base_ddl, "CREATE TABLE", target_of[id(t)]) for t in analyzer.tables}
+    migration_of = {id(t): _statement_for(base_migrations, "INSERT INTO", target_of[id(t)]) for t in analyzer.tables}
+    table_hashes = base_manifest.get("tables", {})
+    changed = [
+        t for t in analyzer.tables
+        if table_hashes.get(_source(t)) != _digest(t.original_statement.strip())
+        or ddl_of[id(t)] is None
+        or migration_of[id(t)] is None
+    ]
+    changed_targets = [target_of[id(t)] for t in changed]
+    query_hashes = base_manifest.get("queries", {})
+    delta = [
+        q for q in analyzer.req.queries
+        if q.queryid not in base_queries
+        or query_hashes.get(q.queryid) != _digest(q.query)
+        or _mentions_any(base_queries[q.queryid], changed_targets)
+    ]
+
+    sub_ddl: List[str] = []
+    sub_migrations: List[str] = []
+    sub_queries = {}
+    context = [t for t in _tables_read(analyzer, delta, target_of) if t not in changed]
+    if changed or context:
+        sub_req = NewRequest(
+            url=analyzer.req.url,
+            ddl=[DDLItem(statement=t.original_statement) for t in changed],
+            queries=delta,
+        )
+        sub = Analyzer(sub_req, new_schema=new_schema, context=[DDLItem(statement=t.original_statement) for t in context])
+        sub_result = sub.run(preaggregate=False)
+        sub_ddl = [s["statement"] for s in sub_result["ddl"][1:]]
+        sub_migrations = [s["statement"] for s in sub_result["migrations"]]
+        sub_queries = {q["queryid"]: q["query"] for q in sub_result["queries"]}
+    else:
+        # The delta reads none of the known tables; there is nothing to plan.
+        sub_queries = {q.queryid: Rewriter.rewrite_query(q.query, analyzer.table_matcher) for q in delta}
+
+    is_changed = {id(t) for t in changed}
+    ddl: List[str] = []
+    migrations: List[str] = []
+    for table in analyzer.tables:
+        target = target_of[id(table)]
+        if id(table) in is_changed:
+            statement = _statement_for(sub_ddl, "CREATE TABLE", target) or ddl_of[id(table)]
+            migration = _statement_for(sub_migrations, "INSERT INTO", target) or migration_of[id(table)]
+        else:
+            statement, migration = ddl_of[id(table)], migration_of[id(table)]
+        if statement:
+            ddl.append(statement)
+        if migration:
+            migrations.append(migration)
+    # Statements for no source table's target (e.g. extra tables the LLM planned) are kept
+    # only while every table of the new schema they name is still there and unchanged.
+    targets = list(target_of.values())
+    schema_prefix = f"{analyzer.catalog}.{new_schema}."
+    surviving = {t.lower() for t in targets if t not in changed_targets}
+
+    def extra(statement: str, verb: str) -> bool:
+        return not any(_statement_for([statement], verb, t) for t in targets)
+
+    def still_valid(statement: str, verb: str) -> bool:
+        own = _target_of(statement, verb, schema_prefix)
+        named = _schema_tables(statement, schema_prefix) - {own}
+        return own not in removed_targets and named <= surviving
+
+    removed_targets = {
+        f"{schema_prefix}{source.rsplit('.', 1)[-1]}".lower() for source in table_hashes
+    } - {t.lower() for t in targets}
+    ddl += [s for s in base_ddl if extra(s, "CREATE TABLE") and still_valid(s, "CREATE TABLE")]
+    ddl += [s for s in sub_ddl if extra(s, "CREATE TABLE")]
+    migrations += [s for s in base_migrations if extra(s, "INSERT INTO") and still_valid(s, "INSERT INTO")]
+    migrations += [s for s in sub_migrations if extra(s, "INSERT INTO")]
+
+    result = {
+        "ddl": [{"statement": f"CREATE SCHEMA {analyzer.catalog}.{new_schema}"}]
+        + [{"statement": s} for s in dict.fromkeys(ddl)],
+        "migrations": [{"statement": s} for s in dict.fromkeys(migrations)],
+        "queries": [
+            {"queryid": q.queryid, "query": sub_queries.get(q.queryid, base_queries.get(q.queryid, q.query))}
+            for q in analyzer.req.queries
+        ],
+    }
+    return analyzer.apply_preaggregations(result)
+
+
+def _tables_read(analyzer: Analyzer, delta, target_of) -> List[TableDefinition]:
+    """Tables the delta queries read, in DDL order."""
+    table_of = {target.lower(): id_ for id_, target in target_of.items()}
+    wanted: Set[int] = set()
+    for query in delta:
+        for target in Rewriter.referenced_tables(query.query, analyzer.table_matcher):
+            if target.lower() in table_of:
+                wanted.add(table_of[target.lower()])
+    return [t for t in analyzer.tables if id(t) in wanted]
+
+
+def _statement_for(statements: List[str], verb: str, target: str) -> Optional[str]:
+    """First statement that starts with ``verb`` followed by ``target``."""
+    verb_pattern = r"\s+".join(verb.split())
+    pattern = re.compile(rf"^\s*{verb_pattern}\s+{re.escape(target)}(?![\w.])", re.IGNORECASE)
+    return next((s for s in statements if pattern.search(s)), None)
+
+
+def _target_of(statement: str, verb: str, schema_prefix: str) -> Optional[str]:
+    """Lower-cased table a ``verb`` statement writes, when it is in the new schema."""
+    verb_pattern = r"\s+".join(verb.split())
+    match = re.match(rf"\s*{verb_pattern}\s+({re.escape(schema_prefix)}[\w$]+)", statement, re.IGNORECASE)
+    return match.group(1).lower() if match else None
+
+
+def _schema_tables(statement: str, schema_prefix: str) -> Set[str]:
+    """Lower-cased new-schema tables named anywhere in ``statement``."""
+    return {m.lower() for m in re.findall(rf"{re.escape(schema_prefix)}[\w$]+", statement, re.IGNORECASE)}
+
+
+def _mentions_any(text: str, names: List[str]) -> bool:
+    lowered = text.lower()
+    return any(re.search(rf"{re.escape(n.lower())}(?![\w.])", lowered) for n in names)
+
+
+def _source(table: TableDefinition) -> str:
+    return f"{table.catalog}.{table.schema}.{table.table}"
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
@@ -0,0 +1,114 @@
+"""Incremental validation of a streamed LLM completion that should be JSON.
+
+The guard is fed chunks as they arrive and tells the caller when to stop:
+either the top-level object has closed (anything after it is chatter), or
+the output is clearly not going to contain a JSON object.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import List, Optional
+
+CONTINUE = "continue"
+COMPLETE = "complete"
+ABORT = "abort"
+
+_THINK_OPEN = "<think>"
+_THINK_CLOSE = "</think>"
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class JSONStreamGuard:
+    def __init__(self, prefix_limit: int):
+        # Non-whitespace characters tolerated before the object starts
+        # (``<think>`` blocks and Markdown fences are allowed on top of this).
+        self.prefix_limit = prefix_limit
+        self.state = CONTINUE
+        self._buf = ""
+        self._pos = 0
+        self._prose = 0
+        self._in_think = False
+        self._stack: List[str] = []
+        self._start = -1
+        self._end = -1
+        self._in_string = False
+        self._escaped = False
+
+    @property
+    def text(self) -> str:
+        """Output so far, cut right after the top-level object once complete."""
+        return self._buf[: self._end] if self.state == COMPLETE else self._buf
+
+    @property
+    def snippet(self) -> Optional[str]:
+        return self._buf[self._start : self._end] if self.state == COMPLETE else None
+
+    def feed(self, chunk: str) -> str:
+        self._buf += chunk
+        buf = self._buf
+        while self._pos < len(buf) and self.state == CONTINUE:
+            if self._in_think:
+                end = buf.find(_THINK_CLOSE, self._pos)
+                if end == -1:
+                    # Keep enough of the tail to spot a tag split across chunks.
+                    self._pos = max(self._pos, len(buf) - len(_THINK_CLOSE))
+                    break
+                self._pos = end + len(_THINK_CLOSE)
+                self._in_think = False
+                continue
+
+            if not self._stack:
+                if buf.startswith(_THINK_OPEN, self._pos):
+                    self._in_think = True
+                    self._pos += len(_THINK_OPEN)
+                    continue
+                if _THINK_OPEN.startswith(buf[self._pos :]):
+                    break  # possibly the start of a tag; wait for more
+                ch = buf[self._pos]
+                if ch == "{":
+                    self._stack.append("}")
+                    self._start = self._pos
+                elif not ch.isspace() and ch != "`":
+                    self._prose += 1
+                    if self._prose > self.prefix_limit:
+                        self.state = ABORT
+                self._pos += 1
+                continue
+
+            self._scan_object_char(buf[self._pos])
+            self._pos += 1
+        return self.state
+
+    def _scan_object_char(self, ch: str) -> None:
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif ch == "\\":
+                self._escaped = True
+            elif ch == '"':
+                self._in_string = False
+            return
+        if ch == '"':
+            self._in_string = True
+        elif ch in _CLOSERS:
+            self._stack.append(_CLOSERS[ch])
+        elif ch in ("}", "]"):
+            if ch != self._stack.pop():
+                self.state = ABORT
+            elif not self._stack:
+                self._close_object()
+
+    def _close_object(self) -> None:
+        end = self._pos + 1
+        try:
+            json.loads(self._buf[self._start : end])
+        except json.JSONDecodeError:
+            # Braces in prose ("{the plan}"): count it as prefix and keep looking.
+            self._prose += end - self._start
+            if self._prose > self.prefix_limit:
+                self.state = ABORT
+            self._start = -1
+            return
+        self._end = end
+        self.state = COMPLETE
@@ -0,0 +1,103 @@
+"""Iceberg partitioning and sort order derived from the observed workload.
+
+The most heavily filtered temporal column is partitioned by ``day()``; an
+equality-filtered column is partitioned as-is when it has few distinct
+values, otherwise by ``bucket()``. Columns used for point lookups, joins and
+grouping that are not already partition sources become ``sorted_by`` keys,
+so Parquet min/max pruning works inside each partition.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional
+
+from ..utils.iceberg import GB
+from ..utils.predicates import EQ, GROUP, JOIN, ORDER, RANGE
+from .trino_stats import TableStats
+
+_TEMPORAL_TYPES = ("date", "timestamp")
+# Equality-filtered columns with at most this many values are partitioned by identity.
+_IDENTITY_MAX_NDV = 64
+_BUCKETS = 16
+# A second partition column must be filtered at least this fraction as often as the first.
+_SECOND_PARTITION_SHARE = 0.5
+_MAX_SORT_COLUMNS = 3
+# Below this size partitions would mostly produce tiny files.
+_MIN_PARTITIONED_BYTES = 1 * GB
+
+
+@dataclass
+class TableLayout:
+    partitioning: List[str] = field(default_factory=list)
+    sorted_by: List[str] = field(default_factory=list)
+
+    def properties(self) -> List[str]:
+        """Trino ``WITH`` clause entries for this layout."""
+        out = []
+        if self.partitioning:
+            out.append(f"partitioning = ARRAY[{_quoted(self.partitioning)}]")
+        if self.sorted_by:
+            out.append(f"sorted_by = ARRAY[{_quoted(self.sorted_by)}]")
+        return out
+
+
+def recommend_layout(
+    columns: Mapping[str, str], usage: Mapping[str, Counter], stats: Optional[TableStats] = None
+) -> TableLayout:
+    """Layout for one table from its ``columns`` (name -> type) and workload ``usage``."""
+    usage = {c: u for c, u in usage.items() if c in columns}
+    layout = TableLayout()
+    if not usage:
+        return layout
+
+    if not _too_small(stats):
+        filters = sorted(
+            ((u[EQ] + u[RANGE], c) for c, u in usage.items() if u[EQ] + u[RANGE]), reverse=True
+        )
+        temporal = [(w, c) for w, c in filters if _is_temporal(columns[c])]
+        equality = [(usage[c][EQ], c) for _, c in filters if not _is_temporal(columns[c]) and usage[c][EQ]]
+        top = filters[0][0] if filters else 0
+        if temporal:
+            layout.partitioning.append(f"day({temporal[0][1]})")
+        if equality:
+            weight, column = max(equality)
+            if not layout.partitioning or weight >= top * _SECOND_PARTITION_SHARE:
+                layout.partitioning.append(_value_transform(column, stats))
+
+    partitioned = {_source_column(p) for p in layout.partitioning}
+    ranked = sorted(
+        ((u[EQ] + u[JOIN] + u[GROUP] + u[ORDER] + u[RANGE], c) for c, u in usage.items() if c not in partitioned),
+        reverse=True,
+    )
+    layout.sorted_by = [c for weight, c in ranked[:_MAX_SORT_COLUMNS] if weight > 0]
+    return layout
+
+
+def _value_transform(column: str, stats: Optional[TableStats]) -> str:
+    ndv = stats.ndv.get(column) if stats is not None else None
+    if ndv is not None and ndv <= _IDENTITY_MAX_NDV:
+        return column
+    return f"bucket({column}, {_BUCKETS})"
+
+
+def _too_small(stats: Optional[TableStats]) -> bool:
+    if stats is None:
+        return False
+    size = stats.total_file_bytes or stats.data_size_bytes
+    return size is not None and size < _MIN_PARTITIONED_BYTES
+
+
+def _is_temporal(column_type: str) -> bool:
+    return column_type.strip().lower().startswith(_TEMPORAL_TYPES)
+
+
+def _source_column(transform: str) -> str:
+    if "(" not in transform:
+        return transform
+    return transform[transform.index("(") + 1 :].split(",")[0].rstrip(")").strip()
+
+
+def _quoted(items: List[str]) -> str:
+    return ", ".join(f"'{item}'" for item in items)
@@ -1,6 +1,24 @@
 from ..config import settings
+import asyncio
 import httpx
+import json
+import os
+import threading
+import weakref
 from functools import lru_cache
+from typing import Any, Dict, Optional
+from .http_pool import (
+    aclose_async_http_client,
+    arequest_with_retries,
+    astream_with_retries,
+    get_async_http_client,
+    get_http_client,
+    request_with_retries,
+    stream_with_retries,
+)
+from .json_stream import ABORT, CONTINUE, JSONStreamGuard
+from .llm_cache import llm_cache
+from .qwen_batcher import get_batcher
 
 # Pluggable LLM abstraction supporting local Ollama (Qwen3 14B) by default.
 # Set LLM_PROVIDER=ollama and ensure an Ollama daemon exposes the qwen3:14b model
@@ -18,7 +36,69 @@ class LLM:
         self.qwen_max_new_tokens = settings.qwen_max_new_tokens
         self.qwen_temperature = settings.qwen_temperature
 
-    def suggest(self, prompt: str) -> str:
+    def suggest(self, prompt: str, aliases: Optional[Dict[str, str]] = None) -> str:
+        """Complete ``prompt``, serving repeated prompts from the response cache.
+
+        ``aliases`` maps a stable placeholder to a per-call value (such as
+        the generated schema name) so that prompts differing only in that
+        value share one cache entry.
+        """
+        key = self._cache_key(prompt, aliases)
+        if key is not None:
+            cached = llm_cache.get(key)
+            if cached is not None:
+                return _unalias(cached, aliases or {})
+
+        raw = self._generate(prompt)
+        self._cache_store(key, raw, aliases)
+        return raw
+
+    async def asuggest(self, prompt: str, aliases: Optional[Dict[str, str]] = None) -> str:
+        """``suggest`` for asyncio callers; HTTP providers use the pooled async client."""
+        key = self._cache_key(prompt, aliases)
+        if key is not None:
+            cached = await asyncio.to_thread(llm_cache.get, key)
+            if cached is not None:
+                return _unalias(cached, aliases or {})
+
+        raw = await self._agenerate(prompt)
+        await asyncio.to_thread(self._cache_store, key, raw, aliases)
+        return raw
+
+    async def aclose(self) -> None:
+        """Release the pooled async clients of the running event loop."""
+        _async_openai_clients.pop(asyncio.get_running_loop(), None)
+        await aclose_async_http_client()
+
+    def _cache_key(self, prompt: str, aliases: Optional[Dict[str, str]]) -> Optional[str]:
+        if not settings.llm_cache_enabled:
+            return None
+        return llm_cache.key(
+            self.provider, self._model_id(), self._generation_params(), _alias(prompt, aliases or {})
+        )
+
+    def _cache_store(self, key: Optional[str], raw: str, aliases: Optional[Dict[str, str]]) -> None:
+        # Error and placeholder outputs start with "-- " and must not be cached.
+        if key is not None and raw and not raw.startswith("-- "):
+            llm_cache.set(key, _alias(raw, aliases or {}))
+
+    def _model_id(self) -> str:
+        if self.provider in {"qwen", "qwen_local", "transformers"}:
+            return self.qwen_model_path
+        return self.model_name or ""
+
+    def _generation_params(self) -> Dict[str, Any]:
+        if self.provider in {"qwen", "qwen_local", "transformers"}:
+            return {
+                "max_new_tokens": self.qwen_max_new_tokens,
+                "temperature": self.qwen_temperature,
+                "do_sample": False,
+            }
+        if self.provider == "openai":
+            return {"temperature": 0.2}
+        return {}
+
+    def _generate(self, prompt: str) -> str:
         if self.provider in {"qwen", "qwen_local", "transformers"}:
             return self._qwen_local_chat(prompt)
         if self.provider == "ollama":
@@ -28,36 +108,116 @@ class LLM:
         # Deterministic fallback
         return f"-- LLM placeholder output based on prompt --\n{prompt[:4000]}"
 
-    def _ollama_chat(self, prompt: str) -> str:
+    async def _agenerate(self, prompt: str) -> str:
+        if self.provider in {"qwen", "qwen_local", "transformers"}:
+            return await asyncio.to_thread(self._qwen_local_chat, prompt)
+        if self.provider == "ollama":
+            return await self._aollama_chat(prompt)
+        elif self.provider == "openai" and self.openai_api_key:
+            return await self._aopenai_chat(prompt)
+        return f"-- LLM placeholder output based on prompt --\n{prompt[:4000]}"
+
+    def _ollama_request(self, prompt: str):
         # Uses Ollama /api/generate for a simple prompt → completion call
         url = f"{self.ollama_base.rstrip('/')}/api/generate"
         payload = {
             "model": self.model_name or "qwen3:14b",
             "prompt": prompt,
-            "stream": False
+            "stream": settings.llm_stream,
         }
+        return url, payload
+
+    def _ollama_chat(self, prompt: str) -> str:
+        url, payload = self._ollama_request(prompt)
         try:
-            with httpx.Client(timeout=120) as client:
-                r = client.post(url, json=payload)
+            client = get_http_client()
+            if settings.llm_stream:
+                return self._ollama_stream(client, url, payload, prompt)
+            r = request_with_retries(client, "POST", url, json=payload)
+            r.raise_for_status()
+            data = r.json()
+            return data.get("response", "")
+        except Exception as e:
+            return f"-- Ollama error: {e}\n{prompt[:4000]}"
+
+    def _ollama_stream(self, client: httpx.Client, url: str, payload: dict, prompt: str) -> str:
+        guard = JSONStreamGuard(settings.llm_json_prefix_limit)
+        # Leaving the block closes the connection, which makes Ollama stop generating.
+        with stream_with_retries(client, "POST", url, json=payload) as r:
+            r.raise_for_status()
+            for line in r.iter_lines():
+                if _feed_ollama_line(guard, line):
+                    break
+        return _guarded_output(guard, "Ollama", prompt)
+
+    async def _aollama_chat(self, prompt: str) -> str:
+        url, payload = self._ollama_request(prompt)
+        try:
+            client = get_async_http_client()
+            if not settings.llm_stream:
+                r = await arequest_with_retries(client, "POST", url, json=payload)
+                r.raise_for_status()
+                return r.json().get("response", "")
+
+            guard = JSONStreamGuard(settings.llm_json_prefix_limit)
+            async with astream_with_retries(client, "POST", url, json=payload) as r:
                 r.raise_for_status()
-                data = r.json()
-                return data.get("response", "")
+                async for line in r.aiter_lines():
+                    if _feed_ollama_line(guard, line):
+                        break
+            return _guarded_output(guard, "Ollama", prompt)
         except Exception as e:
             return f"-- Ollama error: {e}\n{prompt[:4000]}"
 
+    def _openai_request(self, prompt: str) -> dict:
+        return dict(
+            model=self.model_name or "gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": "You are a SQL & Iceberg performance expert."},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.2,
+        )
+
     def _openai_chat(self, prompt: str) -> str:
         try:
-            from openai import OpenAI
-            client = OpenAI()
-            resp = client.chat.completions.create(
-                model=self.model_name or "gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a SQL & Iceberg performance expert."},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.2,
-            )
-            return resp.choices[0].message.content
+            client = _openai_client(self.openai_api_key, os.getpid())
+            request = self._openai_request(prompt)
+            if not settings.llm_stream:
+                resp = client.chat.completions.create(**request)
+                return resp.choices[0].message.content
+
+            guard = JSONStreamGuard(settings.llm_json_prefix_limit)
+            stream = client.chat.completions.create(stream=True, **request)
+            try:
+                for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta and guard.feed(delta) != CONTINUE:
+                        break
+            finally:
+                stream.close()
+            return _guarded_output(guard, "OpenAI", prompt)
+        except Exception as e:
+            return f"-- OpenAI error: {e}\n{prompt[:4000]}"
+
+    async def _aopenai_chat(self, prompt: str) -> str:
+        try:
+            client = _async_openai_client(self.openai_api_key)
+            request = self._openai_request(prompt)
+            if not settings.llm_stream:
+                resp = await client.chat.completions.create(**request)
+                return resp.choices[0].message.content
+
+            guard = JSONStreamGuard(settings.llm_json_prefix_limit)
+            stream = await client.chat.completions.create(stream=True, **request)
+            try:
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta and guard.feed(delta) != CONTINUE:
+                        break
+            finally:
+                await stream.close()
+            return _guarded_output(guard, "OpenAI", prompt)
         except Exception as e:
             return f"-- OpenAI error: {e}\n{prompt[:4000]}"
 
@@ -75,9 +235,6 @@ class LLM:
         try:
             import torch
 
-            inputs = tokenizer(prompt, return_tensors="pt")
-            inputs = {k: v.to(device) for k, v in inputs.items()}
-
             eos_token_id = tokenizer.eos_token_id
             if eos_token_id is None and tokenizer.eos_token:
                 eos_token_id = tokenizer.convert_tokens_to_ids(tokenizer.eos_token)
@@ -92,6 +249,23 @@ class LLM:
                 "eos_token_id": eos_token_id,
                 "pad_token_id": pad_token_id,
             }
+            if settings.qwen_batch_max_size > 1:
+                # A batch is one ``generate`` call with no per-row streamer, so the
+                # guard cannot stop a row early: every prompt runs to its token limit
+                # and the guard only trims or rejects the finished text. Batching
+                # trades that early abort for throughput under concurrent tasks.
+                text = get_batcher(tokenizer, model, device, generation_kwargs).generate(prompt)
+                if not settings.llm_stream:
+                    return text
+                guard = JSONStreamGuard(settings.llm_json_prefix_limit)
+                guard.feed(text)
+                return _guarded_output(guard, "Qwen", prompt).strip()
+
+            inputs = tokenizer(prompt, return_tensors="pt")
+            inputs = {k: v.to(device) for k, v in inputs.items()}
+            if settings.llm_stream:
+                return self._qwen_stream(tokenizer, model, inputs, generation_kwargs, prompt)
+
             with torch.no_grad():
                 output_ids = model.generate(**inputs, **generation_kwargs)
 
@@ -100,6 +274,97 @@ class LLM:
         except Exception as exc:
             return f"-- Qwen inference error: {exc}\n{prompt[:4000]}"
 
+    def _qwen_stream(self, tokenizer, model, inputs: dict, generation_kwargs: dict, prompt: str) -> str:
+        import torch
+        from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+        stop = threading.Event()
+
+        class _StopWhenSet(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                return torch.full((input_ids.shape[0],), stop.is_set(), dtype=torch.bool, device=input_ids.device)
+
+        streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        errors: list = []
+
+        def generate():
+            try:
+                with torch.no_grad():
+                    model.generate(
+                        **inputs,
+                        **generation_kwargs,
+                        streamer=streamer,
+                        stopping_criteria=StoppingCriteriaList([_StopWhenSet()]),
+                    )
+            except Exception as exc:  # surfaced to the caller below
+                errors.append(exc)
+                streamer.end()
+
+        guard = JSONStreamGuard(settings.llm_json_prefix_limit)
+        thread = threading.Thread(target=generate, daemon=True)
+        thread.start()
+        try:
+            for text in streamer:
+                if guard.feed(text) != CONTINUE:
+                    break
+        finally:
+            stop.set()
+            thread.join()
+        if errors:
+            raise errors[0]
+        return _guarded_output(guard, "Qwen", prompt).strip()
+
+
+def _feed_ollama_line(guard: JSONStreamGuard, line: str) -> bool:
+    """Feed one NDJSON line from Ollama; True when reading should stop."""
+    if not line:
+        return False
+    data = json.loads(line)
+    return guard.feed(data.get("response", "")) != CONTINUE or bool(data.get("done"))
+
+
+@lru_cache(maxsize=4)
+def _openai_client(api_key: str, pid: int):
+    """One OpenAI client per key and process, sharing the pooled HTTP client."""
+    from openai import OpenAI
+
+    return OpenAI(api_key=api_key, http_client=get_http_client(), max_retries=settings.llm_http_retries)
+
+
+_async_openai_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _async_openai_client(api_key: str):
+    from openai import AsyncOpenAI
+
+    loop = asyncio.get_running_loop()
+    client = _async_openai_clients.get(loop)
+    if client is None:
+        client = AsyncOpenAI(
+            api_key=api_key, http_client=get_async_http_client(), max_retries=settings.llm_http_retries
+        )
+        _async_openai_clients[loop] = client
+    return client
+
+
+def _guarded_output(guard: JSONStreamGuard, provider: str, prompt: str) -> str:
+    if guard.state == ABORT:
+        return f"-- {provider} output aborted (not JSON): {guard.text[:200]}\n{prompt[:4000]}"
+    return guard.text
+
+
+def _alias(text: str, aliases: Dict[str, str]) -> str:
+    for placeholder, value in aliases.items():
+        if value:
+            text = text.replace(value, placeholder)
+    return text
+
+
+def _unalias(text: str, aliases: Dict[str, str]) -> str:
+    for placeholder, value in aliases.items():
+        text = text.replace(placeholder, value)
+    return text
+
 
 def getenv_default(key: str, default: str) -> str:
     import os
@@ -0,0 +1,188 @@
+"""Content-addressed cache of LLM completions.
+
+Entries are keyed by provider, model, generation parameters and a hash of
+the prompt. A small in-process LRU sits in front of Redis (the instance
+``Repo`` uses), where entries expire after a TTL and the oldest are evicted
+once the entry limit is exceeded.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import orjson
+import redis
+
+from ..config import settings
+from .redis_backoff import RedisBackoff
+
+_KEY_PREFIX = "llm:cache:"
+_INDEX_KEY = "llm:cache:index"
+_STATS_KEY = "llm:cache:stats"
+# The lookup, its hit/miss count and any local hits not yet counted (ARGV[1]).
+_GET_COUNTED = """
+local value = redis.call('GET', KEYS[1])
+redis.call('HINCRBY', KEYS[2], value and 'redis_hits' or 'misses', 1)
+if tonumber(ARGV[1]) > 0 then
+  redis.call('HINCRBY', KEYS[2], 'local_hits', ARGV[1])
+end
+return value
+"""
+# Local hits reach the shared counters with the next Redis call, or on their
+# own once this many have accumulated.
+_LOCAL_HITS_BATCH = 100
+
+
+class LLMCache:
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        use_redis: bool = True,
+        local_entries: Optional[int] = None,
+        ttl_seconds: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        max_response_bytes: Optional[int] = None,
+    ):
+        self.redis = RedisBackoff(redis_client, enabled=use_redis, decode_responses=True)
+        self.local_entries = settings.llm_cache_local_entries if local_entries is None else local_entries
+        self.ttl_seconds = ttl_seconds or settings.llm_cache_ttl_seconds
+        self.max_entries = max_entries or settings.llm_cache_max_entries
+        self.max_response_bytes = max_response_bytes or settings.llm_cache_max_response_bytes
+        self._local: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self._uncounted_local_hits = 0
+        self._script_client: Optional[redis.Redis] = None
+        self._get_counted = None
+
+    @staticmethod
+    def key(provider: str, model: str, params: Dict[str, Any], prompt: str) -> str:
+        material = orjson.dumps(
+            {"provider": provider, "model": model, "params": params, "prompt": prompt},
+            option=orjson.OPT_SORT_KEYS,
+        )
+        return hashlib.sha256(material).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        flush = False
+        with self._lock:
+            value = self._local.get(key)
+            if value is not None:
+                self._local.move_to_end(key)
+                self.local_hits += 1
+                self._uncounted_local_hits += 1
+                flush = self._uncounted_local_hits >= _LOCAL_HITS_BATCH
+        if value is not None:
+            if flush:
+                self._flush_local_hits()
+            return value
+
+        client = self.redis.client()
+        if client is not None:
+            uncounted = self._take_local_hits()
+            try:
+                # The lookup and the shared counters in one round-trip.
+                value = self._lookup_script(client)(keys=[_KEY_PREFIX + key, _STATS_KEY], args=[uncounted])
+            except redis.RedisError:
+                self._restore_local_hits(uncounted)
+                self.redis.failed()
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.redis_hits += 1
+        if value is not None:
+            self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        if len(value.encode("utf-8", "surrogatepass")) > self.max_response_bytes:
+            return
+        self._remember(key, value)
+        client = self.redis.client()
+        if client is None:
+            return
+        uncounted = self._take_local_hits()
+        try:
+            pipe = client.pipeline(transaction=False)
+            if uncounted:
+                pipe.hincrby(_STATS_KEY, "local_hits", uncounted)
+            pipe.set(_KEY_PREFIX + key, value, ex=self.ttl_seconds)
+            pipe.zadd(_INDEX_KEY, {key: time.time()})
+            # Drop index members whose values already expired.
+            pipe.zremrangebyscore(_INDEX_KEY, "-inf", time.time() - self.ttl_seconds)
+            pipe.zcard(_INDEX_KEY)
+            size = pipe.execute()[-1]
+            if size > self.max_entries:
+                evicted = client.zpopmin(_INDEX_KEY, size - self.max_entries)
+                if evicted:
+                    client.delete(*[_KEY_PREFIX + member for member, _ in evicted])
+        except redis.RedisError:
+            self._restore_local_hits(uncounted)
+            self.redis.failed()
+
+    def stats(self) -> Dict[str, int]:
+        out = {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "errors": self.redis.errors,
+            "local_entries": len(self._local),
+        }
+        self._flush_local_hits()
+        client = self.redis.client()
+        if client is not None:
+            try:
+                shared = client.hgetall(_STATS_KEY)
+                out.update({f"total_{k}": int(v) for k, v in shared.items()})
+                out["redis_entries"] = client.zcard(_INDEX_KEY)
+            except redis.RedisError:
+                self.redis.failed()
+        return out
+
+    def _remember(self, key: str, value: str) -> None:
+        if self.local_entries <= 0:
+            return
+        with self._lock:
+            self._local[key] = value
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_entries:
+                self._local.popitem(last=False)
+
+    def _lookup_script(self, client: redis.Redis):
+        # Registered once per client; the script is then run by its SHA.
+        if self._script_client is not client:
+            self._get_counted = client.register_script(_GET_COUNTED)
+            self._script_client = client
+        return self._get_counted
+
+    def _take_local_hits(self) -> int:
+        with self._lock:
+            uncounted, self._uncounted_local_hits = self._uncounted_local_hits, 0
+        return uncounted
+
+    def _restore_local_hits(self, uncounted: int) -> None:
+        with self._lock:
+            self._uncounted_local_hits += uncounted
+
+    def _flush_local_hits(self) -> None:
+        client = self.redis.client()
+        if client is None:
+            return
+        uncounted = self._take_local_hits()
+        if not uncounted:
+            return
+        try:
+            client.hincrby(_STATS_KEY, "local_hits", uncounted)
+        except redis.RedisError:
+            self._restore_local_hits(uncounted)
+            self.redis.failed()
+
+
+llm_cache = LLMCache()
@@ -0,0 +1,108 @@
+"""Request fingerprints for whole-task memoization.
+
+Identical workloads submitted by several schedulers map to one canonical
+hash, so ``/new`` can hand back a finished result, or the task already
+computing it, instead of running the analysis again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import uuid
+from typing import List, Optional
+from urllib.parse import parse_qsl, urlencode
+
+import orjson
+
+from ..models import NewRequest
+
+_CREDENTIAL_PARAMS = {"user", "username", "password", "accesstoken", "token"}
+_SCHEMA_RE = re.compile(r"CREATE\s+SCHEMA\s+(?:IF\s+NOT\s+EXISTS\s+)?(?:[^\s.]+\.)?([^\s;]+)", re.IGNORECASE)
+
+
+def strip_credentials(url: str) -> str:
+    base, _, query = url.partition("?")
+    base = re.sub(r"//[^/@]*@", "//", base)
+    params = sorted(
+        (k, v) for k, v in parse_qsl(query, keep_blank_values=True) if k.lower() not in _CREDENTIAL_PARAMS
+    )
+    return f"{base}?{urlencode(params)}" if params else base
+
+
+class WorkloadFingerprint:
+    """Order-independent hash of a workload, fed one item at a time.
+
+    Each item is hashed on arrival, so a streamed upload only keeps 32 bytes
+    per statement and query rather than the workload itself.
+    """
+
+    def __init__(self, url: str = ""):
+        self.url = url
+        self._ddl: List[bytes] = []
+        self._queries: List[bytes] = []
+
+    def add_ddl(self, statement: str) -> None:
+        self._ddl.append(hashlib.sha256(statement.strip().encode()).digest())
+
+    def add_query(self, queryid: str, query: str, runquantity: int) -> None:
+        self._queries.append(hashlib.sha256(orjson.dumps([queryid, query, runquantity])).digest())
+
+    def hexdigest(self) -> str:
+        h = hashlib.sha256(strip_credentials(self.url).encode())
+        for part in (self._ddl, self._queries):
+            h.update(b"|%d|" % len(part))
+            for digest in sorted(part):
+                h.update(digest)
+        return h.hexdigest()
+
+
+def request_fingerprint(req: NewRequest) -> str:
+    fp = WorkloadFingerprint(req.url)
+    for item in req.ddl:
+        fp.add_ddl(item.statement)
+    for q in req.queries:
+        fp.add_query(q.queryid, q.query, q.runquantity)
+    return fp.hexdigest()
+
+
+def schema_of(result: dict) -> Optional[str]:
+    """Name of the schema created by the first DDL statement of ``result``."""
+    ddl = result.get("ddl") or []
+    if not ddl:
+        return None
+    match = _SCHEMA_RE.search(ddl[0].get("statement", ""))
+    return match.group(1) if match else None
+
+
+def remap_schema(result: dict, new_schema: Optional[str] = None) -> dict:
+    """Copy of ``result`` with its schema name replaced by ``new_schema``."""
+    old_schema = schema_of(result)
+    if not old_schema:
+        return result
+    new_schema = new_schema or f"opt_{uuid.uuid4().hex[:8]}"
+    return {
+        "ddl": [{"statement": s["statement"].replace(old_schema, new_schema)} for s in result.get("ddl", [])],
+        "migrations": [
+            {"statement": s["statement"].replace(old_schema, new_schema)} for s in result.get("migrations", [])
+        ],
+        "queries": [
+            {"queryid": q["queryid"], "query": q["query"].replace(old_schema, new_schema)}
+            for q in result.get("queries", [])
+        ],
+    }
+
+
+def remap_manifest(manifest: dict, new_schema: str) -> dict:
+    """Copy of a task manifest (see ``incremental``) for a result remapped to ``new_schema``."""
+    old_schema = manifest.get("schema")
+    if not old_schema:
+        return manifest
+    return {
+        **manifest,
+        "schema": new_schema,
+        "preagg_tables": [t.replace(old_schema, new_schema) for t in manifest.get("preagg_tables", [])],
+        "preagg_originals": {
+            qid: text.replace(old_schema, new_schema) for qid, text in manifest.get("preagg_originals", {}).items()
+        },
+    }
@@ -1,8 +1,168 @@
-from typing import List
+"""Service metrics.
+
+Cache counters are read on demand; latencies are Prometheus histograms
+exported on ``/metrics``. ``prometheus_client`` is optional: without it the
+timers are no-ops. When ``PROMETHEUS_MULTIPROC_DIR`` is set (several uvicorn
+workers, Celery prefork children) every process writes its samples there
+and the exporter aggregates them.
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
 from ..models import QueryItem
+from ..utils.parse_cache import parse_cache
+from ..utils.sql_rewriter import pool_stats
+from .llm_cache import llm_cache
+from .stats_cache import stats_cache
+
+logger = logging.getLogger(__name__)
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Histogram, multiprocess
+except ImportError:  # optional: instrumentation is disabled
+    prometheus_client = None
+
+# Seconds; stages and tasks range from milliseconds (cache hits) to long LLM calls.
+_SLOW_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+_FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+
+def _histogram(name: str, documentation: str, labels: List[str], buckets) -> Optional["Histogram"]:
+    if prometheus_client is None:
+        return None
+    return Histogram(name, documentation, labels, buckets=buckets)
+
+
+ANALYZER_STAGE = _histogram(
+    "dlopt_analyzer_stage_seconds", "Time spent in each Analyzer stage.", ["stage"], _SLOW_BUCKETS
+)
+TRINO_QUERY = _histogram("dlopt_trino_query_seconds", "Trino query latency.", ["outcome"], _SLOW_BUCKETS)
+REDIS_OP = _histogram("dlopt_redis_op_seconds", "Redis operation latency.", ["op"], _FAST_BUCKETS)
+CELERY_QUEUE_WAIT = _histogram(
+    "dlopt_celery_queue_wait_seconds", "Time from submission until a worker starts the task.", ["task"],
+    _SLOW_BUCKETS,
+)
+CELERY_TASK = _histogram(
+    "dlopt_celery_task_seconds", "Task run time in the worker.", ["task", "status"], _SLOW_BUCKETS
+)
+PROMPT_TOKENS = _histogram(
+    "dlopt_prompt_tokens", "Estimated tokens per planner prompt.", ["plan"],
+    (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000),
+)
+PROMPT_SUMMARIZED = (
+    Counter(
+        "dlopt_prompt_summarized_items", "Tables and query shapes folded into the long-tail summary.",
+        ["plan", "kind"],
+    )
+    if prometheus_client is not None else None
+)
+# Batches per size are the histogram's count; tokens/sec is rate(tokens) over rate(seconds_sum).
+QWEN_BATCH = _histogram(
+    "dlopt_qwen_batch_seconds", "Local model generate time per micro-batch.", ["size"], _SLOW_BUCKETS
+)
+QWEN_TOKENS = (
+    Counter("dlopt_qwen_generated_tokens", "Tokens generated by the local model.", ["size"])
+    if prometheus_client is not None else None
+)
+
+
+@contextmanager
+def timed(histogram, **labels):
+    """Observe the duration of the block on ``histogram`` (no-op without prometheus_client)."""
+    if histogram is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - start)
+
+
+def observe(histogram, seconds: float, **labels) -> None:
+    if histogram is not None:
+        histogram.labels(**labels).observe(seconds)
+
+
+def stage(name: str):
+    return timed(ANALYZER_STAGE, stage=name)
+
+
+def prompt_built(report, plan: str) -> None:
+    """Record a planner prompt's token use and what its budget left out."""
+    observe(PROMPT_TOKENS, report.tokens_used, plan=plan)
+    if PROMPT_SUMMARIZED is not None:
+        PROMPT_SUMMARIZED.labels(plan=plan, kind="tables").inc(report.tables_summarized)
+        PROMPT_SUMMARIZED.labels(plan=plan, kind="queries").inc(report.queries_summarized)
+    logger.info(
+        "%s prompt: %d/%d tokens, tables %d included %d summarized, queries %d included %d summarized",
+        plan, report.tokens_used, report.token_budget, report.tables_included, report.tables_summarized,
+        report.queries_included, report.queries_summarized,
+    )
+
+
+def redis_op(name: str):
+    """Decorator timing a method's Redis round-trips as ``op=name``."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(REDIS_OP, op=name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def exposition() -> Tuple[bytes, str]:
+    """Body and content type for ``/metrics``."""
+    if prometheus_client is None:
+        raise RuntimeError("prometheus_client is not installed")
+    return prometheus_client.generate_latest(_registry()), prometheus_client.CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int) -> None:
+    """Serve the same exposition on ``port`` from a background thread (Celery workers)."""
+    if prometheus_client is not None:
+        prometheus_client.start_http_server(port, registry=_registry())
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop an exited process' live samples from the multiprocess directory."""
+    if prometheus_client is not None and os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
+
+
+def _registry():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return prometheus_client.REGISTRY
+
 
 class Metrics:
     @staticmethod
     def weighted_runtime_baseline(queries: List[QueryItem]) -> int:
         # Placeholder: sum frequencies as proxy
         return sum(q.runquantity for q in queries)
+
+    @staticmethod
+    def parse_cache_stats() -> Dict[str, int]:
+        return parse_cache.stats()
+
+    @staticmethod
+    def llm_cache_stats() -> Dict[str, int]:
+        return llm_cache.stats()
+
+    @staticmethod
+    def stats_cache_stats() -> Dict[str, int]:
+        return stats_cache.stats()
+
+    @staticmethod
+    def rewrite_pool_stats() -> Dict[str, int]:
+        return pool_stats()
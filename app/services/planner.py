@@ -0,0 +1,84 @@
+"""Workload slicing for the batched LLM planner.
+
+Tables that are read together by some query end up in the same slice, so
+each sub-prompt sees every table its queries touch. When there are more
+clusters than ``max_slices`` the lightest ones are packed together.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence
+
+from ..utils.ddl_parser import TableDefinition
+from ..utils.fingerprint import QueryGroup
+from ..utils.sql_rewriter import Rewriter, TableMatcher
+from .prompt import query_weight
+
+
+@dataclass
+class PlanSlice:
+    tables: List[TableDefinition] = field(default_factory=list)
+    groups: List[QueryGroup] = field(default_factory=list)
+    weight: int = 0
+
+
+def slice_workload(
+    tables: Sequence[TableDefinition],
+    groups: Sequence[QueryGroup],
+    matcher: TableMatcher,
+    target_of: Dict[str, int],
+    max_slices: int,
+) -> List[PlanSlice]:
+    """Split ``tables`` and ``groups`` into at most ``max_slices`` slices.
+
+    ``target_of`` maps a rewritten table name (as returned by
+    ``Rewriter.referenced_tables``) to the index of its table in ``tables``.
+    Query groups that reference no known table join the heaviest slice.
+    """
+    parent = list(range(len(tables)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    touched: List[List[int]] = []
+    for group in groups:
+        indices = sorted(
+            {target_of[t] for t in Rewriter.referenced_tables(group.representative.query, matcher) if t in target_of}
+        )
+        for other in indices[1:]:
+            parent[find(other)] = find(indices[0])
+        touched.append(indices)
+
+    clusters: Dict[int, PlanSlice] = {}
+    for i, table in enumerate(tables):
+        clusters.setdefault(find(i), PlanSlice()).tables.append(table)
+    orphans: List[QueryGroup] = []
+    for group, indices in zip(groups, touched):
+        if not indices:
+            orphans.append(group)
+            continue
+        cluster = clusters[find(indices[0])]
+        cluster.groups.append(group)
+        cluster.weight += query_weight(group)
+
+    # Greedy packing: heaviest cluster first, into the currently lightest slice.
+    slices: List[PlanSlice] = []
+    for cluster in sorted(clusters.values(), key=lambda c: c.weight, reverse=True):
+        if len(slices) < max(1, max_slices):
+            slices.append(cluster)
+            continue
+        target = min(slices, key=lambda s: s.weight)
+        target.tables.extend(cluster.tables)
+        target.groups.extend(cluster.groups)
+        target.weight += cluster.weight
+
+    if orphans:
+        if not slices:
+            slices.append(PlanSlice())
+        slices[0].groups.extend(orphans)
+        slices[0].weight += sum(query_weight(g) for g in orphans)
+    return slices
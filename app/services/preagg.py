@@ -0,0 +1,402 @@
+"""Pre-aggregated tables for hot, repeated aggregations.
+
+Aggregating queries that read the same join graph and group by the same keys
+form a family, weighted by their total ``runquantity``. For each family that
+runs often enough we create one table in the new schema holding the group
+keys, the columns the family filters on by equality, and re-aggregatable
+partial measures (sum, count, min, max; avg as sum and count). The
+family's queries are rewritten to read from it.
+
+Only a simple, common shape is handled: a single SELECT without DISTINCT,
+window functions or subqueries, whose group keys and non-aggregate select
+items are plain column references and whose WHERE clause compares columns
+by ``=``/``IN`` (or filters on group keys). Anything else is left alone.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from ..models import QueryItem
+from ..utils.fingerprint import QueryGroup
+from ..utils.sql_rewriter import Token, TableMatcher, _read_chain, tokenize
+
+_AGGREGATES = {"SUM", "COUNT", "MIN", "MAX", "AVG"}
+_CLAUSE_KEYWORDS = {"SELECT", "FROM", "WHERE", "GROUP", "HAVING", "ORDER", "LIMIT"}
+_UNSUPPORTED = {"WITH", "UNION", "INTERSECT", "EXCEPT", "OVER", "DISTINCT", "WINDOW", "OFFSET", "FETCH"}
+_EQ_OPS = {"=", "IN"}
+_CLAUSE_HEADERS = {"GROUP": "GROUP BY", "ORDER": "ORDER BY"}
+# How partial measures are combined again: fn -> (partials, re-aggregation template).
+_REAGGREGATE = {
+    "SUM": ((("SUM", "sum"),), "sum({sum})"),
+    "COUNT": ((("COUNT", "count"),), "sum({count})"),
+    "MIN": ((("MIN", "min"),), "min({min})"),
+    "MAX": ((("MAX", "max"),), "max({max})"),
+    "AVG": ((("SUM", "sum"), ("COUNT", "count")), "CAST(sum({sum}) AS DOUBLE) / sum({count})"),
+}
+
+Measure = Tuple[str, str]  # (function, argument text)
+
+
+@dataclass
+class PreAggregation:
+    table: str
+    ddl: str
+    migration: str
+    queries: Dict[str, str] = field(default_factory=dict)  # queryid -> rewritten query
+    runquantity: int = 0
+
+
+@dataclass
+class _Shape:
+    from_text: str
+    keys: List[str]
+    filter_columns: List[str]
+    measures: List[Measure]
+    clauses: Dict[str, List[Token]]
+
+
+def recommend_preaggregations(
+    groups: Sequence[QueryGroup],
+    matcher: TableMatcher,
+    columns: Mapping[str, Sequence[str]],
+    target_schema: str,
+    min_runs: int,
+    max_tables: int,
+) -> List[PreAggregation]:
+    """Pre-aggregations for the heaviest families running at least ``min_runs`` times.
+
+    ``columns`` maps matcher targets to their column names and
+    ``target_schema`` is the ``catalog.schema`` the tables are created in.
+    """
+    families: Dict[Tuple[str, Tuple[str, ...]], List[QueryGroup]] = {}
+    for group in groups:
+        shape = _parse(group.representative.query, matcher, columns)
+        if shape is not None:
+            families.setdefault((shape.from_text.lower(), tuple(sorted(shape.keys))), []).append(group)
+
+    ranked = sorted(families.values(), key=lambda fam: sum(g.runquantity for g in fam), reverse=True)
+    out: List[PreAggregation] = []
+    for family in ranked:
+        runs = sum(g.runquantity for g in family)
+        if runs < min_runs or len(out) >= max_tables:
+            break
+        rec = _build(family, matcher, columns, target_schema, len(out) + 1)
+        if rec is not None:
+            rec.runquantity = runs
+            out.append(rec)
+    return out
+
+
+def _build(family, matcher, columns, target_schema: str, index: int) -> Optional[PreAggregation]:
+    shapes = [_parse(g.representative.query, matcher, columns) for g in family]
+    base = shapes[0]
+    key_columns = list(dict.fromkeys(base.keys + [c for s in shapes for c in s.filter_columns]))
+    measures = list(dict.fromkeys(m for s in shapes for m in s.measures))
+    partials = list(dict.fromkeys(p for fn, arg in measures for p in _partials(fn, arg)))
+
+    names = _NameAllocator()
+    key_names = {key: names.take(key.rsplit(".", 1)[-1]) for key in key_columns}
+    partial_names = {
+        (fn, arg): names.take(f"{fn.lower()}_{_arg_name(arg)}") for fn, arg in partials
+    }
+
+    first_table = _first_table(base.from_text)
+    table = f"{target_schema}.agg_{first_table}_{index}"
+    select = ",\n  ".join(
+        [f"{key} AS {key_names[key]}" for key in key_columns]
+        + [f"{fn.lower()}({arg}) AS {partial_names[(fn, arg)]}" for fn, arg in partials]
+    )
+    source = f"SELECT\n  {select}\nFROM {base.from_text}\nGROUP BY {', '.join(key_columns)}"
+
+    rec = PreAggregation(
+        table=table,
+        ddl=f"CREATE TABLE {table} AS\n{source}\nWITH NO DATA",
+        migration=f"INSERT INTO {table}\n{source}",
+    )
+    for group in family:
+        for member in group.members:
+            rewritten = _rewrite(member, table, matcher, columns, key_names, partial_names)
+            if rewritten is None:
+                return None
+            rec.queries[member.queryid] = rewritten
+    return rec
+
+
+def _parse(query: str, matcher: TableMatcher, columns: Mapping[str, Sequence[str]]) -> Optional[_Shape]:
+    tokens = [t for t in tokenize(matcher.sub(query)) if t[0] not in ("ws", "comment")]
+    clauses = _split_clauses(tokens)
+    if clauses is None or not clauses.get("GROUP") or not clauses.get("FROM"):
+        return None
+
+    known = {c for target in _targets(clauses["FROM"], columns) for c in columns[target]}
+    if not known:
+        return None
+    select_items = _split_commas(clauses["SELECT"])
+    keys: List[str] = []
+    for item in _split_commas(clauses["GROUP"]):
+        if len(item) == 1 and item[0][0] == "number":
+            position = int(item[0][1]) - 1
+            if not 0 <= position < len(select_items):
+                return None
+            item = _strip_alias(select_items[position])[0]
+        key = _column_ref(item, known)
+        if key is None:
+            return None
+        keys.append(key)
+
+    measures: List[Measure] = []
+    for item in select_items:
+        expr, _ = _strip_alias(item)
+        measure = _aggregate(expr)
+        if measure is not None:
+            measures.append(measure)
+        elif _column_ref(expr, known) not in keys:
+            return None
+    for clause in ("HAVING", "ORDER"):
+        for measure in _aggregates_in(clauses.get(clause, [])):
+            measures.append(measure)
+
+    filter_columns = _filter_columns(clauses.get("WHERE", []), known, keys)
+    if filter_columns is None:
+        return None
+    return _Shape(
+        from_text=_render(clauses["FROM"]),
+        keys=keys,
+        filter_columns=filter_columns,
+        measures=list(dict.fromkeys(measures)),
+        clauses=clauses,
+    )
+
+
+def _rewrite(member: QueryItem, table, matcher, columns, key_names, partial_names) -> Optional[str]:
+    shape = _parse(member.query, matcher, columns)
+    if shape is None:
+        return None
+    clauses = shape.clauses
+    select = []
+    for item in _split_commas(clauses["SELECT"]):
+        expr, alias = _strip_alias(item)
+        rendered = _substitute(expr, key_names, partial_names)
+        if rendered is None:
+            return None
+        key = _render(expr)
+        if alias is None and key in key_names and key_names[key] != key.rsplit(".", 1)[-1]:
+            alias = key.rsplit(".", 1)[-1]  # keep the output column name
+        select.append(f"{rendered} AS {alias}" if alias else rendered)
+
+    parts = [f"SELECT {', '.join(select)}", f"FROM {table}"]
+    for clause in ("WHERE", "GROUP", "HAVING", "ORDER", "LIMIT"):
+        if clause not in clauses:
+            continue
+        rendered = _substitute(clauses[clause], key_names, partial_names)
+        if rendered is None:
+            return None
+        parts.append(f"{_CLAUSE_HEADERS.get(clause, clause)} {rendered}")
+    return "\n".join(parts)
+
+
+def _split_clauses(tokens: List[Token]) -> Optional[Dict[str, List[Token]]]:
+    if not tokens or tokens[0][1].upper() != "SELECT":
+        return None
+    clauses: Dict[str, List[Token]] = {}
+    current = None
+    depth = 0
+    for kind, text in tokens:
+        upper = text.upper() if kind == "word" else None
+        if upper in _UNSUPPORTED:
+            return None
+        if text == "(":
+            depth += 1
+        elif text == ")":
+            depth -= 1
+        elif depth > 0 and upper == "SELECT":
+            return None  # subquery
+        elif depth == 0 and upper in _CLAUSE_KEYWORDS:
+            if upper in clauses:
+                return None
+            current = upper
+            clauses[current] = []
+            continue
+        clauses[current].append((kind, text))
+    for clause in ("GROUP", "ORDER"):
+        if clause in clauses:
+            if not clauses[clause] or clauses[clause][0][1].upper() != "BY":
+                return None
+            clauses[clause] = clauses[clause][1:]
+    return clauses
+
+
+def _split_commas(tokens: Sequence[Token]) -> List[List[Token]]:
+    items: List[List[Token]] = [[]]
+    depth = 0
+    for token in tokens:
+        if token[1] == "(":
+            depth += 1
+        elif token[1] == ")":
+            depth -= 1
+        elif token[1] == "," and depth == 0:
+            items.append([])
+            continue
+        items[-1].append(token)
+    return [item for item in items if item]
+
+
+def _strip_alias(item: List[Token]) -> Tuple[List[Token], Optional[str]]:
+    if len(item) > 2 and item[-2][0] == "word" and item[-2][1].upper() == "AS":
+        return item[:-2], item[-1][1]
+    if len(item) > 1 and item[-1][0] in ("word", "qident") and item[-2][1] not in (".",) and (
+        item[-2][0] != "op" or item[-2][1] == ")"
+    ):
+        return item[:-1], item[-1][1]
+    return item, None
+
+
+def _column_ref(tokens: Sequence[Token], known) -> Optional[str]:
+    end, parts = _read_chain(tokens, 0)
+    if not parts or end != len(tokens) or parts[-1] not in known:
+        return None
+    return _render(tokens)
+
+
+def _aggregate(tokens: Sequence[Token]) -> Optional[Measure]:
+    if (
+        len(tokens) >= 3
+        and tokens[0][0] == "word"
+        and tokens[0][1].upper() in _AGGREGATES
+        and tokens[1][1] == "("
+        and _matching_paren(tokens, 1) == len(tokens) - 1
+    ):
+        return tokens[0][1].upper(), _render(tokens[2:-1])
+    return None
+
+
+def _aggregates_in(tokens: Sequence[Token]) -> List[Measure]:
+    found = []
+    for i, (kind, text) in enumerate(tokens):
+        if kind == "word" and text.upper() in _AGGREGATES and i + 1 < len(tokens) and tokens[i + 1][1] == "(":
+            end = _matching_paren(tokens, i + 1)
+            if end is not None:
+                found.append((text.upper(), _render(tokens[i + 2 : end])))
+    return found
+
+
+def _filter_columns(where: Sequence[Token], known, keys: List[str]) -> Optional[List[str]]:
+    """Non-key columns the WHERE clause compares by equality; None if a filter
+    cannot be applied on the pre-aggregated table."""
+    out: List[str] = []
+    i = 0
+    while i < len(where):
+        if where[i][0] in ("word", "qident"):
+            end, parts = _read_chain(where, i)
+            if parts and parts[-1] in known:
+                column = _render(where[i:end])
+                if column not in keys:
+                    op = where[end][1].upper() if end < len(where) else ""
+                    is_not_equal = op == "<" and end + 1 < len(where) and where[end + 1][1] == ">"
+                    if op not in _EQ_OPS or is_not_equal:
+                        return None
+                    out.append(column)
+            i = end
+            continue
+        i += 1
+    return out
+
+
+def _substitute(tokens: Sequence[Token], key_names, partial_names) -> Optional[str]:
+    """Render ``tokens`` against the pre-aggregated table's columns."""
+    out: List[Token] = []
+    i = 0
+    while i < len(tokens):
+        kind, text = tokens[i]
+        if kind == "word" and text.upper() in _AGGREGATES and i + 1 < len(tokens) and tokens[i + 1][1] == "(":
+            end = _matching_paren(tokens, i + 1)
+            fn, arg = text.upper(), _render(tokens[i + 2 : end])
+            partials, template = _REAGGREGATE[fn]
+            names = {}
+            for part_fn, slot in partials:
+                name = partial_names.get((part_fn, arg))
+                if name is None:
+                    return None
+                names[slot] = name
+            out.append(("word", template.format(**names)))
+            i = end + 1
+            continue
+        if kind in ("word", "qident"):
+            end, _ = _read_chain(tokens, i)
+            chain = _render(tokens[i:end])
+            if chain in key_names:
+                out.append(("word", key_names[chain]))
+                i = end
+                continue
+            if end > i + 1:
+                return None  # a qualified column that the table does not have
+            out.extend(tokens[i:end])
+            i = end
+            continue
+        out.append(tokens[i])
+        i += 1
+    return _render(out)
+
+
+def _partials(fn: str, arg: str) -> List[Measure]:
+    return [(part_fn, arg) for part_fn, _ in _REAGGREGATE[fn][0]]
+
+
+def _matching_paren(tokens: Sequence[Token], start: int) -> Optional[int]:
+    depth = 0
+    for i in range(start, len(tokens)):
+        if tokens[i][1] == "(":
+            depth += 1
+        elif tokens[i][1] == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    return None
+
+
+def _targets(from_tokens: Sequence[Token], columns: Mapping[str, Sequence[str]]) -> List[str]:
+    rendered = {_render(from_tokens[i:_read_chain(from_tokens, i)[0]]) for i in range(len(from_tokens))}
+    return [target for target in columns if target in rendered]
+
+
+def _first_table(from_text: str) -> str:
+    return from_text.split()[0].rsplit(".", 1)[-1].strip('"').lower()
+
+
+def _arg_name(arg: str) -> str:
+    if arg == "*":
+        return "all"
+    name = arg.rsplit(".", 1)[-1].strip('"')
+    return name if name.isidentifier() else "expr"
+
+
+def _render(tokens: Sequence[Token]) -> str:
+    out = ""
+    prev = prev_kind = None
+    for kind, text in tokens:
+        glue = (
+            prev is None
+            or text in (",", ")", ".")
+            or prev in ("(", ".")
+            or (text == "(" and prev_kind == "word" and prev.upper() not in _SPACED_BEFORE_PAREN)
+        )
+        out += text if glue else f" {text}"
+        prev, prev_kind = text, kind
+    return out
+
+
+# Keywords followed by a parenthesised list rather than a call.
+_SPACED_BEFORE_PAREN = {"IN", "AND", "OR", "NOT", "ON", "AS", "BY", "FROM", "JOIN", "WHERE", "HAVING", "EXISTS"}
+
+
+class _NameAllocator:
+    def __init__(self):
+        self._used: Dict[str, int] = {}
+
+    def take(self, name: str) -> str:
+        base = name.strip('"').lower() or "col"
+        count = self._used.get(base, 0) + 1
+        self._used[base] = count
+        return base if count == 1 else f"{base}_{count}"
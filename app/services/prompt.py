@@ -0,0 +1,167 @@
+"""Token-budgeted prompt construction for the LLM planner.
+
+Query shapes are ranked by weighted cost (``runquantity`` x complexity) and
+added until the token budget is spent; whatever does not fit is folded into
+a one-line summary of the long tail.
+"""
+
+from __future__ import annotations
+
+import textwrap
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+from ..config import settings
+from ..utils.ddl_parser import TableDefinition
+from ..utils.fingerprint import QueryGroup
+from ..utils.sql_rewriter import Rewriter, TableMatcher, tokenize
+
+_COMPLEXITY_KEYWORDS = {"JOIN", "SELECT", "GROUP", "ORDER", "DISTINCT", "OVER", "UNION", "HAVING"}
+# Room kept for the long-tail summary lines.
+_SUMMARY_RESERVE_TOKENS = 120
+
+
+@dataclass
+class PromptReport:
+    tokens_used: int
+    token_budget: int
+    tables_included: int
+    tables_summarized: int
+    queries_included: int
+    queries_summarized: int
+
+    @property
+    def within_budget(self) -> bool:
+        return self.tokens_used <= self.token_budget
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, -(-len(text) // settings.llm_prompt_chars_per_token))
+
+
+def query_complexity(query: str) -> int:
+    """Count of SELECT/JOIN/GROUP/ORDER/DISTINCT/OVER/UNION/HAVING keywords (at least 1)."""
+    count = sum(
+        1 for kind, text in tokenize(query) if kind == "word" and text.upper() in _COMPLEXITY_KEYWORDS
+    )
+    return max(1, count)
+
+
+def query_weight(group: QueryGroup) -> int:
+    return max(1, group.runquantity) * query_complexity(group.representative.query)
+
+
+class PromptBuilder:
+    def __init__(self, catalog: str, new_schema: str, matcher: TableMatcher, token_budget: int | None = None):
+        self.catalog = catalog
+        self.new_schema = new_schema
+        self.matcher = matcher
+        self.token_budget = token_budget or settings.llm_prompt_token_budget
+
+    def build(
+        self, tables: Sequence[TableDefinition], groups: Sequence[QueryGroup]
+    ) -> Tuple[str, PromptReport]:
+        header = self._render([], [])
+        available = self.token_budget - estimate_tokens(header) - _SUMMARY_RESERVE_TOKENS
+
+        if tables:
+            # Tables may use half the budget when queries compete for it;
+            # whatever they leave unused goes to the queries.
+            table_share = available // 2 if groups else available
+            table_lines, tables_left, unused = self._fill([self._table_line(t) for t in tables], table_share)
+            available -= table_share - unused
+        else:
+            table_lines = ["- (no existing tables parsed; design a star-schema around events and dimensions)"]
+            tables_left = []
+
+        ranked = sorted(groups, key=query_weight, reverse=True)
+        if ranked:
+            query_lines, queries_left, _ = self._fill([self._query_line(g) for g in ranked], available)
+        else:
+            query_lines = ["- (no queries provided)"]
+            queries_left = []
+
+        if tables_left:
+            table_lines.append(self._tables_summary([tables[i] for i in tables_left]))
+        if queries_left:
+            query_lines.append(self._queries_summary([ranked[i] for i in queries_left]))
+
+        prompt = self._render(table_lines, query_lines)
+        report = PromptReport(
+            tokens_used=estimate_tokens(prompt),
+            token_budget=self.token_budget,
+            tables_included=len(tables) - len(tables_left),
+            tables_summarized=len(tables_left),
+            queries_included=len(groups) - len(queries_left),
+            queries_summarized=len(queries_left),
+        )
+        return prompt, report
+
+    @staticmethod
+    def _fill(lines: List[str], available: int) -> Tuple[List[str], List[int], int]:
+        """Greedily keep lines in order while they fit; return kept lines,
+        indices of skipped lines and the tokens still available."""
+        kept: List[str] = []
+        skipped: List[int] = []
+        for i, line in enumerate(lines):
+            cost = estimate_tokens(line) + 1
+            if cost <= available:
+                kept.append(line)
+                available -= cost
+            else:
+                skipped.append(i)
+        return kept, skipped, available
+
+    @staticmethod
+    def _table_line(table: TableDefinition) -> str:
+        summary = table.body.replace("\n", " ") if table.body else "(columns unavailable)"
+        return f"- {table.catalog}.{table.schema}.{table.table}: {summary[:280]}"
+
+    @staticmethod
+    def _query_line(group: QueryGroup) -> str:
+        q = group.representative
+        snippet = q.query.replace("\n", " ")
+        variants = f", {len(group.members)} variants" if len(group.members) > 1 else ""
+        return f"- {q.queryid} (runs {group.runquantity}{variants}): {snippet[:320]}"
+
+    @staticmethod
+    def _tables_summary(tables: Sequence[TableDefinition]) -> str:
+        names = ", ".join(t.table for t in tables[:20])
+        more = f" and {len(tables) - 20} more" if len(tables) > 20 else ""
+        return f"- ... {len(tables)} further tables not detailed: {names}{more}"
+
+    def _queries_summary(self, groups: Sequence[QueryGroup]) -> str:
+        touched: Counter = Counter()
+        for group in groups:
+            for target in Rewriter.referenced_tables(group.representative.query, self.matcher):
+                touched[target.rsplit(".", 1)[-1]] += group.runquantity
+        runs = sum(g.runquantity for g in groups)
+        top = ", ".join(f"{name} ({count} runs)" for name, count in touched.most_common(5))
+        line = f"- ... {len(groups)} further query shapes ({runs} runs) not shown"
+        return f"{line}; they mostly read {top}" if top else line
+
+    def _render(self, ddl_lines: List[str], query_lines: List[str]) -> str:
+        # Continuation lines carry the template's indentation so dedent strips it.
+        indent = "\n        "
+        prompt = f"""
+        You are an expert in Trino + Apache Iceberg performance optimisation.
+        Catalogue name: {self.catalog}
+        Use the new schema name {self.new_schema} for all optimised artefacts.
+
+        Existing tables:
+        {indent.join(ddl_lines)}
+
+        Observed SQL workload:
+        {indent.join(query_lines)}
+
+        Produce a JSON object with keys "ddl", "migrations" and "queries".
+        Each list item must be an object with a "statement" (for ddl/migrations) or "query" and "queryid" (for queries).
+        Rules:
+        1. Fully qualify every table reference as {self.catalog}.<schema>.<table>.
+        2. The first DDL statement must be exactly "CREATE SCHEMA {self.catalog}.{self.new_schema}".
+        3. Rewritten queries must keep their original queryid values and target the new schema {self.new_schema}.
+        4. Optimise for denormalised or star-schema patterns and Iceberg best practices (partitioning, properties).
+        5. Respond with JSON only (no Markdown fences, no explanations).
+        """
+        return textwrap.dedent(prompt).strip()
@@ -0,0 +1,142 @@
+"""Micro-batching scheduler in front of the local transformers model.
+
+Callers submit prompts from any thread; a single scheduler thread collects
+whatever arrives within a short window (up to a maximum batch size), runs
+one left-padded ``model.generate`` over the batch and resolves each
+caller's future with its own completion. Only that thread ever touches the
+model, so concurrent tasks on a worker no longer contend for it. Completions
+come back whole: unlike the unbatched streaming path, a row that is clearly
+not JSON is not stopped early.
+
+Batching is per process: each process holding the model (a Celery prefork
+child, say) has its own batcher and batches only its own callers' prompts.
+Run the worker with threads, or one process per model, to batch across
+tasks. Batch sizes, tokens and generate time are exported as
+``dlopt_qwen_*`` metrics.
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache, partial
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from ..config import settings
+from .metrics import QWEN_BATCH, QWEN_TOKENS, observe
+
+# (completion text, generated token count) per prompt, in order.
+GenerateFn = Callable[[Sequence[str]], List[Tuple[str, int]]]
+
+
+def generate_batch(tokenizer, model, device, generation_kwargs: dict, prompts: Sequence[str]) -> List[Tuple[str, int]]:
+    """Generate completions for ``prompts`` in one left-padded batch."""
+    import torch
+
+    # Decoder-only models continue from the last position, so pad on the left;
+    # the tokenizer is shared, so its setting is put back for other users.
+    padding_side = tokenizer.padding_side
+    tokenizer.padding_side = "left"
+    try:
+        inputs = tokenizer(list(prompts), return_tensors="pt", padding=True)
+    finally:
+        tokenizer.padding_side = padding_side
+    inputs = {k: v.to(device) for k, v in inputs.items()}
+
+    with torch.no_grad():
+        output_ids = model.generate(**inputs, **generation_kwargs)
+
+    generated = output_ids[:, inputs["input_ids"].shape[1]:]
+    pad_token_id = generation_kwargs.get("pad_token_id")
+    results: List[Tuple[str, int]] = []
+    for row in generated:
+        tokens = int((row != pad_token_id).sum()) if pad_token_id is not None else row.shape[0]
+        results.append((tokenizer.decode(row, skip_special_tokens=True).strip(), tokens))
+    return results
+
+
+class QwenBatcher:
+    def __init__(self, generate_fn: GenerateFn, max_batch_size: int, window_ms: float):
+        self.generate_fn = generate_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.window_seconds = max(0.0, window_ms) / 1000
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        # batch size -> [batches, generated tokens, seconds]
+        self._by_size: Dict[int, List[float]] = {}
+        self._thread = threading.Thread(target=self._loop, name="qwen-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, prompt: str) -> Future:
+        future: Future = Future()
+        self._queue.put((prompt, future))
+        return future
+
+    def generate(self, prompt: str, timeout: float | None = None) -> str:
+        return self.submit(prompt).result(timeout)
+
+    def stats(self) -> Dict[int, Dict[str, float]]:
+        """Batches, generated tokens and tokens/sec per observed batch size."""
+        with self._stats_lock:
+            return {
+                size: {
+                    "batches": int(batches),
+                    "tokens": int(tokens),
+                    "tokens_per_second": tokens / seconds if seconds else 0.0,
+                }
+                for size, (batches, tokens, seconds) in sorted(self._by_size.items())
+            }
+
+    def _loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window_seconds
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._run(batch)
+
+    def _run(self, batch: List[Tuple[str, Future]]) -> None:
+        live = [(prompt, future) for prompt, future in batch if future.set_running_or_notify_cancel()]
+        if not live:
+            return
+        started = time.perf_counter()
+        try:
+            outputs = self.generate_fn([prompt for prompt, _ in live])
+        except Exception as exc:
+            for _, future in live:
+                future.set_exception(exc)
+            return
+        elapsed = time.perf_counter() - started
+
+        generated = sum(tokens for _, tokens in outputs)
+        with self._stats_lock:
+            entry = self._by_size.setdefault(len(live), [0, 0, 0.0])
+            entry[0] += 1
+            entry[1] += generated
+            entry[2] += elapsed
+        observe(QWEN_BATCH, elapsed, size=str(len(live)))
+        if QWEN_TOKENS is not None:
+            QWEN_TOKENS.labels(size=str(len(live))).inc(generated)
+        for (_, future), (text, _) in zip(live, outputs):
+            future.set_result(text)
+
+
+@lru_cache(maxsize=4)
+def _batcher(pid: int, tokenizer, model, device, generation_items: tuple) -> QwenBatcher:
+    generate_fn = partial(generate_batch, tokenizer, model, device, dict(generation_items))
+    return QwenBatcher(generate_fn, settings.qwen_batch_max_size, settings.qwen_batch_window_ms)
+
+
+def get_batcher(tokenizer, model, device, generation_kwargs: dict) -> QwenBatcher:
+    """Shared batcher for this model and generation settings in the current process."""
+    # Threads do not survive a fork, so prefork children get their own batcher.
+    return _batcher(os.getpid(), tokenizer, model, device, tuple(sorted(generation_kwargs.items())))
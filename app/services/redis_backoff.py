@@ -0,0 +1,43 @@
+"""Best-effort Redis for the shared caches.
+
+The caches work without Redis: after a failed call Redis is skipped for a
+while, so every later lookup is a local miss rather than another socket
+timeout.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Optional
+
+import redis
+
+from ..config import settings
+
+_RETRY_AFTER_SECONDS = 30.0
+
+
+class RedisBackoff:
+    def __init__(self, client: Optional[redis.Redis] = None, enabled: bool = True, decode_responses: bool = False):
+        self._redis = client
+        self.enabled = enabled
+        self.decode_responses = decode_responses
+        self.errors = 0
+        self._down_until = 0.0
+
+    def client(self) -> Optional[redis.Redis]:
+        """The client, or None while disabled or backing off after a failure."""
+        if not self.enabled or time.monotonic() < self._down_until:
+            return None
+        if self._redis is None:
+            self._redis = redis.from_url(
+                settings.redis_url,
+                decode_responses=self.decode_responses,
+                socket_connect_timeout=1,
+                socket_timeout=2,
+            )
+        return self._redis
+
+    def failed(self) -> None:
+        self.errors += 1
+        self._down_until = time.monotonic() + _RETRY_AFTER_SECONDS
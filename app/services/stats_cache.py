@@ -0,0 +1,69 @@
+"""Redis cache of Trino table statistics, keyed by Iceberg snapshot.
+
+Iceberg tables only change when a snapshot is committed, so statistics
+stored under cluster + ``catalog.schema.table`` + snapshot id stay valid
+until the table's current snapshot moves on. Old snapshots' entries simply
+expire after the TTL.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+from typing import Dict, Optional
+
+import orjson
+import redis
+
+from ..config import settings
+from .redis_backoff import RedisBackoff
+from .trino_stats import TableStats
+
+_KEY_PREFIX = "trino:stats:"
+
+
+class StatsCache:
+    def __init__(self, redis_client: Optional[redis.Redis] = None, ttl_seconds: Optional[int] = None):
+        self.redis = RedisBackoff(redis_client)
+        self.ttl_seconds = ttl_seconds or settings.trino_stats_cache_ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(cluster: str, table: str, snapshot_id: int) -> str:
+        return f"{_KEY_PREFIX}{cluster}:{table.lower()}:{snapshot_id}"
+
+    def get(self, cluster: str, table: str, snapshot_id: int) -> Optional[TableStats]:
+        client = self.redis.client()
+        raw = None
+        if client is not None:
+            try:
+                raw = client.get(self.key(cluster, table, snapshot_id))
+            except redis.RedisError:
+                self.redis.failed()
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return TableStats(**orjson.loads(raw))
+
+    def set(self, cluster: str, stats: TableStats) -> None:
+        # Partial results would be served until the next commit; only keep complete ones.
+        if stats.snapshot_id is None or stats.errors:
+            return
+        client = self.redis.client()
+        if client is None:
+            return
+        try:
+            client.set(
+                self.key(cluster, stats.table, stats.snapshot_id),
+                orjson.dumps(dataclasses.asdict(stats)),
+                ex=self.ttl_seconds,
+            )
+        except redis.RedisError:
+            self.redis.failed()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "errors": self.redis.errors}
+
+
+stats_cache = StatsCache()
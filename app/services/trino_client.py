@@ -1,14 +1,24 @@
 from __future__ import annotations
 
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
 from urllib.parse import parse_qs, urlparse
 
+from ..config import settings
+from .metrics import TRINO_QUERY, observe
+
 try:  # pragma: no cover - exercised indirectly via import errors
     from trino import dbapi
     from trino.auth import BasicAuthentication
+    from trino.exceptions import HttpError
 except ModuleNotFoundError:  # pragma: no cover - depends on optional dependency
     dbapi = None
+    HttpError = OSError  # type: ignore[misc,assignment]
 
     class BasicAuthentication:  # type: ignore[misc]
         """Fallback that mirrors the real class' constructor signature."""
@@ -18,6 +28,10 @@ except ModuleNotFoundError:  # pragma: no cover - depends on optional dependency
             self.password = password
 
 
+# Failures that may leave a connection broken (requests' errors are OSErrors);
+# query errors such as a syntax error or a missing table leave it usable.
+_CONNECTION_ERRORS = (OSError, HttpError)
+
 
 @dataclass
 class _TrinoParams:
@@ -30,22 +44,211 @@ class _TrinoParams:
     http_scheme: str
     session_properties: Dict[str, str]
 
+    def pool_key(self) -> Tuple:
+        """Everything that shapes a session, so pooled connections are interchangeable."""
+        return (
+            self.host,
+            self.port,
+            self.catalog,
+            self.schema,
+            self.user,
+            self.password,
+            self.http_scheme,
+            tuple(sorted(self.session_properties.items())),
+        )
+
+
+class ConnectionPool:
+    """Thread-safe pool of dbapi connections to one Trino endpoint and session."""
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        size: int,
+        idle_seconds: float,
+        acquire_timeout: float,
+        healthcheck_seconds: float,
+    ):
+        self._connect = connect
+        self.size = max(1, size)
+        self.idle_seconds = idle_seconds
+        self.acquire_timeout = acquire_timeout
+        self.healthcheck_seconds = healthcheck_seconds
+        self._idle: Deque[Tuple[Any, float]] = deque()
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except _CONNECTION_ERRORS:
+            # The connection may be in a bad state; do not hand it out again.
+            discard = True
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def acquire(self) -> Any:
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            with self._cond:
+                expired = self._evict_idle()
+                while not self._idle and self._in_use >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"no Trino connection available within {self.acquire_timeout}s")
+                    self._cond.wait(remaining)
+                    expired += self._evict_idle()
+                self._in_use += 1
+                # Most recently used first: it is the least likely to have gone stale.
+                conn, last_used = self._idle.pop() if self._idle else (None, 0.0)
+            _close_all(expired)
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    self._forget()
+                    raise
+                self.created += 1
+                return conn
+            if time.monotonic() - last_used < self.healthcheck_seconds or _healthy(conn):
+                self.reused += 1
+                return conn
+            self._forget()
+            _close_all([conn])
+
+    def release(self, conn: Any, discard: bool = False) -> None:
+        with self._cond:
+            self._in_use -= 1
+            if not discard:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if discard:
+            _close_all([conn])
+
+    def close(self) -> None:
+        with self._cond:
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+        _close_all(idle)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "created": self.created,
+                "reused": self.reused,
+                "evicted": self.evicted,
+            }
+
+    def _evict_idle(self) -> list:
+        cutoff = time.monotonic() - self.idle_seconds
+        expired = []
+        # Oldest entries sit at the left end.
+        while self._idle and self._idle[0][1] < cutoff:
+            expired.append(self._idle.popleft()[0])
+        self.evicted += len(expired)
+        return expired
+
+    def _forget(self) -> None:
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify()
+
+
+def _healthy(conn: Any) -> bool:
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.fetchall()
+        cur.close()
+        return True
+    except Exception:
+        return False
+
+
+def _close_all(connections) -> None:
+    for conn in connections:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def _cancel(cur: Any, cancelled: threading.Event) -> None:
+    cancelled.set()
+    try:
+        cur.cancel()
+    except Exception:
+        pass
+
+
+_pools: Dict[Tuple, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(params: _TrinoParams, connect: Callable[[], Any]) -> ConnectionPool:
+    """Process-wide pool for ``params``; ``connect`` opens a new connection."""
+    # Connections inherited across fork share sockets with the parent.
+    key = (os.getpid(), params.pool_key())
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(
+                connect,
+                size=settings.trino_pool_size,
+                idle_seconds=settings.trino_pool_idle_seconds,
+                acquire_timeout=settings.trino_pool_acquire_timeout,
+                healthcheck_seconds=settings.trino_pool_healthcheck_seconds,
+            )
+            _pools[key] = pool
+        return pool
+
 
 class TrinoClient:
     def __init__(self, jdbc_url: str):
         self.jdbc_url = jdbc_url
         self.params = self._parse_jdbc_url(jdbc_url)
 
-    def query(self, sql: str) -> list[tuple[Any, ...]]:
-        conn = self._connect()
+    def query(self, sql: str, timeout: Optional[float] = None) -> list[tuple[Any, ...]]:
+        """Rows of ``sql``; past ``timeout`` seconds the query is cancelled on
+        the cluster and ``TimeoutError`` raised, so its connection is freed."""
+        start = time.perf_counter()
+        outcome = "error"
         try:
-            cur = conn.cursor()
-            cur.execute(sql)
-            rows = cur.fetchall()
-            cur.close()
+            with get_pool(self.params, self._connect).connection() as conn:
+                cur = conn.cursor()
+                timer = None
+                cancelled = threading.Event()
+                if timeout is not None:
+                    timer = threading.Timer(max(timeout, 0.0), _cancel, args=(cur, cancelled))
+                    timer.daemon = True
+                    timer.start()
+                try:
+                    cur.execute(sql)
+                    rows = cur.fetchall()
+                except Exception as exc:
+                    if cancelled.is_set():
+                        outcome = "timeout"
+                        raise TimeoutError(f"query cancelled after {timeout}s") from exc
+                    raise
+                finally:
+                    if timer is not None:
+                        timer.cancel()
+                cur.close()
+            outcome = "ok"
             return rows
         finally:
-            conn.close()
+            observe(TRINO_QUERY, time.perf_counter() - start, outcome=outcome)
 
     def sample_stats(self, full_table_name: str) -> dict:
         stats: Dict[str, Any] = {"table": full_table_name}
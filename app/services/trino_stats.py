@@ -0,0 +1,177 @@
+"""Table statistics from Trino metadata instead of table scans.
+
+``SHOW STATS`` gives row counts and per-column NDVs; the Iceberg ``$files``,
+``$partitions`` and ``$history`` system tables give file counts and sizes,
+partition skew and the current snapshot. The queries for all tables run
+concurrently on a small thread pool. Each query has its own timeout and the
+whole collection has a time budget; whatever has not answered by then is
+cancelled on the cluster, recorded as an error and left out.
+"""
+
+from __future__ import annotations
+
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from ..config import settings
+
+_POLL_SECONDS = 0.05
+QUERY_KINDS = ("stats", "files", "partitions", "snapshot")
+
+
+@dataclass
+class TableStats:
+    table: str
+    row_count: Optional[float] = None
+    data_size_bytes: Optional[float] = None
+    ndv: Dict[str, float] = field(default_factory=dict)
+    null_fraction: Dict[str, float] = field(default_factory=dict)
+    file_count: Optional[int] = None
+    total_file_bytes: Optional[int] = None
+    partition_count: Optional[int] = None
+    # Largest partition's record count over the mean (1.0 is perfectly even).
+    partition_skew: Optional[float] = None
+    snapshot_id: Optional[int] = None
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def avg_file_bytes(self) -> Optional[float]:
+        if not self.file_count or self.total_file_bytes is None:
+            return None
+        return self.total_file_bytes / self.file_count
+
+
+def quote_table(table: str, suffix: str = "") -> str:
+    """``catalog.schema.table`` as quoted identifiers, ``suffix`` appended to the table."""
+    parts = table.split(".")
+    parts[-1] += suffix
+    return ".".join('"' + part.replace('"', '""') + '"' for part in parts)
+
+
+class StatsCollector:
+    def __init__(
+        self,
+        query: Callable[..., list],
+        workers: Optional[int] = None,
+        query_timeout: Optional[float] = None,
+        time_budget: Optional[float] = None,
+    ):
+        self.query = query
+        self.workers = workers or settings.trino_stats_workers
+        self.query_timeout = query_timeout or settings.trino_stats_query_timeout
+        self.time_budget = time_budget or settings.trino_stats_time_budget
+
+    def collect(self, tables: Sequence[str], kinds: Sequence[str] = QUERY_KINDS) -> Dict[str, TableStats]:
+        results = {table: TableStats(table=table) for table in tables}
+        if not results:
+            return results
+
+        deadline = time.monotonic() + self.time_budget
+        started: Dict[Tuple[str, str], float] = {}
+        executor = ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix="trino-stats")
+        pending: Dict[Future, Tuple[str, str]] = {}
+        for table in results:
+            for kind in kinds:
+                future = executor.submit(self._timed, started, deadline, table, kind)
+                pending[future] = (table, kind)
+
+        try:
+            while pending:
+                now = time.monotonic()
+                if now >= deadline:
+                    for table, kind in pending.values():
+                        results[table].errors[kind] = "time budget exceeded"
+                    break
+                for future, (table, kind) in list(pending.items()):
+                    began = started.get((table, kind))
+                    if began is not None and now - began > self.query_timeout:
+                        results[table].errors[kind] = f"timed out after {self.query_timeout}s"
+                        del pending[future]
+                timeout = min(_POLL_SECONDS, deadline - now)
+                done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    table, kind = pending.pop(future)
+                    try:
+                        self._apply(results[table], kind, future.result())
+                    except TimeoutError:
+                        results[table].errors[kind] = f"timed out after {self.query_timeout}s"
+                    except Exception as exc:
+                        results[table].errors[kind] = str(exc)
+        finally:
+            # Queries still running cancel themselves once their timeout passes.
+            executor.shutdown(wait=False, cancel_futures=True)
+        return results
+
+    def collect_cached(self, tables: Sequence[str], cache, cluster: str) -> Dict[str, TableStats]:
+        """``collect`` that asks only for snapshot ids when ``cache`` already
+        holds stats for a table's current snapshot."""
+        snapshots = self.collect(tables, kinds=("snapshot",))
+        results: Dict[str, TableStats] = {}
+        missing: List[str] = []
+        for table, current in snapshots.items():
+            cached = cache.get(cluster, table, current.snapshot_id) if current.snapshot_id is not None else None
+            if cached is not None:
+                results[table] = cached
+            else:
+                missing.append(table)
+
+        fresh = self.collect(missing, kinds=tuple(k for k in QUERY_KINDS if k != "snapshot"))
+        for table, stats in fresh.items():
+            stats.snapshot_id = snapshots[table].snapshot_id
+            # Tables without snapshots (not Iceberg, or empty) are never cached.
+            if stats.snapshot_id is not None:
+                cache.set(cluster, stats)
+            results[table] = stats
+        return {table: results[table] for table in tables if table in results}
+
+    def _timed(self, started: Dict[Tuple[str, str], float], deadline: float, table: str, kind: str) -> list:
+        now = started[(table, kind)] = time.monotonic()
+        # ``query`` cancels on the cluster past the timeout, returning the pooled connection.
+        return self.query(self._sql(kind, table), timeout=min(self.query_timeout, deadline - now))
+
+    def _sql(self, kind: str, table: str) -> str:
+        if kind == "stats":
+            return f"SHOW STATS FOR {quote_table(table)}"
+        if kind == "files":
+            return f"SELECT count(*), sum(file_size_in_bytes) FROM {quote_table(table, '$files')}"
+        if kind == "partitions":
+            return f"SELECT count(*), max(record_count), avg(record_count) FROM {quote_table(table, '$partitions')}"
+        if kind == "snapshot":
+            # The newest committed snapshot is not current after a rollback; the
+            # current one is the latest ancestor of the table's current state.
+            return (
+                f"SELECT snapshot_id FROM {quote_table(table, '$history')} "
+                "WHERE is_current_ancestor ORDER BY made_current_at DESC LIMIT 1"
+            )
+        raise ValueError(f"Unknown stats query kind: {kind}")
+
+    @staticmethod
+    def _apply(stats: TableStats, kind: str, rows: List[tuple]) -> None:
+        if kind == "stats":
+            # column_name, data_size, distinct_values_count, nulls_fraction, row_count, low, high;
+            # the summary row has no column name and carries the row count.
+            for row in rows:
+                column, data_size, ndv, nulls = row[0], row[1], row[2], row[3]
+                if column is None:
+                    stats.row_count = row[4]
+                    continue
+                if ndv is not None:
+                    stats.ndv[column] = ndv
+                if nulls is not None:
+                    stats.null_fraction[column] = nulls
+                if data_size is not None:
+                    stats.data_size_bytes = (stats.data_size_bytes or 0) + data_size
+        elif kind == "files":
+            if rows:
+                stats.file_count = int(rows[0][0] or 0)
+                stats.total_file_bytes = int(rows[0][1] or 0)
+        elif kind == "partitions":
+            if rows:
+                count, largest, mean = rows[0][0], rows[0][1], rows[0][2]
+                stats.partition_count = int(count or 0)
+                if largest is not None and mean:
+                    stats.partition_skew = float(largest) / float(mean)
+        elif kind == "snapshot":
+            stats.snapshot_id = int(rows[0][0]) if rows and rows[0][0] is not None else None
@@ -0,0 +1,82 @@
+"""Compression for stored task results.
+
+Each blob starts with a one-byte codec marker so results written with one
+codec stay readable after ``RESULT_CODEC`` changes or ``zstandard`` goes
+missing. zstd is used when installed, zlib otherwise.
+"""
+
+from __future__ import annotations
+
+import io
+import zlib
+from typing import Iterator
+
+try:
+    import zstandard
+except ImportError:  # optional: results fall back to zlib
+    zstandard = None
+
+ZSTD, ZLIB, RAW = b"z", b"d", b"r"
+# HTTP Content-Encoding a blob's payload can be served as without decompressing.
+CONTENT_ENCODINGS = {ZSTD: "zstd", ZLIB: "deflate"}
+_CHUNK_SIZE = 256 * 1024
+
+
+def default_codec(name: str = "auto") -> bytes:
+    """Marker for a ``RESULT_CODEC`` name; zstd falls back to zlib when not installed."""
+    name = name.lower()
+    if name not in ("auto", "zstd", "zlib", "none"):
+        raise ValueError(f"unknown RESULT_CODEC {name!r}; expected auto, zstd, zlib or none")
+    if name == "none":
+        return RAW
+    if name == "zlib" or zstandard is None:
+        return ZLIB
+    return ZSTD
+
+
+def compress(data: bytes, codec: bytes = None, level: int = 3) -> bytes:
+    codec = codec or default_codec()
+    if codec == ZSTD:
+        return ZSTD + zstandard.ZstdCompressor(level=level).compress(data)
+    if codec == ZLIB:
+        return ZLIB + zlib.compress(data, min(level, 9))
+    return RAW + data
+
+
+def decompress(blob: bytes) -> bytes:
+    codec, payload = blob[:1], blob[1:]
+    if codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("result is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    if codec == ZLIB:
+        return zlib.decompress(payload)
+    if codec == RAW:
+        return payload
+    raise ValueError(f"unknown result codec {codec!r}")
+
+
+def iter_decompress(blob: bytes, chunk_size: int = _CHUNK_SIZE) -> Iterator[bytes]:
+    """Decompress ``blob`` piecewise, never holding the whole output at once."""
+    codec, payload = blob[:1], memoryview(blob)[1:]
+    if codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("result is zstd-compressed but the zstandard package is not installed")
+        yield from zstandard.ZstdDecompressor().read_to_iter(io.BytesIO(payload), write_size=chunk_size)
+    elif codec == ZLIB:
+        d = zlib.decompressobj()
+        for start in range(0, len(payload), chunk_size):
+            data = payload[start:start + chunk_size]
+            while data:
+                out = d.decompress(data, chunk_size)
+                if out:
+                    yield out
+                data = d.unconsumed_tail
+        tail = d.flush()
+        if tail:
+            yield tail
+    elif codec == RAW:
+        for start in range(0, len(payload), chunk_size):
+            yield bytes(payload[start:start + chunk_size])
+    else:
+        raise ValueError(f"unknown result codec {codec!r}")
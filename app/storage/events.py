@@ -0,0 +1,107 @@
+"""Task completion events over Redis pub/sub.
+
+``Repo.finish`` publishes only the task id on ``task:events``, in the same
+transaction that writes the final status; woken pollers re-read the status
+from the task hash. In the API process one ``redis.asyncio`` subscription
+feeds every long-poller: waiters register an ``asyncio.Event`` per task id
+and are woken when its id is published, so an idle poller costs a dict
+entry rather than a loop.
+While the subscription is down, ``connected`` is False and pollers fall back
+to re-reading the status every ``STATUS_POLL_SECONDS``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Set
+
+import redis
+import redis.asyncio as aioredis
+
+from ..config import settings
+
+CHANNEL = "task:events"
+_READY_TIMEOUT_SECONDS = 2.0
+_RECONNECT_SECONDS = 1.0
+
+
+def publish_task_event(client: redis.Redis, taskid: str) -> None:
+    """Announce that ``taskid`` finished; ``client`` may be a pipeline."""
+    client.publish(CHANNEL, taskid)
+
+
+class TaskEvents:
+    def __init__(self, redis_url: Optional[str] = None):
+        self.redis_url = redis_url or settings.redis_url
+        self._waiters: Dict[str, Set[asyncio.Event]] = defaultdict(set)
+        self._reader: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribed: Optional[asyncio.Event] = None
+
+    @asynccontextmanager
+    async def subscription(self, taskid: str) -> AsyncIterator[asyncio.Event]:
+        """Event set when ``taskid`` is announced (or when events may have been
+        missed); re-check the task's status after entering the block."""
+        await self._ensure_reader()
+        event = asyncio.Event()
+        self._waiters[taskid].add(event)
+        try:
+            yield event
+        finally:
+            waiters = self._waiters.get(taskid)
+            if waiters is not None:
+                waiters.discard(event)
+                if not waiters:
+                    del self._waiters[taskid]
+
+    @property
+    def connected(self) -> bool:
+        """Whether completions are being received; while not, callers poll instead."""
+        return self._subscribed is not None and self._subscribed.is_set()
+
+    async def _ensure_reader(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._reader is not None and not self._reader.done() and self._loop is loop:
+            # Running, connected or reconnecting; a disconnected reader is not waited for again.
+            return
+        self._loop = loop
+        self._subscribed = asyncio.Event()
+        self._reader = loop.create_task(self._listen())
+        try:
+            # Subscribing before the caller re-reads the status means no completion slips between the two.
+            await asyncio.wait_for(self._subscribed.wait(), _READY_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            pass  # Redis unavailable: callers poll until the reader reconnects.
+
+    async def _listen(self) -> None:
+        while True:
+            client = aioredis.from_url(self.redis_url, decode_responses=True)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(CHANNEL)
+                self._subscribed.set()
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._notify(message["data"])
+            except (redis.RedisError, OSError):
+                self._subscribed.clear()
+                # Announcements may have been lost; let every waiter re-check.
+                self._notify_all()
+                await asyncio.sleep(_RECONNECT_SECONDS)
+            finally:
+                await pubsub.aclose()
+                await client.aclose()
+
+    def _notify(self, taskid: str) -> None:
+        for event in self._waiters.get(taskid, ()):
+            event.set()
+
+    def _notify_all(self) -> None:
+        for waiters in self._waiters.values():
+            for event in waiters:
+                event.set()
+
+
+task_events = TaskEvents()
@@ -1,32 +1,151 @@
+import time
 import redis
+from .codec import compress, decompress, default_codec
+from .events import publish_task_event
 from .schema import TaskRecord
 from ..config import settings
+from ..services.metrics import redis_op
 import orjson
 
 class Repo:
+    """Task state in Redis.
+
+    ``task:{id}`` is a small hash (status, error, timing); the result lives
+    compressed under ``task:{id}:result`` and the manifest used for
+    incremental re-analysis under ``task:{id}:manifest``. The keys expire
+    together, after a retention that depends on the task's status.
+    """
+
     def __init__(self):
         self.r = redis.from_url(settings.redis_url, decode_responses=True)
+        # Result blobs are binary; everything that touches them goes through this client.
+        self.rb = redis.from_url(settings.redis_url)
+        # Resolved up front so a bad RESULT_CODEC fails at startup, not when a task finishes.
+        self.codec = default_codec(settings.result_codec)
 
     def _key(self, taskid: str) -> str:
         return f"task:{taskid}"
 
+    def _result_key(self, taskid: str) -> str:
+        return f"task:{taskid}:result"
+
+    def _manifest_key(self, taskid: str) -> str:
+        return f"task:{taskid}:manifest"
+
+    @staticmethod
+    def ttl_for(status: str) -> int:
+        if status == "DONE":
+            return settings.task_result_ttl_seconds
+        if status == "FAILED":
+            return settings.task_failed_ttl_seconds
+        return settings.task_running_ttl_seconds
+
+    @redis_op("task_save")
     def save(self, rec: TaskRecord):
-        self.r.hset(self._key(rec.taskid), mapping={
-            "status": rec.status,
-            "error": rec.error or "",
-            "result_json": rec.result_json or "",
-        })
+        key = self._key(rec.taskid)
+        pipe = self.r.pipeline(transaction=True)
+        pipe.hset(key, mapping={"status": rec.status, "error": rec.error or "", "created_at": time.time()})
+        pipe.expire(key, self.ttl_for(rec.status))
+        pipe.execute()
 
+    @redis_op("task_get")
     def get(self, taskid: str) -> TaskRecord | None:
         data = self.r.hgetall(self._key(taskid))
         if not data:
             return None
         return TaskRecord(taskid=taskid, status=data.get("status", "RUNNING"),
                           error=data.get("error") or None,
-                          result_json=data.get("result_json") or None)
+                          started_at=float(data["started_at"]) if data.get("started_at") else None,
+                          finished_at=float(data["finished_at"]) if data.get("finished_at") else None)
+
+    @redis_op("task_created_at")
+    def created_at(self, taskid: str) -> float | None:
+        value = self.r.hget(self._key(taskid), "created_at")
+        return float(value) if value else None
+
+    @redis_op("task_get_status")
+    def get_status(self, taskid: str) -> str | None:
+        return self.r.hget(self._key(taskid), "status")
+
+    @redis_op("task_query_count")
+    def query_count(self, taskid: str) -> int | None:
+        """Number of queries in the stored result, recorded by ``finish``."""
+        value = self.r.hget(self._key(taskid), "query_count")
+        return int(value) if value else None
+
+    @redis_op("task_get_result_blob")
+    def get_result_blob(self, taskid: str) -> bytes | None:
+        """The stored result as written: codec marker followed by the payload."""
+        return self.rb.get(self._result_key(taskid))
+
+    def get_result(self, taskid: str) -> bytes | None:
+        """The result as orjson bytes, or None when absent or expired."""
+        blob = self.get_result_blob(taskid)
+        return decompress(blob) if blob is not None else None
+
+    @redis_op("task_get_manifest")
+    def get_manifest(self, taskid: str) -> dict | None:
+        """What a finished task analyzed (see ``services.incremental``), for use as a base."""
+        blob = self.rb.get(self._manifest_key(taskid))
+        return orjson.loads(decompress(blob)) if blob is not None else None
+
+    @redis_op("task_finish")
+    def finish(self, taskid: str, status: str, result: dict | None = None,
+               error: str | None = None, started_at: float | None = None,
+               manifest: dict | None = None):
+        """Record the outcome of a task and announce it, in one transaction."""
+        finished_at = time.time()
+        ttl = self.ttl_for(status)
+        mapping = {"status": status, "error": error or "", "finished_at": finished_at}
+        if started_at is not None:
+            mapping["started_at"] = started_at
+            mapping["duration_ms"] = round((finished_at - started_at) * 1000)
+        if result is not None:
+            # Served as X-Total-Queries, so paging never scans the stored result for it.
+            mapping["query_count"] = len(result.get("queries", ()))
+        pipe = self.rb.pipeline(transaction=True)
+        pipe.hset(self._key(taskid), mapping=mapping)
+        pipe.expire(self._key(taskid), ttl)
+        if result is not None:
+            blob = compress(orjson.dumps(result), self.codec, settings.result_compression_level)
+            pipe.set(self._result_key(taskid), blob, ex=ttl)
+        if manifest is not None:
+            blob = compress(orjson.dumps(manifest), self.codec, settings.result_compression_level)
+            pipe.set(self._manifest_key(taskid), blob, ex=ttl)
+        publish_task_event(pipe, taskid)
+        pipe.execute()
+
+    def _memo_key(self, fingerprint: str) -> str:
+        return f"memo:{fingerprint}"
+
+    @redis_op("memo_claim")
+    def claim_memo(self, fingerprint: str, taskid: str, ttl: int) -> str | None:
+        """Register ``taskid`` for ``fingerprint`` unless a live task holds it.
 
-    def set_status(self, taskid: str, status: str, error: str | None = None):
-        self.r.hset(self._key(taskid), mapping={"status": status, "error": error or ""})
+        A successful claim also saves ``taskid`` as RUNNING in the same
+        transaction, so a request that finds the memo always finds the task.
+        A memo whose task has failed or expired is taken over. Returns the
+        task id holding the memo (RUNNING or DONE), or None when the claim
+        succeeded.
+        """
+        key = self._memo_key(fingerprint)
+        with self.r.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    existing = pipe.get(key)
+                    if existing and pipe.hget(self._key(existing), "status") in ("RUNNING", "DONE"):
+                        pipe.unwatch()
+                        return existing
+                    pipe.multi()
+                    pipe.set(key, taskid, ex=ttl)
+                    pipe.hset(self._key(taskid), mapping={"status": "RUNNING", "error": "", "created_at": time.time()})
+                    pipe.expire(self._key(taskid), self.ttl_for("RUNNING"))
+                    pipe.execute()
+                    return None
+                except redis.WatchError:
+                    continue
 
-    def set_result(self, taskid: str, result: dict):
-        self.r.hset(self._key(taskid), "result_json", orjson.dumps(result).decode())
+    @redis_op("memo_set")
+    def set_memo(self, fingerprint: str, taskid: str, ttl: int):
+        self.r.set(self._memo_key(fingerprint), taskid, ex=ttl)
@@ -0,0 +1,99 @@
+"""Items of a stored result, read piecewise from its decompressed chunks.
+
+A result is a JSON object whose values are arrays of objects (``ddl``,
+``migrations``, ``queries``). ``iter_items`` scans the bytes for structure
+only and hands out each element's JSON as it is completed, so paging and
+NDJSON never hold the whole decoded result: memory stays at one chunk plus
+the element being read.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Iterable, Iterator, Optional, Tuple
+
+import orjson
+
+_TOKEN = re.compile(rb'[{}\[\]":,]')
+_STRING_END = re.compile(rb'["\\]')
+# An object without nested objects or arrays, matched whole (the common element);
+# possessive quantifiers (Python 3.11) keep a truncated one from backtracking.
+_FLAT_OBJECT = re.compile(rb'\{(?:[^"{}\[\]]++|"(?:[^"\\]++|\\.)*+")*+\}', re.DOTALL)
+_QUOTE, _BACKSLASH = ord('"'), ord("\\")
+_OPEN, _CLOSE = frozenset(b"{["), frozenset(b"}]")
+
+
+def iter_items(chunks: Iterable[bytes]) -> Iterator[Tuple[str, Optional[bytes]]]:
+    """``(key, None)`` when a top-level array opens, then ``(key, element)``
+    for each object or array in it. Other top-level values are skipped."""
+    chunks = iter(chunks)
+    buf = bytearray()
+    pos = 0
+    depth = 0
+    key: Optional[str] = None
+    expect_key = False
+    in_array = False
+    item_start: Optional[int] = None
+    while True:
+        match = _TOKEN.search(buf, pos)
+        end = None
+        if match is not None and buf[match.start()] == _QUOTE:
+            end = _string_end(buf, match.start() + 1)
+        if match is None or (buf[match.start()] == _QUOTE and end is None):
+            # Out of complete tokens: keep only the unfinished element or string, then read on.
+            pos = len(buf) if match is None else match.start()
+            keep = item_start if item_start is not None else pos
+            del buf[:keep]
+            pos -= keep
+            if item_start is not None:
+                item_start = 0
+            chunk = next(chunks, None)
+            if chunk is None:
+                return
+            buf += chunk
+            continue
+
+        i = match.start()
+        char = buf[i]
+        pos = i + 1
+        if char == _QUOTE:
+            if depth == 1 and expect_key:
+                key = orjson.loads(bytes(buf[i:end + 1]))
+            pos = end + 1
+        elif char in _OPEN:
+            depth += 1
+            if depth == 1:
+                expect_key = True
+            elif depth == 2:
+                in_array = char == ord("[") and key is not None
+                if in_array:
+                    yield key, None
+            elif depth == 3 and in_array:
+                flat = _FLAT_OBJECT.match(buf, i)
+                if flat is not None:
+                    depth -= 1
+                    pos = flat.end()
+                    yield key, bytes(buf[i:pos])
+                else:
+                    item_start = i
+        elif char in _CLOSE:
+            depth -= 1
+            if depth == 2 and item_start is not None:
+                yield key, bytes(buf[item_start:pos])
+                item_start = None
+        elif depth == 1:
+            expect_key = char == ord(",")
+
+
+def _string_end(buf: bytearray, start: int) -> Optional[int]:
+    """Index of the quote closing the string that starts at ``start``, None if not in ``buf`` yet."""
+    while True:
+        match = _STRING_END.search(buf, start)
+        if match is None:
+            return None
+        if buf[match.start()] == _BACKSLASH:
+            if match.start() + 1 >= len(buf):
+                return None
+            start = match.start() + 2
+            continue
+        return match.start()
@@ -5,4 +5,5 @@ class TaskRecord(BaseModel):
     taskid: str
     status: str  # RUNNING | DONE | FAILED
     error: Optional[str] = None
-    result_json: Optional[str] = None  # orjson string
+    started_at: Optional[float] = None  # unix time the worker picked the task up
+    finished_at: Optional[float] = None
@@ -0,0 +1,130 @@
+"""Submitted workloads staged in Redis.
+
+``/new`` stores the workload once under ``workload:{id}`` (the JDBC URL in a
+hash, DDL statements and queries as lists of JSON items) and the Celery task
+carries only the id, so broker messages stay small however large the
+workload is. Streamed uploads append to the same keys in batches as lines
+are validated.
+"""
+
+from __future__ import annotations
+
+from typing import Iterator, List, Optional
+
+import orjson
+import redis
+
+from ..config import settings
+from ..models import DDLItem, NewRequest, QueryItem
+from ..services.metrics import redis_op
+
+_BATCH = 1000
+
+
+class WorkloadWriter:
+    """Buffers validated items and appends them with one RPUSH per batch."""
+
+    def __init__(self, store: "WorkloadStore", workloadid: str):
+        self.store = store
+        self.workloadid = workloadid
+        self._ddl: List[bytes] = []
+        self._queries: List[bytes] = []
+        self.ddl_count = 0
+        self.query_count = 0
+
+    def add_ddl(self, item: DDLItem) -> None:
+        self._ddl.append(orjson.dumps(item.model_dump()))
+        self.ddl_count += 1
+
+    def add_query(self, item: QueryItem) -> None:
+        self._queries.append(orjson.dumps(item.model_dump()))
+        self.query_count += 1
+
+    @property
+    def pending(self) -> int:
+        return len(self._ddl) + len(self._queries)
+
+    @redis_op("workload_append")
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        pipe = self.store.r.pipeline(transaction=False)
+        for key, items in ((self.store._ddl_key(self.workloadid), self._ddl),
+                           (self.store._queries_key(self.workloadid), self._queries)):
+            if items:
+                pipe.rpush(key, *items)
+                pipe.expire(key, settings.workload_ttl_seconds)
+        pipe.execute()
+        self._ddl, self._queries = [], []
+
+    @redis_op("workload_commit")
+    def commit(self, url: str, base_taskid: Optional[str] = None) -> None:
+        """Flush what is buffered and mark the workload complete."""
+        self.flush()
+        key = self.store._key(self.workloadid)
+        meta = {"url": url, "ddl": self.ddl_count, "queries": self.query_count}
+        if base_taskid:
+            meta["base_taskid"] = base_taskid
+        pipe = self.store.r.pipeline(transaction=True)
+        pipe.hset(key, mapping=meta)
+        pipe.expire(key, settings.workload_ttl_seconds)
+        pipe.execute()
+
+    def discard(self) -> None:
+        self._ddl, self._queries = [], []
+        self.store.delete(self.workloadid)
+
+
+class WorkloadStore:
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self.r = redis_client or redis.from_url(settings.redis_url, decode_responses=True)
+
+    def _key(self, workloadid: str) -> str:
+        return f"workload:{workloadid}"
+
+    def _ddl_key(self, workloadid: str) -> str:
+        return f"workload:{workloadid}:ddl"
+
+    def _queries_key(self, workloadid: str) -> str:
+        return f"workload:{workloadid}:queries"
+
+    def writer(self, workloadid: str) -> WorkloadWriter:
+        return WorkloadWriter(self, workloadid)
+
+    def save(self, workloadid: str, req: NewRequest) -> None:
+        writer = self.writer(workloadid)
+        for item in req.ddl:
+            writer.add_ddl(item)
+            if writer.pending >= _BATCH:
+                writer.flush()
+        for item in req.queries:
+            writer.add_query(item)
+            if writer.pending >= _BATCH:
+                writer.flush()
+        writer.commit(req.url, req.base_taskid)
+
+    @redis_op("workload_load")
+    def load(self, workloadid: str) -> NewRequest:
+        meta = self.r.hgetall(self._key(workloadid))
+        if not meta:
+            raise KeyError(f"workload {workloadid} not found or expired")
+        return NewRequest(
+            url=meta["url"],
+            ddl=list(self._items(self._ddl_key(workloadid))),
+            queries=list(self._items(self._queries_key(workloadid))),
+            base_taskid=meta.get("base_taskid") or None,
+        )
+
+    @redis_op("workload_delete")
+    def delete(self, workloadid: str) -> None:
+        self.r.delete(self._key(workloadid), self._ddl_key(workloadid), self._queries_key(workloadid))
+
+    def _items(self, key: str) -> Iterator[dict]:
+        start = 0
+        while True:
+            page = self.r.lrange(key, start, start + _BATCH - 1)
+            for raw in page:
+                yield orjson.loads(raw)
+            if len(page) < _BATCH:
+                return
+            start += _BATCH
@@ -4,14 +4,15 @@ from __future__ import annotations
 
 import re
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import sqlparse
 
 from ..models import DDLItem
+from .parse_cache import parse_cache
 
 
-@dataclass
+@dataclass(frozen=True)
 class TableDefinition:
     """Structured information extracted from a CREATE TABLE statement."""
 
@@ -24,6 +25,9 @@ class TableDefinition:
 
 class DDLTools:
     _create_table_regex = re.compile(r"CREATE\s+TABLE\s+([`\"\w\.]+)", re.IGNORECASE)
+    _column_regex = re.compile(r'\s*("[^"]+"|`[^`]+`|\w+)\s+(.+)', re.DOTALL)
+    _non_column_items = {"CONSTRAINT", "PRIMARY", "UNIQUE", "FOREIGN", "LIKE", "CHECK", "INDEX", "KEY"}
+    _with_regex = re.compile(r"\bWITH\s*\(", re.IGNORECASE)
 
     @staticmethod
     def catalog_of_first(ddl: List[DDLItem]) -> str:
@@ -41,8 +45,84 @@ class DDLTools:
                 tables.append(parsed)
         return tables
 
+    @staticmethod
+    def split_body(body: str) -> Tuple[str, str]:
+        """Split a table body into its parenthesised column list and the rest."""
+        start = body.find("(")
+        if start == -1 or body[:start].strip():
+            return "", body
+        depth = 0
+        quote = None
+        for i in range(start, len(body)):
+            ch = body[i]
+            if quote:
+                if ch == quote:
+                    quote = None
+            elif ch in ("'", '"', "`"):
+                quote = ch
+            elif ch == "(":
+                depth += 1
+            elif ch == ")":
+                depth -= 1
+                if depth == 0:
+                    return body[start : i + 1], body[i + 1 :]
+        return body, ""
+
+    @staticmethod
+    def columns(table: TableDefinition) -> Dict[str, str]:
+        """Column names (lower-cased, unquoted) mapped to their declared types."""
+        column_list, _ = DDLTools.split_body(table.body)
+        columns: Dict[str, str] = {}
+        for item in DDLTools._split_top_level(column_list[1:-1]):
+            match = DDLTools._column_regex.match(item)
+            if not match or match.group(1).upper() in DDLTools._non_column_items:
+                continue
+            name = match.group(1).strip('`"').lower()
+            columns[name] = match.group(2).strip()
+        return columns
+
+    @staticmethod
+    def split_properties(options: str) -> Optional[Tuple[str, List[str], str]]:
+        """Split table options around their ``WITH (...)`` clause.
+
+        Returns the text before the clause, its property entries and the text
+        after it, or None when the options have no WITH clause.
+        """
+        match = DDLTools._with_regex.search(options)
+        if not match:
+            return None
+        clause, tail = DDLTools.split_body(options[match.end() - 1 :])
+        inner = clause[1:-1] if clause.endswith(")") else clause[1:]
+        return options[: match.start()], DDLTools._split_top_level(inner), tail
+
+    @staticmethod
+    def _split_top_level(text: str) -> List[str]:
+        items: List[str] = []
+        depth = 0
+        quote = None
+        current = 0
+        for i, ch in enumerate(text):
+            if quote:
+                if ch == quote:
+                    quote = None
+            elif ch in ("'", '"', "`"):
+                quote = ch
+            elif ch == "(":
+                depth += 1
+            elif ch == ")":
+                depth -= 1
+            elif ch == "," and depth == 0:
+                items.append(text[current:i])
+                current = i + 1
+        items.append(text[current:])
+        return [item.strip() for item in items if item.strip()]
+
     @staticmethod
     def _parse_create_table(statement: str) -> Optional[TableDefinition]:
+        return parse_cache.get_or_parse("ddl", statement, DDLTools._parse_create_table_uncached)
+
+    @staticmethod
+    def _parse_create_table_uncached(statement: str) -> Optional[TableDefinition]:
         stmt = statement.strip().rstrip(";")
         match = DDLTools._create_table_regex.search(stmt)
         if not match:
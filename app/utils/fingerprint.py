@@ -0,0 +1,90 @@
+"""Structural fingerprints for SQL queries.
+
+Two queries share a fingerprint when they differ only in literal values,
+whitespace, comments, keyword case or identifier quoting. Grouping a
+workload by fingerprint lets the analysis run once per query shape and fan
+the result back out to every member.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from ..models import QueryItem
+from .sql_rewriter import identifier_part, tokenize
+
+_LITERAL_KINDS = {"string", "number"}
+
+
+@dataclass
+class QueryGroup:
+    """Queries sharing one fingerprint, in workload order."""
+
+    fingerprint: str
+    members: List[QueryItem] = field(default_factory=list)
+
+    @property
+    def representative(self) -> QueryItem:
+        return self.members[0]
+
+    @property
+    def runquantity(self) -> int:
+        return sum(q.runquantity for q in self.members)
+
+
+def fingerprint_query(query: str) -> str:
+    parts: List[str] = []
+    for kind, text in tokenize(query):
+        if kind in ("ws", "comment"):
+            continue
+        if kind in _LITERAL_KINDS:
+            parts.append("?")
+        elif kind == "qident":
+            parts.append(identifier_part((kind, text)))
+        else:
+            parts.append(text.lower())
+    return hashlib.sha1(" ".join(parts).encode("utf-8", "surrogatepass")).hexdigest()[:16]
+
+
+def literals_of(query: str) -> List[str]:
+    return [text for kind, text in tokenize(query) if kind in _LITERAL_KINDS]
+
+
+def group_queries(queries: Sequence[QueryItem]) -> List[QueryGroup]:
+    groups: Dict[str, QueryGroup] = {}
+    for q in queries:
+        fp = fingerprint_query(q.query)
+        groups.setdefault(fp, QueryGroup(fingerprint=fp)).members.append(q)
+    return list(groups.values())
+
+
+def transplant_literals(text: str, source: Sequence[str], target: Sequence[str]) -> Optional[str]:
+    """Replace, in order, the ``source`` literals found in ``text`` by ``target``.
+
+    Returns ``None`` unless every literal of ``text`` lines up with
+    ``source`` one for one, i.e. when the substitution is unambiguous.
+    """
+    if len(source) != len(target):
+        return None
+    out: List[str] = []
+    k = 0
+    for kind, token in tokenize(text):
+        if kind in _LITERAL_KINDS:
+            if k >= len(source) or token != source[k]:
+                return None
+            out.append(target[k])
+            k += 1
+        else:
+            out.append(token)
+    if k != len(source):
+        return None
+    return "".join(out)
+
+
+def apply_to_member(text: str, representative: QueryItem, member: QueryItem) -> Optional[str]:
+    """Carry a rewrite of ``representative`` over to another group member."""
+    if member is representative or member.query == representative.query:
+        return text
+    return transplant_literals(text, literals_of(representative.query), literals_of(member.query))
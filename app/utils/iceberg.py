@@ -1,10 +1,102 @@
-def recommend_table_properties():
-    return {
+"""Iceberg table property recommendations.
+
+Without statistics every table gets the same defaults. Given a table's
+collected stats (``TableStats`` or anything with the same attributes), the
+target file size, Parquet row groups, compression codec and level, and
+manifest merging are scaled to the table's size, and tables already
+fragmented into many small files get hash-distributed writes.
+
+Every table gets ``format-version`` 2: the row-level deletes behind Trino's
+DELETE, UPDATE and MERGE need it, and version 1 has nothing to offer in
+return.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Optional, Tuple
+
+MB = 1024 * 1024
+GB = 1024 * MB
+TB = 1024 * GB
+
+# (table size below, target file size)
+_TARGET_FILE_SIZES = [
+    (1 * GB, 64 * MB),
+    (10 * GB, 128 * MB),
+    (100 * GB, 256 * MB),
+    (1 * TB, 512 * MB),
+]
+_HUGE_TABLE_FILE_SIZE = 1 * GB
+# (table size below, Parquet codec, level or None). Small tables are rewritten
+# and scanned whole most often, so they get the cheapest codec; larger ones
+# trade write CPU for less storage and scan I/O.
+_COMPRESSION = [
+    (1 * GB, "snappy", None),
+    (100 * GB, "zstd", 3),
+    (1 * TB, "zstd", 7),
+]
+_HUGE_TABLE_COMPRESSION = ("zstd", 9)
+_MAX_ROW_GROUP_BYTES = 128 * MB
+_MANY_FILES = 10_000
+# Files this much smaller than the target on average count as fragmentation.
+_SMALL_FILE_RATIO = 4
+_SMALL_FILE_MIN_COUNT = 100
+
+
+def recommend_table_properties(stats=None) -> Dict[str, str]:
+    props = {
         "format-version": "2",
         "write.format.default": "PARQUET",
         "commit.manifest.min-count-to-merge": "5",
         "write.parquet.compression-codec": "zstd",
         "write.parquet.compression-level": "7",
-        "write.target-file-size-bytes": str(512 * 1024 * 1024),
+        "write.target-file-size-bytes": str(512 * MB),
         "history.expire.min-snapshots-to-keep": "5",
     }
+    table_bytes = _table_bytes(stats)
+    if table_bytes is None:
+        return props
+
+    target = target_file_size(table_bytes)
+    props["write.target-file-size-bytes"] = str(target)
+    props["write.parquet.row-group-size-bytes"] = str(min(_MAX_ROW_GROUP_BYTES, target))
+    codec, level = compression(table_bytes)
+    props["write.parquet.compression-codec"] = codec
+    if level is None:
+        del props["write.parquet.compression-level"]
+    else:
+        props["write.parquet.compression-level"] = str(level)
+
+    file_count = getattr(stats, "file_count", None) or 0
+    if file_count > _MANY_FILES:
+        props["commit.manifest.min-count-to-merge"] = "10"
+        props["commit.manifest.target-size-bytes"] = str(32 * MB)
+
+    avg_file_bytes = getattr(stats, "avg_file_bytes", None)
+    if file_count >= _SMALL_FILE_MIN_COUNT and avg_file_bytes and avg_file_bytes * _SMALL_FILE_RATIO < target:
+        props["write.distribution-mode"] = "hash"
+    return props
+
+
+def target_file_size(table_bytes: float) -> int:
+    for limit, size in _TARGET_FILE_SIZES:
+        if table_bytes < limit:
+            return size
+    return _HUGE_TABLE_FILE_SIZE
+
+
+def compression(table_bytes: float) -> Tuple[str, Optional[int]]:
+    for limit, codec, level in _COMPRESSION:
+        if table_bytes < limit:
+            return codec, level
+    return _HUGE_TABLE_COMPRESSION
+
+
+def _table_bytes(stats) -> Optional[float]:
+    if stats is None:
+        return None
+    total = getattr(stats, "total_file_bytes", None)
+    if total:
+        return float(total)
+    data_size = getattr(stats, "data_size_bytes", None)
+    return float(data_size) if data_size else None
@@ -0,0 +1,84 @@
+"""Process-wide, content-addressed cache for parsed SQL.
+
+Parsers register under a namespace (``"ddl"``, ``"tokens"``, ...) and the
+cache keys each entry by a hash of the statement text, so the same DDL or
+query submitted again is never parsed twice in a worker process.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+from ..config import settings
+
+T = TypeVar("T")
+
+
+def _default_size(text: str, value: object) -> int:
+    return 2 * len(text) + 256
+
+
+class ParseCache:
+    """LRU cache bounded by an estimate of the memory held by its entries."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, bytes], Tuple[object, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_parse(
+        self,
+        namespace: str,
+        text: str,
+        parse: Callable[[str], T],
+        sizeof: Optional[Callable[[str, T], int]] = None,
+    ) -> T:
+        key = (namespace, hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest())
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]  # type: ignore[return-value]
+            self.misses += 1
+
+        value = parse(text)
+        size = (sizeof or _default_size)(text, value)
+        if size > self.max_bytes:
+            return value
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (value, size)
+                self._size += size
+                while self._size > self.max_bytes and self._entries:
+                    _, (_, evicted_size) = self._entries.popitem(last=False)
+                    self._size -= evicted_size
+                    self.evictions += 1
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+parse_cache = ParseCache(settings.parse_cache_max_bytes)
@@ -0,0 +1,153 @@
+"""Which columns of which tables a workload filters, joins, groups and sorts on.
+
+A light token walk over each query: tables and their aliases come from the
+FROM/JOIN lists (resolved through the analysis' ``TableMatcher``), and column
+references are attributed by qualifier, or for bare names by the one table
+in the query that has such a column. The current clause is kept per
+parenthesis level, so a subquery does not change the clause around it, and
+a filter reads the same with its literal on either side (``5 < col``).
+Usage is weighted by ``runquantity``.
+"""
+
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from typing import Dict, List, Mapping, Optional, Sequence
+
+from .fingerprint import QueryGroup
+from .sql_rewriter import TableMatcher, _FROM_TERMINATORS, _read_chain, identifier_part, tokenize
+
+# Usage kinds: equality filter, range filter, join key, GROUP BY key, ORDER BY key.
+EQ, RANGE, JOIN, GROUP, ORDER = "eq", "range", "join", "group", "order"
+
+# Clause a keyword opens; None for clauses whose columns are not tracked.
+_CLAUSES = {
+    "SELECT": None, "FROM": "from", "JOIN": "from", "ON": JOIN, "WHERE": "where", "HAVING": None,
+    "GROUP": GROUP, "ORDER": ORDER, "LIMIT": None, "UNION": None, "INTERSECT": None, "EXCEPT": None,
+    "WINDOW": None,
+}
+_RANGE_OPS = {"<", ">", "BETWEEN"}
+_EQ_OPS = {"=", "IN"}
+_NOT_ALIASES = _FROM_TERMINATORS | {
+    "JOIN", "ON", "LEFT", "RIGHT", "INNER", "FULL", "CROSS", "OUTER", "NATURAL", "USING", "AS",
+    "TABLESAMPLE", "FOR", "LATERAL", "UNNEST",
+}
+
+# target table -> column -> usage kind -> weight
+ColumnUsage = Dict[str, Dict[str, Counter]]
+
+
+def column_usage(
+    groups: Sequence[QueryGroup], matcher: TableMatcher, columns: Mapping[str, Sequence[str]]
+) -> ColumnUsage:
+    """Aggregate column usage over ``groups``.
+
+    ``columns`` maps each matcher target to its column names; it is used to
+    attribute unqualified column references.
+    """
+    usage: ColumnUsage = defaultdict(lambda: defaultdict(Counter))
+    for group in groups:
+        weight = max(1, group.runquantity)
+        for target, column, kind in _query_usage(group.representative.query, matcher, columns):
+            usage[target][column][kind] += weight
+    return usage
+
+
+def _query_usage(query: str, matcher: TableMatcher, columns: Mapping[str, Sequence[str]]):
+    tokens = [t for t in tokenize(query) if t[0] not in ("ws", "comment")]
+    aliases: Dict[str, str] = {}
+    references: List[tuple] = []  # (qualifier or None, column, kind)
+    clause: Optional[str] = None
+    # Clause outside each open parenthesis, restored when it closes.
+    enclosing: List[Optional[str]] = []
+    prev: Optional[str] = None
+    i = 0
+    while i < len(tokens):
+        kind, text = tokens[i]
+        keyword = text.upper() if kind == "word" else None
+        if keyword in _CLAUSES:
+            clause = _CLAUSES[keyword]
+            prev = keyword
+            i += 1
+            continue
+
+        if kind in ("word", "qident"):
+            end, parts = _read_chain(tokens, i)
+            if clause == "from" and prev in ("FROM", "JOIN", ","):
+                target = matcher.lookup(parts)
+                end = _read_alias(tokens, end, aliases, target)
+                if target is not None:
+                    aliases.setdefault(parts[-1], target)
+            elif clause in ("where", JOIN, GROUP, ORDER) and keyword not in _NOT_ALIASES:
+                is_call = end < len(tokens) and tokens[end] == ("op", "(")
+                if not is_call:
+                    if clause == "where":
+                        usage_kind = _predicate_kind(tokens, end) or _reversed_predicate_kind(tokens, i)
+                    else:
+                        usage_kind = clause
+                    if usage_kind is not None:
+                        qualifier = parts[-2] if len(parts) > 1 else None
+                        references.append((qualifier, parts[-1], usage_kind))
+            prev = keyword
+            i = end
+            continue
+
+        if text == "(":
+            enclosing.append(clause)
+        elif text == ")" and enclosing:
+            clause = enclosing.pop()
+        prev = text
+        i += 1
+
+    in_query = set(aliases.values())
+    for qualifier, column, usage_kind in references:
+        if qualifier is not None:
+            target = aliases.get(qualifier)
+        else:
+            owners = [t for t in in_query if column in columns.get(t, ())]
+            target = owners[0] if len(owners) == 1 else None
+        if target is not None and column in columns.get(target, ()):
+            yield target, column, usage_kind
+
+
+def _read_alias(tokens, i: int, aliases: Dict[str, str], target: Optional[str]) -> int:
+    if i < len(tokens) and tokens[i][0] == "word" and tokens[i][1].upper() == "AS":
+        i += 1
+    if i < len(tokens) and tokens[i][0] in ("word", "qident") and tokens[i][1].upper() not in _NOT_ALIASES:
+        if target is not None:
+            aliases[identifier_part(tokens[i])] = target
+        i += 1
+    return i
+
+
+def _predicate_kind(tokens, i: int) -> Optional[str]:
+    """Kind of filter for the column ending before ``i``, from the operator after it."""
+    if i >= len(tokens):
+        return None
+    op = tokens[i][1].upper()
+    if op == "<" and i + 1 < len(tokens) and tokens[i + 1][1] == ">":
+        return None  # <>
+    if op in _EQ_OPS:
+        return EQ
+    if op in _RANGE_OPS:
+        return RANGE
+    return None
+
+
+def _reversed_predicate_kind(tokens, i: int) -> Optional[str]:
+    """Kind of filter for the column starting at ``i`` when a literal is on
+    the left (``5 < col``, ``'x' = col``)."""
+    j = i - 1
+    if j < 0 or tokens[j][0] != "op":
+        return None
+    op = tokens[j][1]
+    if op in ("=", ">") and j > 0 and tokens[j - 1][0] == "op" and tokens[j - 1][1] in ("<", ">", "!"):
+        j -= 1
+        op = tokens[j][1] + op
+    if j == 0 or tokens[j - 1][0] not in ("number", "string"):
+        return None
+    if op == "=":
+        return EQ
+    if op in ("<", ">", "<=", ">="):
+        return RANGE
+    return None
@@ -1,40 +1,315 @@
+import atexit
+import logging
+import os
 import re
-from typing import Dict, List
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from billiard.pool import Pool
+
 from ..models import QueryItem, QueryOut
+from .parse_cache import parse_cache
 
+logger = logging.getLogger(__name__)
+
+# Token rules: (trigger token, required previous keyword or None, replacement).
+# ``{token}`` in the replacement expands to the trigger as written in the query.
 RULES = [
-    ("SELECT *", "SELECT /* explicit columns required */"),
-    ("JOIN", "/* ensure join keys are partition/sort-aligned */ JOIN"),
+    ("*", "SELECT", "/* explicit columns required */"),
+    ("JOIN", None, "/* ensure join keys are partition/sort-aligned */ {token}"),
 ]
 
+Token = Tuple[str, str]  # (kind, text)
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<ws>\s+)
+  | (?P<comment>--[^\r\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<string>'[^']*(?:''[^']*)*(?:'|\Z))
+  | (?P<qident>"[^"]*(?:""[^"]*)*(?:"|\Z)|`[^`]*(?:`|\Z))
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)
+  | (?P<word>[^\W\d][\w$]*)
+  | (?P<op>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# Keywords after which an identifier chain names a table.
+_TABLE_PREFIXES = {"FROM", "JOIN", "INTO", "UPDATE", "TABLE", "USING"}
+# Keywords that end a FROM list (so commas stop separating tables).
+_FROM_TERMINATORS = {
+    "WHERE", "GROUP", "HAVING", "ORDER", "LIMIT", "OFFSET", "FETCH", "WINDOW",
+    "UNION", "INTERSECT", "EXCEPT", "SELECT", "SET", "VALUES",
+}
+_QUERY_STARTERS = {"SELECT", "WITH", "VALUES"}
+
+# Rewrite pool of this process and the (pid, workers) it was started for.
+_pool: Optional[Pool] = None
+_pool_owner: Tuple[int, int] = (0, 0)
+# Analyses rewritten in the pool, pools started, and fallbacks to serial after a failure.
+_pool_stats = {"parallel": 0, "pool_starts": 0, "fallbacks": 0}
+
+
+def tokenize(query: str) -> Tuple[Token, ...]:
+    return parse_cache.get_or_parse("tokens", query, _tokenize, _tokens_size)
+
+
+def _tokenize(query: str) -> Tuple[Token, ...]:
+    return tuple((m.lastgroup, m.group()) for m in _TOKEN_RE.finditer(query))
+
+
+def _tokens_size(query: str, tokens: Tuple[Token, ...]) -> int:
+    # Token text shares no memory with the query string; each token also
+    # costs a tuple plus the interned kind name.
+    return 2 * len(query) + 120 * len(tokens) + 256
+
+
+def identifier_part(token: Token) -> str:
+    """Normalise one identifier token: strip quotes and fold case."""
+    kind, text = token
+    if kind == "qident":
+        quote = text[0]
+        inner = text[1:-1] if len(text) > 1 and text.endswith(quote) else text[1:]
+        return inner.replace(quote * 2, quote).lower()
+    return text.lower()
+
+
+class TableMatcher:
+    """Table-name variants of a mapping indexed by their normalised parts.
+
+    Built once per analysis; lookups are a single dict probe per identifier
+    chain, whatever the number of tables.
+    """
+
+    def __init__(self, table_mapping: Dict[str, str]):
+        self.mapping = dict(table_mapping)
+        self._targets: Dict[Tuple[str, ...], str] = {}
+        for source, target in table_mapping.items():
+            parts = _chain_parts(tokenize(source))
+            if parts and parts not in self._targets:
+                self._targets[parts] = target
+
+    def lookup(self, parts: Tuple[str, ...]) -> Optional[str]:
+        return self._targets.get(parts)
+
+    def sub(self, query: str) -> str:
+        return _rewrite_tokens(tokenize(query), self, rules=False)
+
+
 class Rewriter:
     @staticmethod
-    def qualify_names(q: str, table_mapping: Dict[str, str]) -> str:
+    def compile(table_mapping: Dict[str, str]) -> TableMatcher:
+        return TableMatcher(table_mapping)
+
+    @staticmethod
+    def qualify_names(q: str, table_mapping: Union[Dict[str, str], TableMatcher]) -> str:
         return Rewriter.replace_tables(q, table_mapping)
 
     @staticmethod
     def apply_rules(q: str) -> str:
-        out = q
-        for a, b in RULES:
-            out = out.replace(a, b)
-        return out
+        return _rewrite_tokens(tokenize(q), None, rules=True)
 
     @staticmethod
-    def replace_tables(query: str, table_mapping: Dict[str, str]) -> str:
-        result = query
-        for source, target in table_mapping.items():
-            if source.startswith(('"', "`")) and source.endswith(('"', "`")):
-                pattern = re.compile(rf"(?i){re.escape(source)}")
-            else:
-                pattern = re.compile(rf"(?i)\b{re.escape(source)}\b")
-            result = pattern.sub(target, result)
-        return result
+    def replace_tables(query: str, table_mapping: Union[Dict[str, str], TableMatcher]) -> str:
+        return _as_matcher(table_mapping).sub(query)
+
+    @staticmethod
+    def rewrite_query(query: str, table_mapping: Union[Dict[str, str], TableMatcher]) -> str:
+        """Qualify table names and apply every rule in a single token walk."""
+        return _rewrite_tokens(tokenize(query), _as_matcher(table_mapping), rules=True)
+
+    @staticmethod
+    def referenced_tables(query: str, table_mapping: Union[Dict[str, str], TableMatcher]) -> List[str]:
+        """Mapped targets of the tables ``query`` reads or writes, in order of appearance."""
+        found: List[str] = []
+        _rewrite_tokens(tokenize(query), _as_matcher(table_mapping), rules=False, found=found)
+        return list(dict.fromkeys(found))
 
     @staticmethod
-    def rewrite(queries: List[QueryItem], table_mapping: Dict[str, str]) -> List[QueryOut]:
-        out: List[QueryOut] = []
-        for qi in queries:
-            q2 = Rewriter.qualify_names(qi.query, table_mapping)
-            q3 = Rewriter.apply_rules(q2)
-            out.append(QueryOut(queryid=qi.queryid, query=q3))
+    def rewrite(
+        queries: List[QueryItem],
+        table_mapping: Union[Dict[str, str], TableMatcher],
+        workers: int = 1,
+        chunk_size: int = 2000,
+    ) -> List[QueryOut]:
+        """Rewrite ``queries`` in order.
+
+        With ``workers > 1`` and more than one chunk of queries, chunks are
+        rewritten in this process's pool (Celery prefork children included);
+        results keep the input order, and the serial path is used if the pool
+        fails.
+        """
+        matcher = _as_matcher(table_mapping)
+        texts = [qi.query for qi in queries]
+        rewritten = None
+        if workers > 1 and len(texts) > chunk_size:
+            rewritten = _rewrite_parallel(texts, matcher, workers, chunk_size)
+        if rewritten is None:
+            rewritten = [Rewriter.rewrite_query(text, matcher) for text in texts]
+        return [QueryOut(queryid=qi.queryid, query=text) for qi, text in zip(queries, rewritten)]
+
+
+def _as_matcher(table_mapping: Union[Dict[str, str], TableMatcher]) -> TableMatcher:
+    if isinstance(table_mapping, TableMatcher):
+        return table_mapping
+    return TableMatcher(table_mapping)
+
+
+def _rewrite_pool(workers: int) -> Pool:
+    """This process's rewrite pool, started on first use and kept for later analyses.
+
+    billiard's pool, unlike ``concurrent.futures``, may be started from a
+    daemonic Celery prefork child.
+    """
+    global _pool, _pool_owner
+    owner = (os.getpid(), workers)
+    if _pool is None or _pool_owner != owner:
+        _close_pool()
+        _pool = Pool(processes=workers)
+        _pool_owner = owner
+        _pool_stats["pool_starts"] += 1
+    return _pool
+
+
+def _close_pool(terminate: bool = False) -> None:
+    """Stop this process's pool; one inherited through fork belongs to the parent and is only forgotten."""
+    global _pool
+    if _pool is not None and _pool_owner[0] == os.getpid():
+        if terminate:
+            _pool.terminate()
+        else:
+            _pool.close()
+            _pool.join()
+    _pool = None
+
+
+atexit.register(_close_pool)
+
+
+def pool_stats() -> Dict[str, int]:
+    return dict(_pool_stats)
+
+
+def _rewrite_chunk(job: Tuple[TableMatcher, List[str]]) -> List[str]:
+    matcher, texts = job
+    return [Rewriter.rewrite_query(text, matcher) for text in texts]
+
+
+def _rewrite_parallel(
+    texts: List[str], matcher: TableMatcher, workers: int, chunk_size: int
+) -> Optional[List[str]]:
+    jobs = [(matcher, texts[i : i + chunk_size]) for i in range(0, len(texts), chunk_size)]
+    try:
+        pool = _rewrite_pool(workers)
+        # One job per chunk rather than ``map``: billiard credits a ``map`` result to a
+        # single worker, and the others then wait out its message-consumption check on exit.
+        pending = [pool.apply_async(_rewrite_chunk, (job,)) for job in jobs]
+        out: List[str] = []
+        for result in pending:
+            out.extend(result.get())
+        _pool_stats["parallel"] += 1
         return out
+    except Exception:
+        # e.g. process creation forbidden here, or a broken pool: start a fresh one next time
+        _close_pool(terminate=True)
+        _pool_stats["fallbacks"] += 1
+        if _pool_stats["fallbacks"] == 1:
+            logger.exception("parallel rewrite failed; rewriting serially (logged once per process)")
+        return None
+
+
+def _chain_parts(tokens: Sequence[Token]) -> Tuple[str, ...]:
+    significant = [t for t in tokens if t[0] not in ("ws", "comment")]
+    end, parts = _read_chain(significant, 0)
+    if end != len(significant):
+        return ()
+    return parts
+
+
+def _read_chain(tokens: Sequence[Token], start: int) -> Tuple[int, Tuple[str, ...]]:
+    """Read ``a.b."c"`` starting at ``start``; return the end index and parts."""
+    if start >= len(tokens) or tokens[start][0] not in ("word", "qident"):
+        return start, ()
+    parts = [identifier_part(tokens[start])]
+    i = start + 1
+    while (
+        i + 1 < len(tokens)
+        and tokens[i] == ("op", ".")
+        and tokens[i + 1][0] in ("word", "qident")
+    ):
+        parts.append(identifier_part(tokens[i + 1]))
+        i += 2
+    return i, tuple(parts)
+
+
+def _rewrite_tokens(
+    tokens: Sequence[Token],
+    matcher: Optional[TableMatcher],
+    rules: bool,
+    found: Optional[List[str]] = None,
+) -> str:
+    """Re-emit ``tokens`` with tables qualified and rules applied.
+
+    Mapped table targets are appended to ``found`` when it is given.
+    """
+    out: List[str] = []
+    prev: Optional[str] = None  # upper-cased previous significant keyword/operator
+    # One frame per parenthesis level: [is_query (None until known), in_from_list]
+    frames: List[list] = [[True, False]]
+    i = 0
+    n = len(tokens)
+    while i < n:
+        kind, text = tokens[i]
+        if kind in ("ws", "comment"):
+            out.append(text)
+            i += 1
+            continue
+
+        frame = frames[-1]
+        keyword = text.upper() if kind == "word" else None
+        if frame[0] is None:
+            frame[0] = keyword in _QUERY_STARTERS
+
+        if kind in ("word", "qident"):
+            end, parts = _read_chain(tokens, i)
+            is_single = end == i + 1
+            table_position = (prev in _TABLE_PREFIXES and frame[0]) or (prev == "," and frame[1])
+            target = matcher.lookup(parts) if matcher is not None and table_position else None
+            if target is not None:
+                out.append(target)
+                if found is not None:
+                    found.append(target)
+            elif is_single and rules and keyword is not None:
+                out.append(_apply_rule(text, keyword, prev))
+            else:
+                out.extend(t[1] for t in tokens[i:end])
+
+            if is_single and keyword is not None:
+                if keyword == "FROM" and frame[0]:
+                    frame[1] = True
+                elif keyword in _FROM_TERMINATORS:
+                    frame[1] = False
+                prev = keyword
+            else:
+                prev = None
+            i = end
+            continue
+
+        if kind == "op":
+            if text == "(":
+                frames.append([None, False])
+            elif text == ")" and len(frames) > 1:
+                frames.pop()
+            out.append(_apply_rule(text, text, prev) if rules else text)
+            prev = text
+        else:
+            out.append(text)
+            prev = None
+        i += 1
+    return "".join(out)
+
+
+def _apply_rule(text: str, trigger: str, prev: Optional[str]) -> str:
+    for rule_trigger, required_prev, replacement in RULES:
+        if trigger == rule_trigger and (required_prev is None or prev == required_prev):
+            return replacement.format(token=text)
+    return text
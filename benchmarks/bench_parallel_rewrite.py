@@ -0,0 +1,53 @@
+"""Speedup of chunked parallel rewriting against the number of worker processes.
+
+Usage: python benchmarks/bench_parallel_rewrite.py [query_count] [chunk_size]
+"""
+
+from pathlib import Path
+import os
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.models import QueryItem
+from app.utils.parse_cache import parse_cache
+from app.utils.sql_rewriter import Rewriter
+from bench_sql_rewriter import CORPUS, build_mapping, load_corpus
+
+
+def build_workload(count):
+    corpus = load_corpus(CORPUS)
+    # Distinct texts so the token cache cannot short-circuit the work.
+    return [
+        QueryItem(queryid=f"q{i}", query=f"{corpus[i % len(corpus)]}\n-- run {i}", runquantity=1)
+        for i in range(count)
+    ]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    queries = build_workload(count)
+    matcher = Rewriter.compile(build_mapping(300))
+    cores = os.cpu_count() or 1
+    worker_counts = sorted({1, *[w for w in (2, 4, 8, 16, 32) if w <= cores], cores})
+
+    print(f"{count} queries, chunk size {chunk_size}, {cores} cores")
+    print(f"{'workers':>8} {'seconds':>8} {'q/s':>9} {'speedup':>8}")
+    baseline = None
+    expected = None
+    for workers in worker_counts:
+        parse_cache.clear()
+        start = time.perf_counter()
+        out = Rewriter.rewrite(queries, matcher, workers=workers, chunk_size=chunk_size)
+        elapsed = time.perf_counter() - start
+        if expected is None:
+            expected = out
+        assert out == expected, "parallel output differs from serial output"
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>8.2f} {count / elapsed:>9.0f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Generation throughput of the local Qwen model against batch size.
+
+Needs torch/transformers and a model at QWEN_MODEL_PATH.
+
+Usage: python benchmarks/bench_qwen_batching.py [prompt_count] [max_new_tokens]
+"""
+
+from pathlib import Path
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.config import settings
+from app.services.llm import _load_qwen_model
+from app.services.qwen_batcher import generate_batch
+
+PROMPTS = [
+    "Suggest Iceberg partitioning for a table of click events filtered by day and user_id.",
+    "Rewrite this Trino query to avoid a cross join: SELECT * FROM a, b WHERE a.id = b.id",
+    "Which sorted_by columns help a query grouping orders by customer_id and order_date?",
+    "Explain when a pre-aggregated table beats scanning raw events in Trino.",
+]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    max_new_tokens = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    tokenizer, model, device = _load_qwen_model(settings.qwen_model_path, settings.qwen_device, settings.qwen_dtype)
+    pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+    generation_kwargs = {
+        "max_new_tokens": max_new_tokens,
+        "do_sample": False,
+        "eos_token_id": tokenizer.eos_token_id,
+        "pad_token_id": pad_token_id,
+    }
+    prompts = [PROMPTS[i % len(PROMPTS)] for i in range(count)]
+
+    generate_batch(tokenizer, model, device, generation_kwargs, prompts[:1])  # warm-up
+    print(f"{count} prompts, {max_new_tokens} new tokens max, device {device}")
+    print(f"{'batch':>6} {'seconds':>8} {'tokens':>7} {'tok/s':>8} {'speedup':>8}")
+    baseline = None
+    for batch_size in (1, 2, 4, 8, 16):
+        if batch_size > count:
+            break
+        tokens = 0
+        started = time.perf_counter()
+        for i in range(0, count, batch_size):
+            outputs = generate_batch(tokenizer, model, device, generation_kwargs, prompts[i : i + batch_size])
+            tokens += sum(n for _, n in outputs)
+        elapsed = time.perf_counter() - started
+        rate = tokens / elapsed
+        baseline = baseline or rate
+        print(f"{batch_size:>6} {elapsed:>8.2f} {tokens:>7} {rate:>8.1f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
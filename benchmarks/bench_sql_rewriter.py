@@ -0,0 +1,88 @@
+"""Throughput (queries/second) of the token-walk rewriter against the old
+``str.replace`` + per-entry regex implementation, over a Trino query corpus.
+
+Usage: python benchmarks/bench_sql_rewriter.py [corpus.sql] [table_count]
+"""
+
+from pathlib import Path
+import re
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.utils.sql_rewriter import Rewriter
+
+CORPUS = Path(__file__).resolve().parent / "corpus" / "trino_queries.sql"
+BASE_TABLES = [
+    "lineitem", "orders", "customer", "supplier", "nation", "region",
+    "part", "partsupp", "events", "users", "items",
+]
+DURATION = 2.0
+
+LEGACY_RULES = [
+    ("SELECT *", "SELECT /* explicit columns required */"),
+    ("JOIN", "/* ensure join keys are partition/sort-aligned */ JOIN"),
+]
+
+
+def legacy_rewrite(query, table_mapping):
+    result = query
+    for source, target in table_mapping.items():
+        if source.startswith(('"', "`")) and source.endswith(('"', "`")):
+            pattern = re.compile(rf"(?i){re.escape(source)}")
+        else:
+            pattern = re.compile(rf"(?i)\b{re.escape(source)}\b")
+        result = pattern.sub(target, result)
+    for a, b in LEGACY_RULES:
+        result = result.replace(a, b)
+    return result
+
+
+def load_corpus(path):
+    text = Path(path).read_text()
+    return [s.strip() for s in text.split(";") if s.strip()]
+
+
+def build_mapping(table_count):
+    tables = list(BASE_TABLES)
+    tables += [f"table_{i:04d}" for i in range(max(0, table_count - len(tables)))]
+    mapping = {}
+    for table in tables:
+        target = f"iceberg.opt_bench.{table}"
+        for schema in ("public", "sf1"):
+            for catalog in ("iceberg", "tpch"):
+                mapping.setdefault(f"{catalog}.{schema}.{table}", target)
+                mapping.setdefault(f'"{catalog}"."{schema}"."{table}"', target)
+            mapping.setdefault(f"{schema}.{table}", target)
+            mapping.setdefault(f'"{schema}"."{table}"', target)
+        mapping.setdefault(table, target)
+        mapping.setdefault(f'"{table}"', target)
+    return mapping
+
+
+def qps(fn, queries):
+    done = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        for q in queries:
+            fn(q)
+        done += len(queries)
+    return done / (time.perf_counter() - start)
+
+
+def main():
+    corpus = load_corpus(sys.argv[1] if len(sys.argv) > 1 else CORPUS)
+    table_counts = [int(sys.argv[2])] if len(sys.argv) > 2 else [11, 100, 300]
+    print(f"corpus: {len(corpus)} queries, {sum(map(len, corpus)) / 1024:.1f} KB")
+    print(f"{'tables':>7} {'legacy q/s':>11} {'token q/s':>10} {'speedup':>8}")
+    for table_count in table_counts:
+        mapping = build_mapping(table_count)
+        matcher = Rewriter.compile(mapping)
+        legacy = qps(lambda q: legacy_rewrite(q, mapping), corpus)
+        token = qps(lambda q: Rewriter.rewrite_query(q, matcher), corpus)
+        print(f"{table_count:>7} {legacy:>11.0f} {token:>10.0f} {token / legacy:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Compare per-entry regex table replacement with the compiled TableMatcher.
+
+Usage: python benchmarks/bench_table_rewriter.py
+"""
+
+from pathlib import Path
+import re
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.utils.sql_rewriter import TableMatcher
+
+TABLE_COUNTS = [10, 100, 300]
+QUERY_SIZES = [1_000, 5_000, 20_000]
+REPEAT = 3
+
+
+def legacy_replace_tables(query, table_mapping):
+    result = query
+    for source, target in table_mapping.items():
+        if source.startswith(('"', "`")) and source.endswith(('"', "`")):
+            pattern = re.compile(rf"(?i){re.escape(source)}")
+        else:
+            pattern = re.compile(rf"(?i)\b{re.escape(source)}\b")
+        result = pattern.sub(target, result)
+    return result
+
+
+def build_mapping(table_count):
+    mapping = {}
+    for i in range(table_count):
+        table = f"table_{i:04d}"
+        target = f"lake.opt_bench.{table}"
+        for variant in (
+            f"lake.public.{table}",
+            f'"lake"."public"."{table}"',
+            f"public.{table}",
+            f'"public"."{table}"',
+            table,
+            f'"{table}"',
+        ):
+            mapping.setdefault(variant, target)
+    return mapping
+
+
+def build_query(table_count, size):
+    parts = []
+    i = 0
+    while sum(len(p) for p in parts) < size:
+        a = f"table_{i % table_count:04d}"
+        b = f"public.table_{(i * 7 + 3) % table_count:04d}"
+        parts.append(
+            f"SELECT a.id, b.amount FROM {a} a JOIN {b} b ON a.id = b.id WHERE b.amount > {i}\nUNION ALL\n"
+        )
+        i += 1
+    return "".join(parts) + "SELECT 1"
+
+
+def timed(fn, *args):
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'tables':>7} {'query KB':>9} {'legacy ms':>10} {'compile ms':>11} {'matcher ms':>11} {'speedup':>8}")
+    for table_count in TABLE_COUNTS:
+        mapping = build_mapping(table_count)
+        compile_s = timed(TableMatcher, mapping)
+        matcher = TableMatcher(mapping)
+        for size in QUERY_SIZES:
+            query = build_query(table_count, size)
+            assert matcher.sub(query).count("lake.opt_bench.") > 0
+            legacy_s = timed(legacy_replace_tables, query, mapping)
+            matcher_s = timed(matcher.sub, query)
+            print(
+                f"{table_count:>7} {len(query) / 1024:>9.1f} {legacy_s * 1e3:>10.2f} "
+                f"{compile_s * 1e3:>11.2f} {matcher_s * 1e3:>11.2f} {legacy_s / matcher_s:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
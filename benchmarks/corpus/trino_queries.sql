@@ -0,0 +1,135 @@
+-- TPC-H style workload written for the Trino tpch/iceberg connectors, plus a
+-- few dashboard queries. Statements are separated by semicolons.
+
+-- Q1: pricing summary report
+SELECT
+  returnflag,
+  linestatus,
+  sum(quantity) AS sum_qty,
+  sum(extendedprice) AS sum_base_price,
+  sum(extendedprice * (1 - discount)) AS sum_disc_price,
+  sum(extendedprice * (1 - discount) * (1 + tax)) AS sum_charge,
+  avg(quantity) AS avg_qty,
+  avg(extendedprice) AS avg_price,
+  avg(discount) AS avg_disc,
+  count(*) AS count_order
+FROM lineitem
+WHERE shipdate <= DATE '1998-12-01' - INTERVAL '90' DAY
+GROUP BY returnflag, linestatus
+ORDER BY returnflag, linestatus;
+
+-- Q3: shipping priority
+SELECT
+  l.orderkey,
+  sum(l.extendedprice * (1 - l.discount)) AS revenue,
+  o.orderdate,
+  o.shippriority
+FROM customer AS c
+JOIN orders AS o ON c.custkey = o.custkey
+JOIN lineitem AS l ON l.orderkey = o.orderkey
+WHERE c.mktsegment = 'BUILDING'
+  AND o.orderdate < DATE '1995-03-15'
+  AND l.shipdate > DATE '1995-03-15'
+GROUP BY l.orderkey, o.orderdate, o.shippriority
+ORDER BY revenue DESC, o.orderdate
+LIMIT 10;
+
+-- Q5: local supplier volume
+SELECT n.name, sum(l.extendedprice * (1 - l.discount)) AS revenue
+FROM customer c, orders o, lineitem l, supplier s, nation n, region r
+WHERE c.custkey = o.custkey
+  AND l.orderkey = o.orderkey
+  AND l.suppkey = s.suppkey
+  AND c.nationkey = s.nationkey
+  AND s.nationkey = n.nationkey
+  AND n.regionkey = r.regionkey
+  AND r.name = 'ASIA'
+  AND o.orderdate >= DATE '1994-01-01'
+  AND o.orderdate < DATE '1994-01-01' + INTERVAL '1' YEAR
+GROUP BY n.name
+ORDER BY revenue DESC;
+
+-- Q6: forecasting revenue change
+SELECT sum(extendedprice * discount) AS revenue
+FROM tpch.sf1.lineitem
+WHERE shipdate >= DATE '1994-01-01'
+  AND shipdate < DATE '1995-01-01'
+  AND discount BETWEEN 0.06 - 0.01 AND 0.06 + 0.01
+  AND quantity < 24;
+
+-- Q10: returned item reporting
+SELECT
+  c.custkey, c.name,
+  sum(l.extendedprice * (1 - l.discount)) AS revenue,
+  c.acctbal, n.name, c.address, c.phone, c.comment
+FROM "customer" c
+JOIN "orders" o ON c.custkey = o.custkey
+JOIN "lineitem" l ON l.orderkey = o.orderkey
+JOIN "nation" n ON c.nationkey = n.nationkey
+WHERE o.orderdate >= DATE '1993-10-01'
+  AND o.orderdate < DATE '1993-10-01' + INTERVAL '3' MONTH
+  AND l.returnflag = 'R'
+GROUP BY c.custkey, c.name, c.acctbal, c.phone, n.name, c.address, c.comment
+ORDER BY revenue DESC
+LIMIT 20;
+
+-- Q13: customer distribution
+SELECT c_count, count(*) AS custdist
+FROM (
+  SELECT c.custkey, count(o.orderkey) AS c_count
+  FROM customer c LEFT OUTER JOIN orders o
+    ON c.custkey = o.custkey AND o.comment NOT LIKE '%special%requests%'
+  GROUP BY c.custkey
+) AS c_orders
+GROUP BY c_count
+ORDER BY custdist DESC, c_count DESC;
+
+-- Q15: top supplier
+WITH revenue0 AS (
+  SELECT suppkey AS supplier_no, sum(extendedprice * (1 - discount)) AS total_revenue
+  FROM lineitem
+  WHERE shipdate >= DATE '1996-01-01' AND shipdate < DATE '1996-04-01'
+  GROUP BY suppkey
+)
+SELECT s.suppkey, s.name, s.address, s.phone, r.total_revenue
+FROM supplier s, revenue0 r
+WHERE s.suppkey = r.supplier_no
+  AND r.total_revenue = (SELECT max(total_revenue) FROM revenue0)
+ORDER BY s.suppkey;
+
+-- Q18: large volume customer
+SELECT c.name, c.custkey, o.orderkey, o.orderdate, o.totalprice, sum(l.quantity)
+FROM customer c, orders o, lineitem l
+WHERE o.orderkey IN (
+    SELECT orderkey FROM lineitem GROUP BY orderkey HAVING sum(quantity) > 300
+  )
+  AND c.custkey = o.custkey
+  AND o.orderkey = l.orderkey
+GROUP BY c.name, c.custkey, o.orderkey, o.orderdate, o.totalprice
+ORDER BY o.totalprice DESC, o.orderdate
+LIMIT 100;
+
+-- Dashboard: daily active users from the events lake
+SELECT date_trunc('day', e.ts) AS day, count(DISTINCT e.user_id) AS dau
+FROM iceberg.public.events e
+WHERE e.ts >= current_timestamp - INTERVAL '30' DAY
+  AND e.event_type <> 'JOIN events SELECT * FROM users' -- literal must survive
+GROUP BY 1
+ORDER BY 1;
+
+-- Dashboard: revenue per country
+SELECT u.country, sum(e.price) AS revenue /* FROM events */
+FROM iceberg.public.events e
+LEFT JOIN iceberg.public.users u ON e.user_id = u.user_id
+WHERE e.event_type = 'purchase' AND e.ts >= TIMESTAMP '2024-01-01 00:00:00'
+GROUP BY u.country
+ORDER BY revenue DESC;
+
+-- Ad hoc exploration
+SELECT * FROM public.events_archive WHERE sku LIKE 'A-%' LIMIT 100;
+
+-- Unnest and lateral access
+SELECT o.orderkey, t.tag
+FROM orders o
+CROSS JOIN UNNEST(split(o.comment, ' ')) AS t (tag)
+WHERE cardinality(split(o.comment, ' ')) > 3;
@@ -0,0 +1,142 @@
+from pathlib import Path
+import asyncio
+import sys
+import time
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.config import settings
+from app.routers import tasks
+from app.storage import events as events_module
+from app.storage.events import TaskEvents
+
+
+async def _no_reader(self):
+    self._subscribed = asyncio.Event()
+    self._subscribed.set()
+
+
+def test_long_poll_wakes_on_completion_event(monkeypatch):
+    monkeypatch.setattr(TaskEvents, "_ensure_reader", _no_reader)
+    monkeypatch.setattr(settings, "status_reconcile_seconds", 30)
+    events = TaskEvents()
+    monkeypatch.setattr(tasks, "task_events", events)
+    state = {"status": "RUNNING"}
+    checks = []  # list.append is atomic across the to_thread workers
+
+    def status_of(task_id):
+        status = state["status"]
+        checks.append(status)
+        return status
+
+    monkeypatch.setattr(tasks, "_status", status_of)
+
+    async def scenario():
+        async def finish():
+            # Finish once every poller has subscribed and re-read RUNNING.
+            while len(checks) < 2 * 200:
+                await asyncio.sleep(0.01)
+            state["status"] = "DONE"
+            events._notify("t1")
+            events._notify("other")
+
+        pollers = [tasks.get_status(task_id="t1", longpoll=True, _=None) for _ in range(200)]
+        # Far below the 30s reconcile timeout: only the event can wake the pollers in time.
+        results = await asyncio.wait_for(asyncio.gather(finish(), *pollers), 10)
+        return results[1:]
+
+    responses = asyncio.run(scenario())
+
+    assert {r.status for r in responses} == {"DONE"}
+    # Each poller: the first read, the re-read after subscribing and one after its wake-up.
+    assert len(checks) == 3 * 200
+    assert events._waiters == {}
+
+
+def test_pollers_poll_without_waiting_on_a_down_subscription(monkeypatch):
+    async def never_subscribes(self):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(TaskEvents, "_listen", never_subscribes)
+    monkeypatch.setattr(events_module, "_READY_TIMEOUT_SECONDS", 0.5)
+    monkeypatch.setattr(settings, "status_reconcile_seconds", 30)
+    monkeypatch.setattr(settings, "status_poll_seconds", 0.001)
+    events = TaskEvents()
+    monkeypatch.setattr(tasks, "task_events", events)
+    state = {"checks": 0}
+
+    def status_of(task_id):
+        state["checks"] += 1
+        return "DONE" if state["checks"] >= 20 else "RUNNING"
+
+    monkeypatch.setattr(tasks, "_status", status_of)
+
+    async def scenario():
+        # Waiting for the subscription on each of the ~10 loops would take 5s.
+        response = await asyncio.wait_for(tasks.get_status(task_id="t1", longpoll=True, _=None), 2)
+        events._reader.cancel()
+        return response
+
+    assert asyncio.run(scenario()).status == "DONE"
+    assert not events.connected and state["checks"] == 20
+
+
+def test_unknown_task_is_404(monkeypatch):
+    monkeypatch.setattr(tasks, "_status", lambda task_id: None)
+
+    with pytest.raises(tasks.HTTPException) as exc:
+        asyncio.run(tasks.get_status(task_id="missing", longpoll=True, _=None))
+
+    assert exc.value.status_code == 404
+
+
+class _RecordingPipeline:
+    def __init__(self, log):
+        self.log = log
+
+    def hset(self, key, mapping):
+        self.log.append(("hset", key, mapping))
+
+    def expire(self, key, seconds):
+        self.log.append(("expire", key, seconds))
+
+    def set(self, key, value, ex=None):
+        self.log.append(("set", key, value, ex))
+
+    def publish(self, channel, message):
+        self.log.append(("publish", channel, message))
+
+    def execute(self):
+        self.log.append(("execute",))
+
+
+class _RecordingRedis:
+    def __init__(self):
+        self.log = []
+
+    def pipeline(self, transaction=True):
+        assert transaction
+        return _RecordingPipeline(self.log)
+
+
+def test_finish_writes_outcome_and_announces_in_one_transaction():
+    from app.storage.codec import decompress
+    from app.storage.events import CHANNEL
+    from app.storage.repo import Repo
+
+    repo = Repo()
+    repo.rb = _RecordingRedis()
+    repo.finish("t1", "DONE", result={"ddl": [], "queries": [{"queryid": "q"}]}, started_at=time.time() - 2)
+
+    (op, key, mapping), expire, stored, publish, execute = repo.rb.log
+    assert (op, key) == ("hset", "task:t1")
+    assert mapping["status"] == "DONE" and "result_json" not in mapping
+    assert mapping["query_count"] == 1
+    assert 1900 <= mapping["duration_ms"] <= 3000
+    assert expire == ("expire", "task:t1", settings.task_result_ttl_seconds)
+    assert stored[0] == "set" and stored[1] == "task:t1:result"
+    assert decompress(stored[2]) == b'{"ddl":[],"queries":[{"queryid":"q"}]}' and stored[3] == settings.task_result_ttl_seconds
+    assert publish == ("publish", CHANNEL, "t1")
+    assert execute == ("execute",)
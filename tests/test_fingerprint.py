@@ -0,0 +1,64 @@
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.models import QueryItem
+from app.utils.fingerprint import apply_to_member, fingerprint_query, group_queries
+
+
+def test_fingerprint_ignores_literals_whitespace_case_and_comments():
+    a = fingerprint_query("SELECT id FROM events WHERE country = 'DE' AND price > 10")
+    b = fingerprint_query("select  id\nfrom \"events\" -- nightly\nwhere country = 'FR' and price > 2.5")
+    c = fingerprint_query("SELECT id FROM events WHERE country = 'DE' OR price > 10")
+
+    assert a == b
+    assert a != c
+
+
+def test_group_queries_sums_runquantity_in_workload_order():
+    queries = [
+        QueryItem(queryid="1", query="SELECT 1 FROM t WHERE x = 1", runquantity=5),
+        QueryItem(queryid="2", query="SELECT 1 FROM u", runquantity=1),
+        QueryItem(queryid="3", query="SELECT 1 FROM t WHERE x = 2", runquantity=7),
+    ]
+
+    groups = group_queries(queries)
+
+    assert [[q.queryid for q in g.members] for g in groups] == [["1", "3"], ["2"]]
+    assert groups[0].runquantity == 12
+    assert groups[0].representative.queryid == "1"
+
+
+def test_apply_to_member_transplants_literals():
+    rep = QueryItem(queryid="1", query="SELECT * FROM t WHERE d = DATE '2024-01-01' LIMIT 10", runquantity=1)
+    member = QueryItem(queryid="2", query="SELECT * FROM t WHERE d = DATE '2024-02-01' LIMIT 5", runquantity=1)
+
+    out = apply_to_member("SELECT a FROM c.s.t WHERE d = DATE '2024-01-01' LIMIT 10", rep, member)
+
+    assert out == "SELECT a FROM c.s.t WHERE d = DATE '2024-02-01' LIMIT 5"
+    assert apply_to_member("SELECT a FROM c.s.t WHERE d > 0 LIMIT 10", rep, member) is None
+
+
+def test_members_keep_their_own_comments_and_layout(monkeypatch):
+    from app.config import settings
+    from app.models import NewRequest
+    from app.services.analyzer import Analyzer
+
+    monkeypatch.setattr(settings, "trino_stats_enabled", False)
+    req = NewRequest(
+        url="jdbc:trino://trino:8080/lake?user=u",
+        ddl=[{"statement": "CREATE TABLE lake.raw.t (x int)"}],
+        queries=[
+            {"queryid": "1", "query": "SELECT x FROM raw.t WHERE x = 1 -- dashboard A", "runquantity": 1},
+            {"queryid": "2", "query": "select x\n  from raw.t\n where x = 2", "runquantity": 1},
+        ],
+    )
+    analyzer = Analyzer(req)
+
+    out = {q.queryid: q.query for q in analyzer._queries_section()}
+
+    assert len(analyzer.groups) == 1
+    schema = analyzer.new_schema
+    assert out["1"] == f"SELECT x FROM lake.{schema}.t WHERE x = 1 -- dashboard A"
+    assert out["2"] == f"select x\n  from lake.{schema}.t\n where x = 2"
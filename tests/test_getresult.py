@@ -0,0 +1,111 @@
+from pathlib import Path
+import sys
+import zlib
+
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.auth import require_token
+from app.main import app
+from app.routers import tasks
+from app.storage import codec
+from app.storage.result_stream import iter_items
+
+RESULT = {
+    "ddl": [{"statement": "CREATE SCHEMA c.s"}],
+    "migrations": [{"statement": "INSERT INTO c.s.t SELECT * FROM c.p.t"}],
+    "queries": [{"queryid": str(i), "query": f"SELECT {i}"} for i in range(5)],
+}
+
+
+class _Repo:
+    def __init__(self, status, blob, query_count=None):
+        self.status, self.blob, self.count = status, blob, query_count
+
+    def get_status(self, taskid):
+        return self.status
+
+    def get_result_blob(self, taskid):
+        return self.blob
+
+    def query_count(self, taskid):
+        return self.count
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(tasks, "repo", _Repo("DONE", codec.compress(orjson.dumps(RESULT), codec.ZLIB), 5))
+    app.dependency_overrides[require_token] = lambda: None
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_compressed_bytes_are_served_as_stored(client):
+    resp = client.get("/getresult", params={"task_id": "t"}, headers={"Accept-Encoding": "gzip, deflate"})
+    assert resp.headers["content-encoding"] == "deflate"
+    assert resp.json() == RESULT  # httpx inflates it
+
+
+def test_identity_client_gets_decompressed_json(client):
+    resp = client.get("/getresult", params={"task_id": "t"}, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in resp.headers
+    assert orjson.loads(resp.content) == RESULT
+
+
+def test_ndjson_pages_queries(client):
+    resp = client.get("/getresult", params={"task_id": "t", "format": "ndjson", "offset": 1, "limit": 2})
+    lines = [orjson.loads(line) for line in resp.content.splitlines()]
+    assert resp.headers["x-total-queries"] == "5"
+    assert [(l["section"], l.get("queryid")) for l in lines] == [
+        ("ddl", None), ("migrations", None), ("queries", "1"), ("queries", "2"),
+    ]
+
+
+def test_json_pages_queries_and_keeps_empty_sections(client, monkeypatch):
+    result = {**RESULT, "migrations": []}
+    monkeypatch.setattr(tasks, "repo", _Repo("DONE", codec.compress(orjson.dumps(result), codec.ZLIB), 5))
+
+    resp = client.get("/getresult", params={"task_id": "t", "offset": 3})
+
+    assert resp.headers["x-total-queries"] == "5"
+    assert resp.json() == {**result, "queries": result["queries"][3:]}
+
+
+def test_result_items_survive_any_chunk_boundary():
+    result = {
+        "ddl": [{"statement": 'CREATE TABLE c.s."t{[" (x int)'}],
+        "migrations": [],
+        "queries": [{"queryid": str(i), "query": f'SELECT \'}}\', "a\\"b" FROM t -- {i}'} for i in range(20)],
+    }
+    data = orjson.dumps(result)
+
+    for size in (1, 3, 16, len(data)):
+        sections = {}
+        for section, item in iter_items(data[i:i + size] for i in range(0, len(data), size)):
+            if item is None:
+                sections[section] = []
+            else:
+                sections[section].append(orjson.loads(item))
+        assert sections == result
+
+
+def test_unfinished_task_is_409(client, monkeypatch):
+    monkeypatch.setattr(tasks, "repo", _Repo("RUNNING", None))
+    assert client.get("/getresult", params={"task_id": "t"}).status_code == 409
+
+
+def test_iter_decompress_matches_one_shot():
+    data = orjson.dumps({"queries": [{"query": f"SELECT {i}"} for i in range(50_000)]})
+    blob = codec.compress(data, codec.ZLIB)
+    assert b"".join(codec.iter_decompress(blob, chunk_size=4096)) == data
+    assert zlib.decompress(blob[1:]) == data
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", True), ("deflate;q=0", False), ("*", True), ("gzip", False), ("", False),
+])
+def test_accepts_encoding(header, expected):
+    assert tasks._accepts_encoding(header, "deflate") is expected
@@ -0,0 +1,61 @@
+from pathlib import Path
+import asyncio
+import sys
+
+import httpx
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.config import settings
+from app.services import http_pool
+
+
+def _flaky_transport(failures, status=503):
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        if len(calls) <= failures:
+            return httpx.Response(status)
+        return httpx.Response(200, json={"response": "ok"})
+
+    return httpx.MockTransport(handler), calls
+
+
+def test_request_retries_gateway_errors(monkeypatch):
+    monkeypatch.setattr(settings, "llm_http_retries", 2)
+    monkeypatch.setattr(settings, "llm_http_backoff_seconds", 0)
+    transport, calls = _flaky_transport(failures=2)
+
+    with httpx.Client(transport=transport) as client:
+        response = http_pool.request_with_retries(client, "POST", "http://llm/api/generate", json={})
+
+    assert response.status_code == 200
+    assert len(calls) == 3
+
+
+def test_stream_gives_up_after_configured_retries(monkeypatch):
+    monkeypatch.setattr(settings, "llm_http_retries", 1)
+    monkeypatch.setattr(settings, "llm_http_backoff_seconds", 0)
+    transport, calls = _flaky_transport(failures=5, status=429)
+
+    with httpx.Client(transport=transport) as client:
+        with http_pool.stream_with_retries(client, "POST", "http://llm/api/generate") as response:
+            status = response.status_code
+
+    assert status == 429
+    assert len(calls) == 2
+
+
+def test_async_client_is_shared_within_a_loop(monkeypatch):
+    monkeypatch.setattr(settings, "llm_http_backoff_seconds", 0)
+    transport, calls = _flaky_transport(failures=1)
+
+    async def run():
+        assert http_pool.get_async_http_client() is http_pool.get_async_http_client()
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await http_pool.arequest_with_retries(client, "GET", "http://llm/")
+        return response.json()
+
+    assert asyncio.run(run()) == {"response": "ok"}
+    assert len(calls) == 2
@@ -0,0 +1,59 @@
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.services.trino_stats import TableStats
+from app.utils.iceberg import GB, MB, TB, recommend_table_properties
+
+
+def _stats(total_bytes, files):
+    return TableStats(table="lake.public.t", file_count=files, total_file_bytes=total_bytes)
+
+
+def test_defaults_without_stats_are_unchanged():
+    props = recommend_table_properties()
+
+    assert props["write.target-file-size-bytes"] == str(512 * MB)
+    assert props["write.parquet.compression-level"] == "7"
+    assert "write.distribution-mode" not in props
+
+
+def test_small_fragmented_table_gets_small_files_and_hash_distribution():
+    props = recommend_table_properties(_stats(200 * MB, files=400))
+
+    assert props["write.target-file-size-bytes"] == str(64 * MB)
+    assert props["write.parquet.row-group-size-bytes"] == str(64 * MB)
+    assert props["write.parquet.compression-codec"] == "snappy"
+    assert "write.parquet.compression-level" not in props
+    assert props["write.distribution-mode"] == "hash"
+
+
+def test_huge_table_gets_large_files_bounded_row_groups_and_manifest_merging():
+    props = recommend_table_properties(_stats(5 * TB, files=20_000))
+
+    assert props["write.target-file-size-bytes"] == str(1 * GB)
+    assert props["write.parquet.row-group-size-bytes"] == str(128 * MB)
+    assert props["write.parquet.compression-level"] == "9"
+    assert props["commit.manifest.min-count-to-merge"] == "10"
+    assert "write.distribution-mode" not in props
+
+
+def test_falls_back_to_show_stats_data_size():
+    props = recommend_table_properties(TableStats(table="lake.public.t", data_size_bytes=50 * GB))
+
+    assert props["write.target-file-size-bytes"] == str(256 * MB)
+
+
+def test_codec_and_level_follow_table_size():
+    profiles = [
+        (200 * MB, ("snappy", None)),
+        (50 * GB, ("zstd", "3")),
+        (500 * GB, ("zstd", "7")),
+        (5 * TB, ("zstd", "9")),
+    ]
+
+    for size, expected in profiles:
+        props = recommend_table_properties(_stats(size, files=10))
+        assert (props["write.parquet.compression-codec"], props.get("write.parquet.compression-level")) == expected
+        assert props["format-version"] == "2"
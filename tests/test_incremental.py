@@ -0,0 +1,110 @@
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.config import settings
+from app.models import NewRequest
+from app.services import incremental
+from app.services.analyzer import Analyzer
+from app.services.memo import schema_of
+
+URL = "jdbc:trino://trino:8080/lake?user=u"
+EVENTS = "CREATE TABLE lake.raw.events (event_id bigint, user_id bigint, ts timestamp(6))"
+USERS = "CREATE TABLE lake.raw.users (user_id bigint, country varchar)"
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    monkeypatch.setattr(settings, "trino_stats_enabled", False)
+    monkeypatch.setattr(settings, "llm_provider", "none")
+    monkeypatch.setattr(settings, "preagg_enabled", False)
+
+
+def _request(ddl, queries):
+    return NewRequest(
+        url=URL,
+        ddl=[{"statement": s} for s in ddl],
+        queries=[{"queryid": i, "query": q, "runquantity": 1} for i, q in queries],
+    )
+
+
+@pytest.fixture
+def sub_runs(monkeypatch):
+    runs = []
+    original = Analyzer.run
+
+    def run(self, preaggregate=True):
+        runs.append(self)
+        return original(self, preaggregate)
+
+    monkeypatch.setattr(Analyzer, "run", run)
+    return runs
+
+
+def test_unchanged_workload_reuses_base_without_planning(sub_runs):
+    req = _request([EVENTS, USERS], [("1", "SELECT event_id FROM raw.events"), ("2", "SELECT country FROM raw.users")])
+    base, manifest = incremental.analyze(req)
+    sub_runs.clear()
+
+    result, _ = incremental.analyze(req, base, manifest)
+
+    assert sub_runs == []
+    new_schema = schema_of(result)
+    assert new_schema != schema_of(base)
+    assert result["ddl"][1:] == [
+        {"statement": s["statement"].replace(schema_of(base), new_schema)} for s in base["ddl"][1:]
+    ]
+    assert [q["query"] for q in result["queries"]] == [
+        q["query"].replace(schema_of(base), new_schema) for q in base["queries"]
+    ]
+
+
+def test_only_the_delta_is_planned(sub_runs):
+    base_req = _request([EVENTS, USERS], [("1", "SELECT event_id FROM raw.events"), ("2", "SELECT country FROM raw.users")])
+    base, manifest = incremental.analyze(base_req)
+    sub_runs.clear()
+    users_v2 = USERS.replace("country varchar", "country varchar, segment varchar")
+    req = _request(
+        [EVENTS, users_v2],
+        [("1", "SELECT event_id FROM raw.events"), ("2", "SELECT country FROM raw.users"), ("3", "SELECT event_id FROM raw.events")],
+    )
+
+    result, new_manifest = incremental.analyze(req, base, manifest)
+
+    (sub,) = sub_runs
+    assert [t.table for t in sub.tables] == ["users"]  # the only changed table is planned
+    assert [t.table for t in sub.context_tables] == ["events"]  # read by query 3, rewrite context only
+    assert sorted(q.queryid for q in sub.req.queries) == ["2", "3"]
+    new_schema = schema_of(result)
+    assert any("segment" in s["statement"] for s in result["ddl"])
+    assert [q["queryid"] for q in result["queries"]] == ["1", "2", "3"]
+    assert all(f"lake.{new_schema}." in q["query"] for q in result["queries"])
+    assert len(result["migrations"]) == 2
+    assert new_manifest["schema"] == new_schema and set(new_manifest["queries"]) == {"1", "2", "3"}
+
+
+def test_other_cluster_falls_back_to_full_run(sub_runs):
+    req = _request([EVENTS], [("1", "SELECT event_id FROM raw.events")])
+    base, manifest = incremental.analyze(req)
+    other = req.model_copy(update={"url": "jdbc:trino://elsewhere:8080/lake?user=u"})
+    sub_runs.clear()
+
+    incremental.analyze(other, base, manifest)
+
+    (full,) = sub_runs
+    assert len(full.req.queries) == 1 and full.new_schema != manifest["schema"]
+
+
+def test_removed_table_is_neither_created_nor_migrated():
+    base_req = _request([EVENTS, USERS], [("1", "SELECT event_id FROM raw.events"), ("2", "SELECT country FROM raw.users")])
+    base, manifest = incremental.analyze(base_req)
+    req = _request([EVENTS], [("1", "SELECT event_id FROM raw.events")])
+
+    result, _ = incremental.analyze(req, base, manifest)
+
+    statements = [s["statement"] for s in result["ddl"] + result["migrations"]]
+    assert not any(".users" in s for s in statements)
+    assert sum(".events" in s for s in statements) == 2
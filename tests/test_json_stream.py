@@ -0,0 +1,51 @@
+from pathlib import Path
+import json
+import sys
+
+import httpx
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.services.json_stream import ABORT, COMPLETE, CONTINUE, JSONStreamGuard
+from app.services.llm import LLM
+
+
+def _feed(guard, chunks):
+    for chunk in chunks:
+        state = guard.feed(chunk)
+        if state != CONTINUE:
+            return state
+    return guard.state
+
+
+def test_guard_stops_when_top_level_object_closes():
+    guard = JSONStreamGuard(prefix_limit=100)
+
+    state = _feed(guard, ['<think>plan {x}</th', 'ink>Sure: {"ddl": ["a}"', ', {"b": [1]}]}', " trailing chatter"])
+
+    assert state == COMPLETE
+    assert guard.snippet == '{"ddl": ["a}", {"b": [1]}]}'
+    assert guard.text.endswith("]}")
+
+
+def test_guard_skips_braces_in_prose_and_aborts_without_json():
+    guard = JSONStreamGuard(prefix_limit=20)
+
+    assert _feed(guard, ["I think {the plan} is ", "fine and we should just go ahead"]) == ABORT
+
+
+def test_guard_aborts_on_mismatched_brackets():
+    guard = JSONStreamGuard(prefix_limit=100)
+
+    assert _feed(guard, ['{"ddl": [1, 2}']) == ABORT
+
+
+def test_ollama_stream_stops_reading_after_object(monkeypatch):
+    lines = [{"response": '{"queries": '}, {"response": "[]}"}, {"response": " and more"}, {"done": True}]
+    body = "\n".join(json.dumps(line) for line in lines)
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, text=body))
+
+    with httpx.Client(transport=transport) as client:
+        out = LLM()._ollama_stream(client, "http://ollama/api/generate", {}, "prompt")
+
+    assert out == '{"queries": []}'
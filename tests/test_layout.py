@@ -0,0 +1,107 @@
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.config import settings
+from app.models import NewRequest, QueryItem
+from app.services.analyzer import Analyzer
+from app.services.layout import recommend_layout
+from app.services.trino_stats import TableStats
+from app.utils.fingerprint import group_queries
+from app.utils.iceberg import GB
+from app.utils.predicates import EQ, GROUP, JOIN, RANGE, column_usage
+from app.utils.sql_rewriter import Rewriter
+
+COLUMNS = {
+    "lake.new.events": {"event_id": "bigint", "user_id": "bigint", "ts": "timestamp(6)", "sku": "varchar"},
+    "lake.new.users": {"user_id": "bigint", "country": "varchar"},
+}
+
+
+def _usage(queries):
+    matcher = Rewriter.compile({"events": "lake.new.events", "users": "lake.new.users"})
+    items = [QueryItem(queryid=f"q{i}", query=q, runquantity=n) for i, (q, n) in enumerate(queries)]
+    return column_usage(group_queries(items), matcher, COLUMNS)
+
+
+def test_usage_resolves_aliases_and_bare_columns_weighted_by_runs():
+    usage = _usage([
+        ("SELECT u.country, count(*) FROM events e JOIN users AS u ON e.user_id = u.user_id "
+         "WHERE e.ts >= TIMESTAMP '2024-01-01' AND country IN ('DE') GROUP BY u.country", 10),
+        ("SELECT * FROM events WHERE sku = 'x' AND ts < current_date", 3),
+    ])
+
+    events, users = usage["lake.new.events"], usage["lake.new.users"]
+    assert events["ts"][RANGE] == 13
+    assert events["sku"][EQ] == 3
+    assert events["user_id"][JOIN] == 10 and users["user_id"][JOIN] == 10
+    assert users["country"][EQ] == 10 and users["country"][GROUP] == 10
+
+
+def test_layout_partitions_by_day_and_bucket_and_sorts_by_the_rest():
+    usage = _usage([
+        ("SELECT * FROM events WHERE ts > TIMESTAMP '2024-01-01' AND user_id = 5", 100),
+        ("SELECT sku, count(*) FROM events WHERE sku = 'a' GROUP BY sku", 10),
+    ])
+
+    layout = recommend_layout(COLUMNS["lake.new.events"], usage["lake.new.events"])
+
+    assert layout.partitioning == ["day(ts)", "bucket(user_id, 16)"]
+    assert layout.sorted_by == ["sku"]
+    assert layout.properties()[0] == "partitioning = ARRAY['day(ts)', 'bucket(user_id, 16)']"
+
+
+def test_low_cardinality_columns_use_identity_and_small_tables_stay_unpartitioned():
+    usage = _usage([("SELECT * FROM users WHERE country = 'DE'", 5)])["lake.new.users"]
+    big = TableStats(table="lake.public.users", total_file_bytes=50 * GB, ndv={"country": 30})
+    small = TableStats(table="lake.public.users", total_file_bytes=10_000)
+
+    assert recommend_layout(COLUMNS["lake.new.users"], usage, big).partitioning == ["country"]
+    layout = recommend_layout(COLUMNS["lake.new.users"], usage, small)
+    assert layout.partitioning == [] and layout.sorted_by == ["country"]
+
+
+def test_layout_is_added_to_an_existing_with_clause(monkeypatch):
+    monkeypatch.setattr(settings, "trino_stats_enabled", False)
+    monkeypatch.setattr(settings, "llm_provider", "none")
+    req = NewRequest(
+        url="jdbc:trino://localhost:8080/lake?user=u",
+        ddl=[{"statement": "CREATE TABLE lake.public.clicks (ts timestamp, bandwidth int) WITH (format = 'ORC')"}],
+        queries=[{"queryid": "q1", "query": "SELECT * FROM clicks WHERE ts > current_date", "runquantity": 1}],
+    )
+    analyzer = Analyzer(req)
+
+    ddl = analyzer.run()["ddl"][1]["statement"]
+
+    assert ddl == (
+        f"CREATE TABLE lake.{analyzer.new_schema}.clicks (ts timestamp, bandwidth int)\n"
+        "WITH (\n"
+        "  partitioning = ARRAY['day(ts)'],\n"
+        "  format = 'ORC'\n"
+        ")"
+    )
+
+
+def test_clause_is_restored_after_a_subquery():
+    usage = _usage([
+        ("SELECT count(*) FROM events e WHERE e.user_id IN (SELECT u.user_id FROM users u GROUP BY u.user_id) "
+         "AND sku = 'x'", 4),
+    ])
+
+    events, users = usage["lake.new.events"], usage["lake.new.users"]
+    assert events["sku"][EQ] == 4 and GROUP not in events["sku"]
+    assert events["user_id"][EQ] == 4
+    assert users["user_id"][GROUP] == 4 and EQ not in users["user_id"]
+
+
+def test_reversed_predicates_are_normalized():
+    usage = _usage([
+        ("SELECT count(*) FROM events WHERE 5 < event_id AND TIMESTAMP '2024-01-01' <= ts "
+         "AND 'x' = sku AND 3 <> user_id", 2),
+    ])
+
+    events = usage["lake.new.events"]
+    assert events["event_id"][RANGE] == 2 and events["ts"][RANGE] == 2
+    assert events["sku"][EQ] == 2
+    assert "user_id" not in events
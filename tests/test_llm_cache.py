@@ -0,0 +1,99 @@
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.services import llm as llm_module
+from app.services.llm import LLM
+from app.services.llm_cache import LLMCache
+
+
+def test_key_depends_on_provider_model_params_and_prompt():
+    base = LLMCache.key("ollama", "qwen3:14b", {"t": 0.2}, "prompt")
+
+    assert base == LLMCache.key("ollama", "qwen3:14b", {"t": 0.2}, "prompt")
+    assert base != LLMCache.key("openai", "qwen3:14b", {"t": 0.2}, "prompt")
+    assert base != LLMCache.key("ollama", "qwen3:14b", {"t": 0.3}, "prompt")
+    assert base != LLMCache.key("ollama", "qwen3:14b", {"t": 0.2}, "prompt!")
+
+
+def test_local_tier_is_bounded_lru():
+    cache = LLMCache(use_redis=False, local_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.stats()["local_hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_suggest_reuses_response_across_schema_names(monkeypatch):
+    monkeypatch.setattr(llm_module, "llm_cache", LLMCache(use_redis=False))
+    calls = []
+
+    def generate(self, prompt):
+        calls.append(prompt)
+        return '{"ddl": ["CREATE SCHEMA lake.opt_1111"]}'
+
+    monkeypatch.setattr(LLM, "_generate", generate)
+    llm = LLM()
+
+    first = llm.suggest("use opt_1111", aliases={"{{new_schema}}": "opt_1111"})
+    second = llm.suggest("use opt_2222", aliases={"{{new_schema}}": "opt_2222"})
+
+    assert len(calls) == 1
+    assert first == '{"ddl": ["CREATE SCHEMA lake.opt_1111"]}'
+    assert second == '{"ddl": ["CREATE SCHEMA lake.opt_2222"]}'
+
+
+class _ScriptedRedis:
+    """Runs the lookup script against dicts and counts round-trips."""
+
+    def __init__(self):
+        self.values, self.counters, self.round_trips, self.registered = {}, {}, 0, 0
+
+    def register_script(self, script):
+        self.registered += 1
+
+        def run(keys, args):
+            self.round_trips += 1
+            value = self.values.get(keys[0])
+            self.hincrby(keys[1], "redis_hits" if value is not None else "misses", 1)
+            if args[0] > 0:
+                self.hincrby(keys[1], "local_hits", args[0])
+            return value
+        return run
+
+    def hincrby(self, key, field, amount):
+        self.counters[field] = self.counters.get(field, 0) + amount
+
+
+def test_redis_lookup_and_shared_count_take_one_round_trip():
+    client = _ScriptedRedis()
+    client.values["llm:cache:hit"] = "cached"
+    cache = LLMCache(redis_client=client, local_entries=0)
+
+    assert cache.get("hit") == "cached"
+    assert cache.get("miss") is None
+
+    assert client.round_trips == 2 and client.registered == 1
+    assert client.counters == {"redis_hits": 1, "misses": 1}
+    assert (cache.redis_hits, cache.misses) == (1, 1)
+
+
+def test_local_hits_are_counted_with_the_next_lookup_without_a_round_trip():
+    client = _ScriptedRedis()
+    client.values["llm:cache:hit"] = "cached"
+    cache = LLMCache(redis_client=client)
+    assert cache.get("hit") == "cached"
+
+    for _ in range(3):
+        assert cache.get("hit") == "cached"
+    assert client.round_trips == 1 and "local_hits" not in client.counters
+
+    assert cache.get("miss") is None
+    assert client.round_trips == 2
+    assert client.counters == {"redis_hits": 1, "misses": 1, "local_hits": 3}
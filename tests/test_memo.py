@@ -0,0 +1,111 @@
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.models import NewRequest
+from app.services.memo import remap_schema, request_fingerprint, strip_credentials
+
+
+def _request(url, ddl, queries):
+    return NewRequest(
+        url=url,
+        ddl=[{"statement": s} for s in ddl],
+        queries=[{"queryid": i, "query": q, "runquantity": n} for i, q, n in queries],
+    )
+
+
+def test_strip_credentials_removes_user_and_password():
+    assert strip_credentials("jdbc://u:p@trino:8080/lake?password=x&user=u&ssl=true") == "jdbc://trino:8080/lake?ssl=true"
+
+
+def test_fingerprint_ignores_order_and_credentials():
+    a = _request(
+        "jdbc://trino:8080/lake?user=alice&password=1",
+        ["CREATE TABLE lake.s.a (x int)", "CREATE TABLE lake.s.b (y int)"],
+        [("1", "SELECT 1", 5), ("2", "SELECT 2", 1)],
+    )
+    b = _request(
+        "jdbc://trino:8080/lake?user=bob&password=2",
+        ["CREATE TABLE lake.s.b (y int)", "CREATE TABLE lake.s.a (x int)"],
+        [("2", "SELECT 2", 1), ("1", "SELECT 1", 5)],
+    )
+    c = _request("jdbc://trino:8080/lake?user=bob", ["CREATE TABLE lake.s.a (x int)"], [("1", "SELECT 1", 6)])
+
+    assert request_fingerprint(a) == request_fingerprint(b)
+    assert request_fingerprint(a) != request_fingerprint(c)
+
+
+def test_remap_schema_renames_every_section():
+    result = {
+        "ddl": [{"statement": "CREATE SCHEMA lake.opt_aaaa"}, {"statement": "CREATE TABLE lake.opt_aaaa.t (x int)"}],
+        "migrations": [{"statement": "INSERT INTO lake.opt_aaaa.t SELECT * FROM lake.s.t"}],
+        "queries": [{"queryid": "1", "query": "SELECT x FROM lake.opt_aaaa.t"}],
+    }
+
+    out = remap_schema(result, "opt_bbbb")
+
+    assert out["ddl"][0]["statement"] == "CREATE SCHEMA lake.opt_bbbb"
+    assert out["migrations"][0]["statement"].startswith("INSERT INTO lake.opt_bbbb.t")
+    assert out["queries"][0] == {"queryid": "1", "query": "SELECT x FROM lake.opt_bbbb.t"}
+
+
+class _Repo:
+    """Memo held by ``holder`` whose task record is already gone."""
+
+    def __init__(self, holder):
+        self.holder = holder
+        self.calls = []
+
+    def claim_memo(self, fingerprint, taskid, ttl):
+        return self.holder
+
+    def get_status(self, taskid):
+        return None
+
+    def save(self, rec):
+        self.calls.append(("save", rec.taskid, rec.status))
+
+    def set_memo(self, fingerprint, taskid, ttl):
+        self.calls.append(("set_memo", taskid))
+
+    def finish(self, taskid, status, **kwargs):
+        self.calls.append(("finish", taskid, status))
+
+
+def test_stale_memo_is_taken_over_with_the_record_saved_first(monkeypatch):
+    from app.routers import tasks
+
+    repo = _Repo("expired-task")
+    queued = []
+    monkeypatch.setattr(tasks, "repo", repo)
+    monkeypatch.setattr(tasks.run_analysis, "apply_async", lambda args, task_id: queued.append(task_id))
+
+    resp = tasks._submit("new-task", "fp", None)
+
+    assert resp.taskid == "new-task" and queued == ["new-task"]
+    assert repo.calls == [("save", "new-task", "RUNNING"), ("set_memo", "new-task")]
+
+
+def test_new_task_fingerprints_the_payload_off_the_event_loop(monkeypatch):
+    import asyncio
+    import threading
+
+    from app.routers import tasks
+
+    threads = []
+
+    def fingerprint(payload):
+        threads.append(threading.current_thread())
+        return "fp"
+
+    repo = _Repo(None)
+    monkeypatch.setattr(tasks, "repo", repo)
+    monkeypatch.setattr(tasks, "request_fingerprint", fingerprint)
+    monkeypatch.setattr(tasks.workloads, "save", lambda taskid, payload: None)
+    monkeypatch.setattr(tasks.run_analysis, "apply_async", lambda args, task_id: None)
+    payload = _request("jdbc:trino://h:8080/lake", [], [("q1", "SELECT 1", 1)])
+
+    asyncio.run(tasks.new_task(payload, _=None))
+
+    assert threads and threads[0] is not threading.main_thread()
@@ -0,0 +1,90 @@
+from pathlib import Path
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+pytest.importorskip("prometheus_client")
+
+from app.config import settings
+from app.main import app
+from app.models import NewRequest
+from app.services import metrics
+from app.services.analyzer import Analyzer
+from app.services.trino_client import TrinoClient
+
+
+def _count(name, **labels):
+    from prometheus_client import REGISTRY
+    return REGISTRY.get_sample_value(f"{name}_count", labels) or 0
+
+
+def test_analyzer_stages_are_observed(monkeypatch):
+    monkeypatch.setattr(settings, "trino_stats_enabled", False)
+    monkeypatch.setattr(settings, "llm_provider", "none")
+    before = {s: _count("dlopt_analyzer_stage_seconds", stage=s) for s in ("ddl_parse", "rewrite", "llm_call")}
+    req = NewRequest(
+        url="jdbc:trino://trino:8080/lake?user=u",
+        ddl=[{"statement": "CREATE TABLE lake.raw.t (x int)"}],
+        queries=[{"queryid": "1", "query": "SELECT x FROM raw.t", "runquantity": 1}],
+    )
+
+    Analyzer(req).run()
+
+    for name, count in before.items():
+        assert _count("dlopt_analyzer_stage_seconds", stage=name) == count + 1
+
+
+def test_failed_trino_query_is_observed_as_error(monkeypatch):
+    client = TrinoClient("jdbc:trino://trino:8080/lake?user=u")
+    monkeypatch.setattr("app.services.trino_client.get_pool", lambda params, connect: (_ for _ in ()).throw(OSError()))
+    before = _count("dlopt_trino_query_seconds", outcome="error")
+
+    with pytest.raises(OSError):
+        client.query("SELECT 1")
+
+    assert _count("dlopt_trino_query_seconds", outcome="error") == before + 1
+
+
+def test_metrics_endpoint_exports_histograms():
+    with metrics.timed(metrics.REDIS_OP, op="test"):
+        pass
+
+    resp = TestClient(app).get("/metrics")
+
+    assert resp.status_code == 200
+    assert 'dlopt_redis_op_seconds_bucket{le="0.0005",op="test"}' in resp.text
+    assert "dlopt_analyzer_stage_seconds" in resp.text
+
+
+def test_qwen_batches_are_exported():
+    from app.services.qwen_batcher import QwenBatcher
+
+    batcher = QwenBatcher(lambda prompts: [(p, 4) for p in prompts], max_batch_size=1, window_ms=0)
+    before = _count("dlopt_qwen_batch_seconds", size="1")
+
+    assert batcher.generate("p", timeout=5) == "p"
+
+    from prometheus_client import REGISTRY
+    assert _count("dlopt_qwen_batch_seconds", size="1") == before + 1
+    assert REGISTRY.get_sample_value("dlopt_qwen_generated_tokens_total", {"size": "1"}) >= 4
+
+
+def test_prompt_reports_are_emitted(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "trino_stats_enabled", False)
+    monkeypatch.setattr(settings, "llm_provider", "none")
+    before = _count("dlopt_prompt_tokens", plan="single")
+    req = NewRequest(
+        url="jdbc:trino://trino:8080/lake?user=u",
+        ddl=[{"statement": "CREATE TABLE lake.raw.t (x int)"}],
+        queries=[{"queryid": "1", "query": "SELECT x FROM raw.t", "runquantity": 1}],
+    )
+
+    with caplog.at_level("INFO", logger=metrics.__name__):
+        analyzer = Analyzer(req)
+        analyzer.run()
+
+    assert _count("dlopt_prompt_tokens", plan="single") == before + 1
+    assert f"single prompt: {analyzer.prompt_report.tokens_used}/" in caplog.text
@@ -0,0 +1,52 @@
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.models import DDLItem
+from app.utils.ddl_parser import DDLTools
+from app.utils.parse_cache import ParseCache, parse_cache
+
+
+def test_get_or_parse_counts_hits_and_misses():
+    cache = ParseCache(max_bytes=10_000)
+    calls = []
+
+    def parse(text):
+        calls.append(text)
+        return text.upper()
+
+    assert cache.get_or_parse("ns", "select 1", parse) == "SELECT 1"
+    assert cache.get_or_parse("ns", "select 1", parse) == "SELECT 1"
+    assert cache.get_or_parse("other", "select 1", parse) == "SELECT 1"
+
+    assert calls == ["select 1", "select 1"]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_least_recently_used_entries_are_evicted_past_memory_bound():
+    cache = ParseCache(max_bytes=300)
+    size = lambda text, value: 100
+
+    for text in ("a", "b", "c"):
+        cache.get_or_parse("ns", text, str, size)
+    cache.get_or_parse("ns", "a", str, size)  # refresh "a"
+    cache.get_or_parse("ns", "d", str, size)
+
+    stats = cache.stats()
+    assert stats["entries"] == 3
+    assert stats["evictions"] == 1
+    cache.get_or_parse("ns", "b", str, size)
+    assert cache.stats()["misses"] == 5
+
+
+def test_ddl_parsing_is_shared_between_helpers():
+    ddl = [DDLItem(statement="CREATE TABLE lake.sales.orders_cache_test (id bigint)")]
+    before = parse_cache.stats()["hits"]
+
+    tables = DDLTools.parse_tables(ddl)
+    assert DDLTools.catalog_of_first(ddl) == "lake"
+
+    assert tables[0].table == "orders_cache_test"
+    assert parse_cache.stats()["hits"] == before + 1
@@ -0,0 +1,101 @@
+from pathlib import Path
+import asyncio
+import json
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.config import settings
+from app.models import NewRequest
+from app.services.analyzer import Analyzer
+from app.services.planner import slice_workload
+from app.utils.fingerprint import group_queries
+
+
+def _request():
+    return NewRequest(
+        url="jdbc:trino://localhost:8080?catalog=lake&user=u",
+        ddl=[
+            {"statement": "CREATE TABLE lake.public.events (user_id bigint, ts timestamp)"},
+            {"statement": "CREATE TABLE lake.public.users (user_id bigint, country varchar)"},
+            {"statement": "CREATE TABLE lake.public.items (sku varchar, price double)"},
+        ],
+        queries=[
+            {"queryid": "q1", "query": "SELECT * FROM events e JOIN users u ON e.user_id = u.user_id", "runquantity": 5},
+            {"queryid": "q2", "query": "SELECT sku FROM items WHERE price > 10", "runquantity": 50},
+        ],
+    )
+
+
+class _SlowLLM:
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self.prompts = []
+        self.all_arrived = asyncio.Event()
+        self.overlapped = False
+
+    async def asuggest(self, prompt, aliases=None):
+        self.prompts.append(prompt)
+        # Neither call returns before both have started: only concurrent calls get past this.
+        if len(self.prompts) == 2:
+            self.all_arrived.set()
+        await asyncio.wait_for(self.all_arrived.wait(), timeout=5)
+        self.overlapped = True
+        if "q2" in prompt:
+            return "not json at all"
+        target = f"{self.analyzer.catalog}.{self.analyzer.new_schema}"
+        return json.dumps({
+            "ddl": [
+                {"statement": f"CREATE TABLE {target}.events (user_id bigint, ts timestamp) WITH (partitioning = ARRAY['day(ts)'])"},
+                {"statement": f"CREATE TABLE {target}.users (user_id bigint, country varchar)"},
+            ],
+            "migrations": [{"statement": f"INSERT INTO {target}.events SELECT * FROM lake.public.events"}],
+            "queries": [{"queryid": "q1", "query": f"SELECT * FROM {target}.events e JOIN {target}.users u ON e.user_id = u.user_id"}],
+        })
+
+    async def aclose(self):
+        pass
+
+
+def test_slices_follow_tables_joined_together():
+    analyzer = Analyzer(_request())
+    target_of = {f"lake.{analyzer.new_schema}.{t.table}": i for i, t in enumerate(analyzer.tables)}
+
+    slices = slice_workload(analyzer.tables, group_queries(analyzer.req.queries), analyzer.table_matcher, target_of, 8)
+
+    assert sorted(sorted(t.table for t in s.tables) for s in slices) == [["events", "users"], ["items"]]
+    assert slice_workload(analyzer.tables, analyzer.groups, analyzer.table_matcher, target_of, 1)[0].weight > 0
+
+
+def test_bad_fragment_only_degrades_its_slice(monkeypatch):
+    monkeypatch.setattr(settings, "llm_planner_mode", "batched")
+    monkeypatch.setattr(settings, "trino_stats_enabled", False)
+    analyzer = Analyzer(_request())
+    analyzer.llm = _SlowLLM(analyzer)
+
+    result = analyzer.run()
+
+    assert len(analyzer.llm.prompts) == 2
+    assert analyzer.llm.overlapped
+    ddl = [s["statement"] for s in result["ddl"]]
+    assert ddl[0] == f"CREATE SCHEMA lake.{analyzer.new_schema}"
+    assert any("day(ts)" in s for s in ddl)
+    assert any(f"{analyzer.new_schema}.items" in s for s in ddl)
+    migrations = [s["statement"] for s in result["migrations"]]
+    assert any("lake.public.items" in s for s in migrations)
+    assert [q["queryid"] for q in result["queries"]] == ["q1", "q2"]
+
+
+def test_slice_fallback_is_matched_by_target_not_position(monkeypatch):
+    monkeypatch.setattr(settings, "llm_planner_mode", "batched")
+    monkeypatch.setattr(settings, "trino_stats_enabled", False)
+    analyzer = Analyzer(_request())
+    analyzer.llm = _SlowLLM(analyzer)
+    build_ddl = analyzer._ddl_from_existing_tables
+    # Same statements, tables in a different order than analyzer.tables.
+    monkeypatch.setattr(analyzer, "_ddl_from_existing_tables", lambda: build_ddl()[:1] + build_ddl()[:0:-1])
+
+    result = analyzer.run()
+
+    items = [s["statement"] for s in result["ddl"] if s["statement"].startswith(f"CREATE TABLE lake.{analyzer.new_schema}.items")]
+    assert len(items) == 1 and "sku" in items[0]
@@ -0,0 +1,51 @@
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.models import QueryItem
+from app.services.preagg import recommend_preaggregations
+from app.utils.fingerprint import group_queries
+from app.utils.sql_rewriter import Rewriter
+
+MATCHER = Rewriter.compile({"events": "lake.new.events", "users": "lake.new.users"})
+COLUMNS = {
+    "lake.new.events": ["event_id", "user_id", "ts", "sku", "price"],
+    "lake.new.users": ["user_id", "country", "segment"],
+}
+JOIN = "FROM events e JOIN users u ON e.user_id = u.user_id"
+
+
+def _recommend(queries, min_runs=100):
+    items = [QueryItem(queryid=f"q{i}", query=q, runquantity=n) for i, (q, n) in enumerate(queries)]
+    return recommend_preaggregations(group_queries(items), MATCHER, COLUMNS, "lake.new", min_runs, 5)
+
+
+def test_family_sharing_join_and_keys_reads_one_preaggregated_table():
+    recs = _recommend([
+        (f"SELECT u.country, sum(e.price) AS revenue, avg(e.price) {JOIN} WHERE u.segment = 'vip' GROUP BY u.country", 60),
+        (f"SELECT u.country, sum(e.price) AS revenue, avg(e.price) {JOIN} WHERE u.segment = 'new' GROUP BY u.country", 30),
+        (f"SELECT u.country, count(*) {JOIN} GROUP BY 1 HAVING count(*) > 5", 20),
+    ])
+
+    assert len(recs) == 1
+    rec = recs[0]
+    assert rec.table == "lake.new.agg_events_1" and rec.runquantity == 110
+    assert rec.ddl.startswith("CREATE TABLE lake.new.agg_events_1 AS\nSELECT")
+    assert rec.ddl.endswith("WITH NO DATA")
+    assert "GROUP BY u.country, u.segment" in rec.migration
+    assert "count(*) AS count_all" in rec.migration
+    assert rec.queries["q0"] == (
+        "SELECT country, sum(sum_price) AS revenue, CAST(sum(sum_price) AS DOUBLE) / sum(count_price)\n"
+        "FROM lake.new.agg_events_1\nWHERE segment = 'vip'\nGROUP BY country"
+    )
+    assert rec.queries["q2"].endswith("GROUP BY 1\nHAVING sum(count_all) > 5")
+
+
+def test_unsupported_shapes_and_cold_families_are_skipped():
+    assert _recommend([
+        ("SELECT sku, count(*) FROM events WHERE ts > current_date GROUP BY sku", 500),
+        ("SELECT sku, count(DISTINCT user_id) FROM events GROUP BY sku", 500),
+        ("SELECT sku, price, count(*) FROM events GROUP BY sku", 500),
+        ("SELECT user_id, max(price) FROM events GROUP BY user_id", 5),
+    ]) == []
@@ -0,0 +1,45 @@
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.models import QueryItem
+from app.services.prompt import PromptBuilder
+from app.utils.fingerprint import group_queries
+from app.utils.sql_rewriter import Rewriter
+
+
+def _groups(count):
+    queries = [
+        QueryItem(
+            queryid=f"q{i}",
+            query=f"SELECT col_{i}, count(*) FROM events JOIN users ON events.uid = users.id GROUP BY col_{i}",
+            runquantity=i,
+        )
+        for i in range(count)
+    ]
+    return group_queries(queries)
+
+
+def test_prompt_ranks_by_weighted_cost_and_summarizes_tail():
+    matcher = Rewriter.compile({"events": "lake.opt.events", "users": "lake.opt.users"})
+    builder = PromptBuilder("lake", "opt", matcher, token_budget=1000)
+
+    prompt, report = builder.build([], _groups(200))
+
+    assert report.within_budget
+    assert report.queries_included + report.queries_summarized == 200
+    assert report.queries_summarized > 0
+    assert "- q199 (runs 199)" in prompt
+    assert "- q0 (runs 0)" not in prompt
+    assert "further query shapes" in prompt and "events (" in prompt
+
+
+def test_prompt_without_pressure_includes_everything():
+    builder = PromptBuilder("lake", "opt", Rewriter.compile({}), token_budget=10_000)
+
+    prompt, report = builder.build([], _groups(3))
+
+    assert report.queries_summarized == 0
+    assert prompt.startswith("You are an expert")
+    assert "\n- q2 (runs 2)" in prompt
@@ -0,0 +1,73 @@
+from pathlib import Path
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.services.qwen_batcher import QwenBatcher
+
+
+def test_concurrent_prompts_share_one_batch_and_get_their_own_output():
+    batches = []
+
+    def generate(prompts):
+        batches.append(list(prompts))
+        return [(p.upper(), len(p)) for p in prompts]
+
+    batcher = QwenBatcher(generate, max_batch_size=4, window_ms=100)
+    results = {}
+    threads = [
+        threading.Thread(target=lambda p=p: results.__setitem__(p, batcher.generate(p, timeout=5)))
+        for p in ("a", "bb", "ccc")
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {"a": "A", "bb": "BB", "ccc": "CCC"}
+    assert len(batches) == 1 and sorted(batches[0]) == ["a", "bb", "ccc"]
+    assert batcher.stats()[3]["tokens"] == 6
+
+
+def test_batch_size_is_capped_and_errors_reach_every_caller():
+    def generate(prompts):
+        time.sleep(0.01)
+        if "boom" in prompts:
+            raise RuntimeError("oom")
+        return [(p, 1) for p in prompts]
+
+    batcher = QwenBatcher(generate, max_batch_size=2, window_ms=50)
+    futures = [batcher.submit(p) for p in ("x", "y", "z")]
+    assert [f.result(timeout=5) for f in futures] == ["x", "y", "z"]
+    assert sorted(batcher.stats()) == [1, 2]
+
+    failing = [batcher.submit("boom"), batcher.submit("ok")]
+    for future in failing:
+        assert isinstance(future.exception(timeout=5), RuntimeError)
+
+
+def test_generate_batch_restores_the_tokenizer_padding_side():
+    torch = pytest.importorskip("torch")
+    from app.services.qwen_batcher import generate_batch
+
+    class Tokenizer:
+        padding_side = "right"
+
+        def __call__(self, prompts, return_tensors, padding):
+            assert self.padding_side == "left"
+            return {"input_ids": torch.zeros((len(prompts), 2), dtype=torch.long)}
+
+        def decode(self, row, skip_special_tokens):
+            return "out"
+
+    class Model:
+        def generate(self, input_ids):
+            return torch.ones((input_ids.shape[0], 3), dtype=torch.long)
+
+    tokenizer = Tokenizer()
+    assert generate_batch(tokenizer, Model(), "cpu", {}, ["a", "b"]) == [("out", 1), ("out", 1)]
+    assert tokenizer.padding_side == "right"
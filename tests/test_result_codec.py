@@ -0,0 +1,55 @@
+from pathlib import Path
+import sys
+
+import orjson
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.storage import codec
+
+
+def _result(n=2000):
+    return orjson.dumps({
+        "ddl": [{"statement": "CREATE TABLE t (id bigint)"}],
+        "queries": [{"queryid": str(i), "query": f"SELECT * FROM t WHERE id = {i}"} for i in range(n)],
+    })
+
+
+@pytest.mark.parametrize("name", ["zlib", "none"])
+def test_round_trip(name):
+    data = _result()
+    blob = codec.compress(data, codec.default_codec(name))
+    assert codec.decompress(blob) == data
+
+
+def test_compressed_result_is_much_smaller():
+    data = _result()
+    blob = codec.compress(data, codec.ZLIB)
+    assert blob[:1] == codec.ZLIB
+    assert len(blob) * 5 < len(data)
+
+
+def test_auto_falls_back_to_zlib_without_zstandard(monkeypatch):
+    monkeypatch.setattr(codec, "zstandard", None)
+    assert codec.default_codec("auto") == codec.ZLIB
+    assert codec.default_codec("zstd") == codec.ZLIB
+
+
+def test_unknown_codec_name_is_rejected():
+    with pytest.raises(ValueError, match="lz4"):
+        codec.default_codec("lz4")
+
+
+def test_zstd_round_trip():
+    pytest.importorskip("zstandard")
+    data = _result()
+    blob = codec.compress(data, codec.default_codec("zstd"))
+    assert blob[:1] == codec.ZSTD
+    assert codec.decompress(blob) == data
+    assert b"".join(codec.iter_decompress(blob, chunk_size=4096)) == data
+
+
+def test_unknown_marker_is_rejected():
+    with pytest.raises(ValueError):
+        codec.decompress(b"?payload")
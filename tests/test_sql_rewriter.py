@@ -0,0 +1,136 @@
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import billiard
+
+from app.models import QueryItem
+from app.utils import sql_rewriter
+from app.utils.sql_rewriter import Rewriter
+
+
+MAPPING = {
+    "lake.public.events": "lake.opt_1.events",
+    '"lake"."public"."events"': "lake.opt_1.events",
+    "public.events": "lake.opt_1.events",
+    '"public"."events"': "lake.opt_1.events",
+    "events": "lake.opt_1.events",
+    '"events"': "lake.opt_1.events",
+}
+
+
+def test_replace_tables_prefers_longest_variant():
+    matcher = Rewriter.compile(MAPPING)
+
+    out = Rewriter.replace_tables("SELECT id FROM lake.public.events JOIN public.events USING (id)", matcher)
+
+    assert out == "SELECT id FROM lake.opt_1.events JOIN lake.opt_1.events USING (id)"
+
+
+def test_replace_tables_is_case_insensitive_and_respects_word_boundaries():
+    out = Rewriter.replace_tables('SELECT * FROM "EVENTS", events_archive, Events', MAPPING)
+
+    assert out == "SELECT * FROM lake.opt_1.events, events_archive, lake.opt_1.events"
+
+
+def test_rewrite_keeps_order_and_ids():
+    queries = [
+        QueryItem(queryid="b", query="SELECT * FROM events", runquantity=1),
+        QueryItem(queryid="a", query="SELECT 1", runquantity=2),
+    ]
+
+    out = Rewriter.rewrite(queries, Rewriter.compile(MAPPING))
+
+    assert [q.queryid for q in out] == ["b", "a"]
+    assert out[0].query == "SELECT /* explicit columns required */ FROM lake.opt_1.events"
+
+
+def test_rewrite_query_leaves_literals_and_comments_untouched():
+    query = (
+        "SELECT * FROM events e JOIN users u ON e.uid = u.id "
+        "WHERE e.note = 'SELECT * FROM events JOIN x' -- JOIN events\n"
+        "/* FROM events */ AND extract(year FROM events) > 0"
+    )
+    mapping = dict(MAPPING, users="lake.opt_1.users")
+
+    out = Rewriter.rewrite_query(query, mapping)
+
+    assert out == (
+        "SELECT /* explicit columns required */ FROM lake.opt_1.events e "
+        "/* ensure join keys are partition/sort-aligned */ JOIN lake.opt_1.users u ON e.uid = u.id "
+        "WHERE e.note = 'SELECT * FROM events JOIN x' -- JOIN events\n"
+        "/* FROM events */ AND extract(year FROM events) > 0"
+    )
+
+
+def test_rewrite_query_only_qualifies_table_positions():
+    out = Rewriter.rewrite_query(
+        "SELECT events.id FROM events, (SELECT 1 FROM public.events) s, events_archive", MAPPING
+    )
+
+    assert out == (
+        "SELECT events.id FROM lake.opt_1.events, "
+        "(SELECT 1 FROM lake.opt_1.events) s, events_archive"
+    )
+
+
+def test_parallel_rewrite_matches_serial_output():
+    queries = [
+        QueryItem(queryid=f"q{i}", query=f"SELECT * FROM events WHERE id = {i}", runquantity=1)
+        for i in range(50)
+    ]
+
+    serial = Rewriter.rewrite(queries, MAPPING)
+    parallel = Rewriter.rewrite(queries, MAPPING, workers=2, chunk_size=7)
+
+    assert parallel == serial
+
+
+def _rewrite_in_child(queries, results):
+    parallel = Rewriter.rewrite(queries, MAPPING, workers=2, chunk_size=7)
+    results.put((parallel, sql_rewriter.pool_stats()["parallel"]))
+
+
+def test_daemonic_processes_rewrite_in_the_pool():
+    # Celery prefork children are daemonic billiard processes.
+    queries = [QueryItem(queryid=f"q{i}", query=f"SELECT id FROM events WHERE id = {i}", runquantity=1) for i in range(20)]
+    results = billiard.Queue()
+    child = billiard.Process(target=_rewrite_in_child, args=(queries, results), daemon=True)
+    child.start()
+    parallel, runs = results.get(timeout=30)
+    child.join(timeout=10)
+
+    assert parallel == Rewriter.rewrite(queries, MAPPING)
+    assert runs >= 1
+
+
+def test_pool_is_started_once_per_process():
+    queries = [QueryItem(queryid=f"q{i}", query=f"SELECT id FROM events WHERE id = {i}", runquantity=1) for i in range(20)]
+    Rewriter.rewrite(queries, MAPPING, workers=2, chunk_size=7)
+    before = sql_rewriter.pool_stats()
+
+    for _ in range(3):
+        Rewriter.rewrite(queries, MAPPING, workers=2, chunk_size=7)
+
+    after = sql_rewriter.pool_stats()
+    assert after["pool_starts"] == before["pool_starts"]
+    assert after["parallel"] == before["parallel"] + 3
+
+
+def test_pool_failures_are_counted_and_logged_once(monkeypatch, caplog):
+    queries = [QueryItem(queryid=f"q{i}", query=f"SELECT id FROM events WHERE id = {i}", runquantity=1) for i in range(20)]
+
+    def broken_pool(*args, **kwargs):
+        raise OSError("fork not permitted")
+
+    monkeypatch.setattr(sql_rewriter, "Pool", broken_pool)
+    monkeypatch.setattr(sql_rewriter, "_pool", None)
+    monkeypatch.setitem(sql_rewriter._pool_stats, "fallbacks", 0)
+
+    with caplog.at_level("ERROR", logger=sql_rewriter.__name__):
+        for _ in range(3):
+            assert Rewriter.rewrite(queries, MAPPING, workers=2, chunk_size=7) == Rewriter.rewrite(queries, MAPPING)
+
+    assert sql_rewriter.pool_stats()["fallbacks"] == 3
+    assert len(caplog.records) == 1
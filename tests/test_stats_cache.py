@@ -0,0 +1,84 @@
+from pathlib import Path
+import sys
+
+import redis
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.services.stats_cache import StatsCache
+from app.services.trino_stats import StatsCollector, TableStats
+
+
+class _DictRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+
+def _lake(snapshot):
+    executed = []
+
+    def query(sql, timeout=None):
+        executed.append(sql)
+        if "$history" in sql:
+            return [(snapshot["id"],)]
+        if "SHOW STATS" in sql:
+            return [(None, None, None, None, 42.0, None, None)]
+        if "$files" in sql:
+            return [(3, 3000)]
+        return [(1, 42, 42.0)]
+
+    return query, executed
+
+
+def test_unchanged_snapshot_needs_only_the_snapshot_lookup():
+    snapshot = {"id": 7}
+    query, executed = _lake(snapshot)
+    cache = StatsCache(redis_client=_DictRedis())
+    collector = StatsCollector(query, workers=2, query_timeout=5, time_budget=5)
+
+    first = collector.collect_cached(["lake.public.events"], cache, "trino:8080")
+    executed.clear()
+    second = collector.collect_cached(["lake.public.events"], cache, "trino:8080")
+
+    assert second == first
+    assert second["lake.public.events"].row_count == 42.0
+    assert len(executed) == 1 and "$history" in executed[0]
+
+    snapshot["id"] = 8
+    executed.clear()
+    third = collector.collect_cached(["lake.public.events"], cache, "trino:8080")
+    assert third["lake.public.events"].snapshot_id == 8
+    assert len(executed) == 4
+    assert cache.stats() == {"hits": 1, "misses": 2, "errors": 0}
+
+
+def test_incomplete_stats_are_not_cached():
+    redis_client = _DictRedis()
+    cache = StatsCache(redis_client=redis_client)
+
+    cache.set("c", TableStats(table="lake.s.t", snapshot_id=1, errors={"files": "timeout"}))
+    cache.set("c", TableStats(table="lake.s.t"))
+
+    assert redis_client.data == {}
+
+
+def test_failing_redis_is_skipped_after_the_first_error():
+    class DownRedis:
+        calls = 0
+
+        def get(self, key):
+            DownRedis.calls += 1
+            raise redis.ConnectionError("connection refused")
+
+    cache = StatsCache(redis_client=DownRedis())
+
+    assert cache.get("trino:8080", "lake.public.t", 1) is None
+    assert cache.get("trino:8080", "lake.public.t", 1) is None
+    assert DownRedis.calls == 1
+    assert cache.stats() == {"hits": 0, "misses": 2, "errors": 1}
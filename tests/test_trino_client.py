@@ -5,7 +5,8 @@ import pytest
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-from app.services.trino_client import TrinoClient
+from app.services import trino_client
+from app.services.trino_client import ConnectionPool, TrinoClient
 
 
 def test_parse_standard_jdbc_url():
@@ -37,3 +38,113 @@ def test_parse_trino_prefixed_jdbc_url(jdbc_url):
     assert params.schema == "sample_schema"
     assert params.user == "alice"
     assert params.http_scheme == "https"
+
+
+class _FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql):
+        if self.conn.broken:
+            raise ConnectionError("gone")
+        self.conn.executed.append(sql)
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class _FakeConnection:
+    def __init__(self):
+        self.broken = False
+        self.closed = False
+        self.executed = []
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+def _pool(**overrides):
+    opened = []
+
+    def connect():
+        opened.append(_FakeConnection())
+        return opened[-1]
+
+    options = dict(size=2, idle_seconds=60, acquire_timeout=0.05, healthcheck_seconds=60)
+    options.update(overrides)
+    return ConnectionPool(connect, **options), opened
+
+
+def test_clients_for_the_same_session_share_pooled_connections(monkeypatch):
+    opened = []
+
+    class FakeDBAPI:
+        @staticmethod
+        def connect(**kwargs):
+            opened.append(_FakeConnection())
+            return opened[-1]
+
+    monkeypatch.setattr(trino_client, "dbapi", FakeDBAPI)
+    url = "jdbc:trino://pool-test.example.com:8080/lake?user=alice&sessionProperties=b=2,a=1"
+
+    TrinoClient(url).query("SELECT 1")
+    TrinoClient(url.replace("b=2,a=1", "a=1,b=2")).query("SELECT 2")
+    TrinoClient(url.replace("alice", "bob")).query("SELECT 3")
+
+    assert len(opened) == 2
+    assert opened[0].executed == ["SELECT 1", "SELECT 2"]
+
+
+def test_pool_blocks_at_size_and_times_out():
+    pool, opened = _pool(size=1)
+    conn = pool.acquire()
+
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert len(opened) == 1
+
+
+def test_pool_evicts_idle_and_replaces_unhealthy_connections():
+    pool, opened = _pool(idle_seconds=0)
+    pool.release(pool.acquire())
+    pool.acquire()
+    assert opened[0].closed and pool.stats()["evicted"] == 1
+
+    pool, opened = _pool(healthcheck_seconds=0)
+    first = pool.acquire()
+    pool.release(first)
+    first.broken = True
+    second = pool.acquire()
+    assert second is not first and first.closed
+
+
+def test_connection_error_discards_its_connection():
+    pool, opened = _pool()
+    with pytest.raises(ConnectionError):
+        with pool.connection():
+            raise ConnectionError("connection reset")
+
+    assert opened[0].closed
+    assert pool.stats()["in_use"] == 0 and pool.stats()["idle"] == 0
+
+
+def test_query_error_returns_the_connection_to_the_pool():
+    TrinoUserError = pytest.importorskip("trino.exceptions").TrinoUserError
+    pool, opened = _pool()
+    with pytest.raises(TrinoUserError):
+        with pool.connection():
+            raise TrinoUserError({"message": "line 1:15: Table 'lake.s.missing' does not exist"})
+
+    assert not opened[0].closed
+    assert pool.stats()["in_use"] == 0 and pool.stats()["idle"] == 1
+    with pool.connection() as conn:
+        assert conn is opened[0]
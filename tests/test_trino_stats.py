@@ -0,0 +1,126 @@
+from pathlib import Path
+import sys
+import threading
+import time
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.services import trino_client
+from app.services.trino_client import TrinoClient
+from app.services.trino_stats import StatsCollector, quote_table
+
+ROWS = {
+    "SHOW STATS": [
+        ("user_id", None, 1000.0, 0.0, None, None, None),
+        ("country", 2048.0, 12.0, 0.1, None, None, None),
+        (None, None, None, None, 50000.0, None, None),
+    ],
+    "$files": [(20, 20 * 8 * 1024 * 1024)],
+    "$partitions": [(10, 15000, 5000.0)],
+    "$history": [(987654321,)],
+}
+
+
+class _StubDBAPI:
+    def __init__(self, delay=0.0, hang_on=None):
+        self.delay = delay
+        self.hang_on = hang_on
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        self.release = threading.Event()
+        self.cancelled = []
+
+    def connect(self, **kwargs):
+        stub = self
+
+        class Cursor:
+            def execute(self, sql):
+                self.sql = sql
+                with stub.lock:
+                    stub.active += 1
+                    stub.peak = max(stub.peak, stub.active)
+                time.sleep(stub.delay)
+                try:
+                    if stub.hang_on and stub.hang_on in sql:
+                        stub.release.wait(5)
+                        if sql in stub.cancelled:
+                            raise RuntimeError("Query was canceled")
+                finally:
+                    with stub.lock:
+                        stub.active -= 1
+
+            def cancel(self):
+                stub.cancelled.append(self.sql)
+                stub.release.set()
+
+            def fetchall(self):
+                return next(rows for marker, rows in ROWS.items() if marker in self.sql)
+
+            def close(self):
+                pass
+
+        class Connection:
+            def cursor(self):
+                return Cursor()
+
+            def close(self):
+                pass
+
+        return Connection()
+
+
+def _client(monkeypatch, stub, host):
+    monkeypatch.setattr(trino_client, "dbapi", stub)
+    return TrinoClient(f"jdbc:trino://{host}:8080/lake?user=alice")
+
+
+def test_collects_row_counts_ndvs_files_and_skew_concurrently(monkeypatch):
+    stub = _StubDBAPI(delay=0.05)
+    client = _client(monkeypatch, stub, "stats-a.example.com")
+
+    stats = StatsCollector(client.query, workers=4, query_timeout=5, time_budget=5).collect(
+        ["lake.public.events", "lake.public.users"]
+    )
+
+    events = stats["lake.public.events"]
+    assert events.row_count == 50000.0
+    assert events.ndv == {"user_id": 1000.0, "country": 12.0}
+    assert events.file_count == 20 and events.avg_file_bytes == 8 * 1024 * 1024
+    assert events.partition_count == 10 and events.partition_skew == 3.0
+    assert events.snapshot_id == 987654321
+    assert not events.errors
+    assert stub.peak > 1
+
+
+def test_slow_queries_are_abandoned_within_the_timeout(monkeypatch):
+    stub = _StubDBAPI(hang_on="$partitions")
+    client = _client(monkeypatch, stub, "stats-b.example.com")
+
+    started = time.monotonic()
+    stats = StatsCollector(client.query, workers=4, query_timeout=0.2, time_budget=2).collect(["lake.public.events"])
+
+    assert time.monotonic() - started < 1
+    events = stats["lake.public.events"]
+    assert "timed out" in events.errors["partitions"]
+    assert events.row_count == 50000.0 and events.partition_count is None
+    # The hung query is cancelled on the cluster and its connection goes back to the pool.
+    assert stub.release.wait(2)
+    assert any("$partitions" in sql for sql in stub.cancelled)
+    pool = trino_client.get_pool(client.params, client._connect)
+    for _ in range(100):
+        if not pool.stats()["in_use"]:
+            break
+        time.sleep(0.01)
+    assert pool.stats()["in_use"] == 0
+
+
+def test_snapshot_id_reads_the_current_snapshot_not_the_newest_commit():
+    sql = StatsCollector(lambda sql, timeout=None: [], workers=1)._sql("snapshot", "lake.public.events")
+
+    assert '"events$history"' in sql
+    assert "is_current_ancestor" in sql
+
+
+def test_quote_table_appends_suffix_inside_quotes():
+    assert quote_table("lake.public.events", "$files") == '"lake"."public"."events$files"'
@@ -0,0 +1,47 @@
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from billiard.exceptions import WorkerLostError
+from celery.signals import task_failure
+
+from worker import celery_app
+
+
+class _Repo:
+    def __init__(self, status):
+        self.status = status
+        self.finished = []
+        self.r = None
+
+    def get_status(self, taskid):
+        return self.status
+
+    def finish(self, taskid, status, error=None, **kwargs):
+        self.finished.append((taskid, status, error))
+        self.status = status
+
+
+def test_lost_worker_marks_a_running_task_failed(monkeypatch):
+    repo = _Repo("RUNNING")
+    monkeypatch.setattr(celery_app, "_repo", repo)
+    deleted = []
+    monkeypatch.setattr("app.storage.workload.WorkloadStore.delete", lambda self, wid: deleted.append(wid))
+
+    task_failure.send(
+        sender=celery_app.run_analysis, task_id="t1",
+        exception=WorkerLostError("Worker exited prematurely: signal 9 (SIGKILL)."), args=["t1"],
+    )
+
+    assert repo.finished == [("t1", "FAILED", "WorkerLostError: Worker exited prematurely: signal 9 (SIGKILL).")]
+    assert deleted == ["t1"]
+
+
+def test_failures_the_task_recorded_itself_are_kept(monkeypatch):
+    repo = _Repo("FAILED")
+    monkeypatch.setattr(celery_app, "_repo", repo)
+
+    task_failure.send(sender=celery_app.run_analysis, task_id="t2", exception=ValueError("bad ddl"), args=["t2"])
+
+    assert repo.finished == []
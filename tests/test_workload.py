@@ -0,0 +1,140 @@
+from pathlib import Path
+import asyncio
+import sys
+
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.auth import require_token
+from app.main import app
+from app.models import NewRequest
+from app.routers import tasks
+from app.services.memo import request_fingerprint
+from app.storage.workload import WorkloadStore
+
+
+class _Pipeline:
+    def __init__(self, r):
+        self.r, self.ops = r, []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.ops.append((name, args, kwargs))
+
+    def execute(self):
+        for name, args, kwargs in self.ops:
+            getattr(self.r, name)(*args, **kwargs)
+
+
+class _Redis:
+    """Just the list/hash commands WorkloadStore uses."""
+
+    def __init__(self):
+        self.data = {}
+        self.calls = 0
+
+    def pipeline(self, transaction=True):
+        self.calls += 1
+        return _Pipeline(self)
+
+    def rpush(self, key, *items):
+        self.data.setdefault(key, []).extend(i.decode() for i in items)
+
+    def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+
+    def expire(self, key, seconds):
+        pass
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def lrange(self, key, start, end):
+        return self.data.get(key, [])[start:end + 1]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+def _request(n):
+    return NewRequest(
+        url="jdbc:trino://h:8080/lake?user=u",
+        ddl=[{"statement": "CREATE TABLE lake.s.t (x int)"}],
+        queries=[{"queryid": str(i), "query": f"SELECT {i}", "runquantity": i} for i in range(n)],
+    )
+
+
+def test_store_round_trips_in_batches():
+    r = _Redis()
+    store = WorkloadStore(r)
+    req = _request(2500)
+
+    store.save("w1", req)
+
+    assert store.load("w1") == req
+    assert r.calls == 4  # three query batches and the commit
+    store.delete("w1")
+    with pytest.raises(KeyError):
+        store.load("w1")
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    r = _Redis()
+    calls = []
+    monkeypatch.setattr(tasks, "workloads", WorkloadStore(r))
+    monkeypatch.setattr(tasks, "_submit", lambda taskid, fp, payload: calls.append((taskid, fp, payload))
+                        or tasks.TaskResponse(taskid=taskid))
+    app.dependency_overrides[require_token] = lambda: None
+    yield TestClient(app), r, calls
+    app.dependency_overrides.clear()
+
+
+def test_ndjson_upload_stores_workload_and_matches_json_fingerprint(submitted):
+    client, r, calls = submitted
+    req = _request(3)
+    lines = [{"section": "url", "url": req.url}]
+    lines += [{"section": "ddl", **d.model_dump()} for d in req.ddl]
+    lines += [{"section": "queries", **q.model_dump()} for q in reversed(req.queries)]
+
+    resp = client.post("/new/ndjson", content=b"\n".join(orjson.dumps(l) for l in lines) + b"\n")
+
+    taskid, fingerprint, payload = calls[0]
+    assert resp.json() == {"taskid": taskid} and payload is None
+    assert fingerprint == request_fingerprint(req)
+    stored = WorkloadStore(r).load(taskid)
+    assert stored.url == req.url and sorted(q.queryid for q in stored.queries) == ["0", "1", "2"]
+
+
+def test_ndjson_rejects_invalid_line_and_discards_upload(submitted):
+    client, r, calls = submitted
+    body = b'{"section": "url", "url": "jdbc:trino://h"}\n{"section": "queries", "queryid": "1", "query": "x", "runquantity": -1}\n'
+
+    resp = client.post("/new/ndjson", content=body)
+
+    assert resp.status_code == 400 and resp.json()["detail"].startswith("line 2:")
+    assert calls == [] and r.data == {}
+
+
+def test_ndjson_without_ddl_or_queries_is_rejected(submitted):
+    client, r, calls = submitted
+    body = b'{"section": "url", "url": "jdbc:trino://h"}\n{"section": "ddl", "statement": "CREATE TABLE c.s.t (x int)"}\n'
+
+    resp = client.post("/new/ndjson", content=body)
+
+    assert resp.status_code == 400 and "queries" in resp.json()["detail"]
+    assert calls == [] and r.data == {}
+
+
+def test_ndjson_lines_split_across_chunks():
+    async def chunks():
+        for chunk in (b'{"a": 1}\n{"b"', b": 2", b"}\n\n", b'{"c": 3}'):
+            yield chunk
+
+    async def collect():
+        return [line async for line in tasks._ndjson_lines_in(chunks())]
+
+    assert asyncio.run(collect()) == [b'{"a": 1}', b'{"b": 2}', b"", b'{"c": 3}']
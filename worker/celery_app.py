@@ -1,5 +1,8 @@
+import logging
 import os
+import time
 from celery import Celery
+from celery.signals import task_failure, worker_process_shutdown, worker_ready
 
 celery_app = Celery(
     "dlopt",
@@ -7,10 +10,78 @@ celery_app = Celery(
     backend=os.getenv("REDIS_URL", "redis://localhost:6379/0"),
 )
 
-@celery_app.task(name="run_analysis")
-def run_analysis(payload: dict) -> dict:
+_repo = None
+
+def get_repo():
+    global _repo
+    if _repo is None:
+        from app.storage.repo import Repo
+        _repo = Repo()
+    return _repo
+
+# The outcome goes straight into Repo (task:{id}), so the Celery backend keeps no copy.
+@celery_app.task(name="run_analysis", bind=True, ignore_result=True)
+def run_analysis(self, workload) -> None:
+    import orjson
     from app.models import NewRequest
-    from app.services.analyzer import Analyzer
-    req = NewRequest(**payload)
-    analyzer = Analyzer(req)
-    return analyzer.run()
+    from app.services.incremental import analyze
+    from app.services.metrics import CELERY_QUEUE_WAIT, CELERY_TASK, observe
+    from app.storage.workload import WorkloadStore
+    taskid = self.request.id
+    started_at = time.time()
+    created_at = get_repo().created_at(taskid)
+    if created_at is not None:
+        observe(CELERY_QUEUE_WAIT, max(0.0, started_at - created_at), task=self.name)
+    workloads = WorkloadStore(get_repo().r)
+    try:
+        # Messages carry the workload id; a dict is a payload queued before workloads were stored.
+        req = NewRequest(**workload) if isinstance(workload, dict) else workloads.load(workload)
+        base_result = base_manifest = None
+        if req.base_taskid:
+            raw = get_repo().get_result(req.base_taskid)
+            base_result = orjson.loads(raw) if raw is not None else None
+            base_manifest = get_repo().get_manifest(req.base_taskid)
+        result, manifest = analyze(req, base_result, base_manifest)
+    except Exception as exc:
+        observe(CELERY_TASK, time.time() - started_at, task=self.name, status="FAILED")
+        get_repo().finish(taskid, "FAILED", error=str(exc), started_at=started_at)
+        raise
+    observe(CELERY_TASK, time.time() - started_at, task=self.name, status="DONE")
+    get_repo().finish(taskid, "DONE", result=result, started_at=started_at, manifest=manifest)
+    if not isinstance(workload, dict):
+        workloads.delete(workload)
+
+@task_failure.connect
+def record_lost_task(sender=None, task_id=None, exception=None, args=None, **kwargs):
+    """Mark the task FAILED when its process died before it could (OOM, SIGKILL,
+    hard time limit). Celery sends this from the worker's main process in those
+    cases; failures run_analysis recorded itself are left as they are."""
+    if getattr(sender, "name", None) != run_analysis.name:
+        return
+    repo = get_repo()
+    if repo.get_status(task_id) != "RUNNING":
+        return
+    repo.finish(task_id, "FAILED", error=f"{type(exception).__name__}: {exception}")
+    workload = args[0] if args else None
+    if isinstance(workload, str):
+        from app.storage.workload import WorkloadStore
+        WorkloadStore(repo.r).delete(workload)
+
+@worker_ready.connect
+def serve_metrics(**kwargs):
+    """Expose worker histograms on WORKER_METRICS_PORT (0 disables it)."""
+    from app.config import settings
+    from app.services.metrics import start_metrics_server
+    if not settings.worker_metrics_port:
+        return
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        # Tasks run in prefork children; this process would only serve its own, empty histograms.
+        logging.getLogger(__name__).warning(
+            "PROMETHEUS_MULTIPROC_DIR is not set; task metrics from worker children will not be exported"
+        )
+    start_metrics_server(settings.worker_metrics_port)
+
+@worker_process_shutdown.connect
+def forget_child_metrics(pid=None, **kwargs):
+    from app.services.metrics import mark_process_dead
+    mark_process_dead(pid or os.getpid())